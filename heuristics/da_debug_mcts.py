@@ -5,7 +5,7 @@ import copy
 import math
 import sys
 sys.path.append('..')
-from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester, LocalSearch
 
 class ExamTimetableState:
     def __init__(self, problem, assigned_exams=None):
@@ -461,11 +461,13 @@ def mcts_search(problem, time_budget=7200):
     return best_data
 
 
-def run_monte_carlo(input_file, output_file):
+def run_monte_carlo(input_file, output_file, local_search_share=0.1, time_budget=7200):      # The last local_search_share of the time budget improves the soft cost of the best solution
     problem = ExamTimetablingProblem.from_file(input_file)
     
     # Run MCTS search
-    solution_data = mcts_search(problem)
+    solution_data = mcts_search(problem, time_budget=time_budget * (1 - local_search_share))
+    solution_data, local_search = LocalSearch.improve(problem, solution_data, time_budget * local_search_share)
+    print(f"Local search: {local_search}")
     
     # Create solution object
     e_t_solution = ExamTimetablingSolution(problem, solution_data)
@@ -478,20 +480,8 @@ def run_monte_carlo(input_file, output_file):
                 file.write(f"{(booking.exam.number, booking.period.number, room_numbers)}\n")
             else:
                 file.write(f"{(booking.exam.number, booking.period.number, booking.rooms.number)}\n")
-        file.write(f"Hard constraints -> {e_t_solution.distance_to_feasibility()}\n")
-        file.write(f"Conflicting exams -> {e_t_solution.conflicting_exams()}\n")
-        file.write(f"Overbooked periods -> {e_t_solution.overbooked_periods()}\n")
-        file.write(f"Short Periods -> {e_t_solution.too_short_periods()}\n")
-        file.write(f"Period constraints -> {e_t_solution.period_constraint_violations()}\n")
-        file.write(f"Room constraints -> {e_t_solution.room_constraint_violations()}\n")
-        file.write(f"Soft constraints -> {e_t_solution.soft_constraint_violations()}\n")
-        file.write(f"Two in a row -> {e_t_solution.two_in_a_row_penalty()}\n")
-        file.write(f"Two in a day -> {e_t_solution.two_in_a_day_penalty()}\n")
-        file.write(f"Period spread -> {e_t_solution.period_spread_penalty()}\n")
-        file.write(f"Mixed durations -> {e_t_solution.mixed_durations_penalty()}\n")
-        file.write(f"Frontload -> {e_t_solution.frontload_penalty()}\n")
-        file.write(f"Period penalty -> {e_t_solution.period_penalty()}\n")
-        file.write(f"Room penalty -> {e_t_solution.room_penalty()}\n")
+        for line in e_t_solution.evaluate_all().lines():      # Every component is computed once
+            file.write(f"{line}\n")
 
 
 def main():
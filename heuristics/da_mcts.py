@@ -1,11 +1,14 @@
 import bisect
+from array import array
 import random
 import time
 import copy
 import math
 import sys
 sys.path.append('..')
-from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester
+from time import perf_counter
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester, BookingCodec, LocalSearch
+from rr.opt.mcts.simple import ProgressReporter, LRUCache, activate_stats, timed
 
 class ExamTimetableState:
     def __init__(self, problem, assigned_exams=None):
@@ -18,9 +21,11 @@ class ExamTimetableState:
         self.unassigned_exams = set(range(self.num_exams))
         self.saturation_degrees = [0] * self.num_exams  # number of distinct adjacent periods
         self.adjacent_periods = [set() for _ in range(self.num_exams)]  # periods used by adjacent exams
+        self.zobrist = 0  # Zobrist hash of the assignments, identical for the same partial timetable whatever the assignment order
                 
         if assigned_exams:
-            for exam, (period, _) in assigned_exams.items():
+            for exam, (period, rooms) in assigned_exams.items():
+                self.zobrist ^= self.problem.assignment_hash(exam, period, rooms)
                 self.unassigned_exams.remove(exam.number)      # Remove exams already assigned
                 self.period_remaining_capacity[period] -= len(exam.students)      # Update period capacity for exam assigned
                 self._update_saturation(exam.number, period)      # Update saturation for already assigned exams
@@ -54,6 +59,7 @@ class ExamTimetableState:
         
         return selected_exam
     
+    @timed("branches")
     def get_legal_actions(self):      # Creation of branches
         exam_id = self.next_exam()
         if exam_id is None:
@@ -146,6 +152,7 @@ class ExamTimetableState:
             
         return [random.choice(self.problem.rooms)]      # If not enough rooms just send random room
 
+    @timed("apply")
     def apply_action(self, action):      # Application of branch
         exam, period, room_info = action
         
@@ -180,9 +187,9 @@ class TimetableNode:
         self.visits = 0
         self.untried_actions = self.state.get_legal_actions()
         self.value = (0, 0)  # Lower value = better timetable
-        # Ranking System
+        # Ranking System: children sorted by (average value, node_id), ranks (1/rank) are derived by enumeration at selection time
         self.sorted_children = []
-        self.child_rankings = {}
+        self.rank_entry = None      # This node's current entry in its parent's sorted_children
         self.node_id = id(self)
 
     def __lt__(self, other):
@@ -206,26 +213,12 @@ class TimetableNode:
         else:
             return (child.value[0] / child.visits, child.value[1] / child.visits)
     
-    def update_rankings(self):      # Function to update all rankings
-        for i, (_, _, child) in enumerate(self.sorted_children):
-            rank = i + 1
-            self.child_rankings[child] = 1 / rank
-    
-    def update_child_rank(self, child):
-        old_entry = None
-        new_value = self.get_child_value(child)
-
-        for i, (value, _, c) in enumerate(self.sorted_children):
-            if c is child:
-                old_entry = (i, (value, _, c))
-                break
-        
-        if old_entry:
-            self.sorted_children.pop(old_entry[0])
-        
-        bisect.insort(self.sorted_children, (new_value, child.node_id, child))
+    def update_child_rank(self, child):      # Bisection finds the child's old entry in O(log k) (entries are unique thanks to node_id), the list shift on del/insort is an O(k) memmove
+        if child.rank_entry is not None:
+            del self.sorted_children[bisect.bisect_left(self.sorted_children, child.rank_entry)]
 
-        self.update_rankings()
+        child.rank_entry = (self.get_child_value(child), child.node_id, child)
+        bisect.insort(self.sorted_children, child.rank_entry)
         
     def expand(self):      # Creation of a new child node from an untried action
         if not self.untried_actions:
@@ -240,10 +233,7 @@ class TimetableNode:
         # Create new child node
         child = TimetableNode(new_state, parent=self, action=action)
         self.children.append(child)
-
-        child_value = self.get_child_value(child)
-        bisect.insort(self.sorted_children, (child_value, child.node_id, child))
-        self.update_rankings()
+        self.update_child_rank(child)
 
         return child
         
@@ -251,13 +241,17 @@ class TimetableNode:
         if not self.children:
             return None
         
-        def ucb_score(child):
-            exploitation = self.child_rankings.get(child, 0)
-            exploration = -exploration_weight * math.sqrt(2 * math.log(self.visits) / max(child.visits, 1))
-
-            return -(exploitation + exploration)
-            
-        return min(self.children, key=ucb_score)
+        log_visits = math.log(self.visits)
+        best, best_score = None, None
+        for rank, (_, _, child) in enumerate(self.sorted_children, 1):      # Exploitation is 1/rank, computed in rank order
+            exploitation = 1 / rank
+            if best is not None and -exploitation >= best_score:      # The exploration term only adds to the score, so no later rank can win
+                break
+            exploration = -exploration_weight * math.sqrt(2 * log_visits / max(child.visits, 1))
+            score = -(exploitation + exploration)
+            if best is None or score < best_score:
+                best, best_score = child, score
+        return best
 
 
 def select_node(node):      # Selection of node for expansion using tree policy
@@ -265,9 +259,10 @@ def select_node(node):      # Selection of node for expansion using tree policy
         if not node.is_fully_expanded():
             return node
         else:
-            if node.best_child() is None:
+            child = node.best_child()
+            if child is None:
                 return node.parent
-            node = node.best_child()
+            node = child
     return node
 
 
@@ -287,7 +282,16 @@ def backpropagate(node, hard_result, soft_result):      # Update of node values
         node = node.parent
 
 
-def simulate(state):      # Heuristic simulation from the given state to completion
+def commit_root(node):      # Commit to the best ranked child of the root, making it the new root
+    if not node.sorted_children:
+        return None
+
+    _, _, best = node.sorted_children[0]
+    best.parent = None      # Unlinking the child lets the old root and all sibling subtrees be freed
+    return best
+
+
+def simulate(state, softs=False):      # Heuristic simulation from the given state to completion, returns (hard, soft or None, bookings)
     # Deep copy to avoid modifying the original
     current_state = copy.deepcopy(state)
     
@@ -362,10 +366,10 @@ def simulate(state):      # Heuristic simulation from the given state to complet
         current_state = current_state.apply_action(action)
         
     solution.fill(current_state.assigned_exams)
-    return (solution.calculate_score(), solution.calculate_softs(), solution.dictionary_to_list())
+    return solution.evaluate(softs)      # Soft violations are only computed for feasible rollouts, unless softs is set; hard is exact, since infeasible rollouts are ranked by it
 
 
-def mcts_search(problem, time_budget=7200):
+def mcts_search(problem, time_budget=7200, commit_iterations=None, commit_seconds=None, stats=None, progress_interval=10.0, rollout_cache_size=None):
     # Initialize with empty timetable
     initial_state = ExamTimetableState(problem)
     root = TimetableNode(initial_state)
@@ -374,22 +378,35 @@ def mcts_search(problem, time_budget=7200):
     start_time = time.time()
     end_time = time.time() + time_budget
     iteration = 0
+    # Commit-and-reroot: every commit_iterations iterations and/or commit_seconds seconds the best child of the root becomes the new root
+    commit_iteration, commit_time = iteration, start_time
+    commits = 0
+    # Per-phase timing (stats is a rr.opt.mcts.simple.PhaseStats), including state transitions and the framework's hot paths (the timed functions)
+    timing = stats is not None
+    outer_stats = activate_stats(stats) if timing else None
+    # Progress messages are throttled to one every progress_interval seconds of wall-clock time
+    progress = ProgressReporter(progress_interval, emit=print)
+    # Rollout results memoized by the state's Zobrist hash, with the bookings stored as compact period/room codes (disabled unless rollout_cache_size is given)
+    rollout_cache = LRUCache(rollout_cache_size) if rollout_cache_size else None
+    codec = BookingCodec(problem) if rollout_cache is not None else None
     try:
         print("Starting Search")
         while time.time() < end_time:
             iteration += 1
-            if iteration % 100 == 0:
-                elapsed = time.time() - start_time
-                if not singleton:
-                    print(f"Iteration {iteration}, time elapsed: {elapsed:.1f}s, best infeasible solution: {inf_best_score}")
-                else: print(f"Iteration {iteration}, time elapsed: {elapsed:.1f}s, best feasible solution: {f_best_score}")
+            if not singleton:
+                progress.report("Iteration {}, time elapsed: {:.1f}s, best infeasible solution: {}", iteration, time.time() - start_time, inf_best_score)
+            else: progress.report("Iteration {}, time elapsed: {:.1f}s, best feasible solution: {}", iteration, time.time() - start_time, f_best_score)
 
             # 1. Selection
+            if timing: tp = perf_counter()
             node = select_node(root)
+            if timing: stats.add("select", perf_counter() - tp)
             
             # 2. Expansion
             if not node.is_terminal():
+                if timing: tp = perf_counter()
                 child = node.expand()
+                if timing: stats.add("expand", perf_counter() - tp)
                 if child:
                     node = child
             else: 
@@ -397,7 +414,15 @@ def mcts_search(problem, time_budget=7200):
                 break
             
             # 3. Simulation
-            score, soft_score, data = simulate(node.state)
+            if timing: tp = perf_counter()
+            cached = None if rollout_cache is None else rollout_cache.get(node.state.zobrist)
+            if cached is None:
+                score, soft_score, data = simulate(node.state)
+                if rollout_cache is not None:
+                    rollout_cache.put(node.state.zobrist, (score, soft_score, array('i', codec.encode(data))))
+            else:
+                score, soft_score, data = cached      # Codes are only decoded if they make a new best solution
+            if timing: stats.add("simulate", perf_counter() - tp)
             if score == 0:
                 elapsed = time.time() - start_time
                 if not singleton: 
@@ -407,19 +432,40 @@ def mcts_search(problem, time_budget=7200):
                 if f_best_score == None or soft_score < f_best_score:
                     print(f"New best solution at iteration {iteration}: old best feasible solution={f_best_score} -> new best feasible solution={soft_score} with time elapsed: {elapsed:.1f}s")   
                     f_best_score = soft_score
-                    best_data = data 
+                    best_data = data if cached is None else codec.decode(data)
                 
             elif inf_best_score == None or score < inf_best_score:
                 elapsed = time.time() - start_time
                 print(f"New best solution at iteration {iteration}: old best infeasible solution={inf_best_score} -> new best infeasible solution={score} with time elapsed: {elapsed:.1f}s")
                 inf_best_score = score
-                best_data = data 
+                best_data = data if cached is None else codec.decode(data)
             
             # 4. Backpropagation
+            if timing: tp = perf_counter()
             backpropagate(node, score, soft_score)
+            if timing:
+                stats.add("backpropagate", perf_counter() - tp)
+                stats.tick(iteration)
+
+            # 5. Commit
+            if ((commit_iterations is not None and iteration - commit_iteration >= commit_iterations) or
+                    (commit_seconds is not None and time.time() - commit_time >= commit_seconds)):
+                commit_iteration, commit_time = iteration, time.time()
+                new_root = commit_root(root)
+                if new_root is not None:
+                    root = new_root
+                    commits += 1
+                    print(f"Commit {commits} at iteration {iteration}: exam {root.action[0].number} -> period {root.action[1].number}, {len(root.state.unassigned_exams)} exams left")
             
     except KeyboardInterrupt:
         print("Keyboard break")
+    finally:
+        if timing:
+            activate_stats(outer_stats)
+            stats.tick(iteration, force=True)
+            print(f"Phase timings: {stats}")
+        if rollout_cache is not None:
+            print(f"Rollout cache: {rollout_cache}")
 
     # Return feasible solution found during simulation
     if not singleton:
@@ -428,11 +474,14 @@ def mcts_search(problem, time_budget=7200):
     return best_data
 
 
-def run_monte_carlo(input_file, output_file):
+def run_monte_carlo(input_file, output_file, local_search_share=0.1, **kwargs):      # The last local_search_share of the time budget improves the soft cost of the best solution
     problem = ExamTimetablingProblem.from_file(input_file)
     
     # Run MCTS search
-    solution_data = mcts_search(problem)
+    time_budget = kwargs.pop("time_budget", 7200)
+    solution_data = mcts_search(problem, time_budget=time_budget * (1 - local_search_share), **kwargs)
+    solution_data, local_search = LocalSearch.improve(problem, solution_data, time_budget * local_search_share)
+    print(f"Local search: {local_search}")
     
     # Create solution object
     e_t_solution = ExamTimetablingSolution(problem, solution_data)
@@ -445,20 +494,8 @@ def run_monte_carlo(input_file, output_file):
                 file.write(f"{(booking.exam.number, booking.period.number, room_numbers)}\n")
             else:
                 file.write(f"{(booking.exam.number, booking.period.number, booking.rooms.number)}\n")
-        file.write(f"Hard constraints -> {e_t_solution.distance_to_feasibility()}\n")
-        file.write(f"Conflicting exams -> {e_t_solution.conflicting_exams()}\n")
-        file.write(f"Overbooked periods -> {e_t_solution.overbooked_periods()}\n")
-        file.write(f"Short Periods -> {e_t_solution.too_short_periods()}\n")
-        file.write(f"Period constraints -> {e_t_solution.period_constraint_violations()}\n")
-        file.write(f"Room constraints -> {e_t_solution.room_constraint_violations()}\n")
-        file.write(f"Soft constraints -> {e_t_solution.soft_constraint_violations()}\n")
-        file.write(f"Two in a row -> {e_t_solution.two_in_a_row_penalty()}\n")
-        file.write(f"Two in a day -> {e_t_solution.two_in_a_day_penalty()}\n")
-        file.write(f"Period spread -> {e_t_solution.period_spread_penalty()}\n")
-        file.write(f"Mixed durations -> {e_t_solution.mixed_durations_penalty()}\n")
-        file.write(f"Frontload -> {e_t_solution.frontload_penalty()}\n")
-        file.write(f"Period penalty -> {e_t_solution.period_penalty()}\n")
-        file.write(f"Room penalty -> {e_t_solution.room_penalty()}\n")
+        for line in e_t_solution.evaluate_all().lines():      # Every component is computed once
+            file.write(f"{line}\n")
 
 
 def main():
@@ -5,50 +5,46 @@ import sys
 sys.path.append('..')
 
 import rr.opt.mcts.simple as mcts
-from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester, BookingCodec, HardConstraintTracker, LocalSearch
 
-def run_monte_carlo(input_file, output_file, *args, **kwargs):
+def run_monte_carlo(input_file, output_file, *args, local_search_share=0.1, **kwargs):      # The last local_search_share of the time limit improves the soft cost of the best solution
     problem = ExamTimetablingProblem.from_file(input_file)
     mcts.config_logging(level="INFO")
     root = ITCTreeNode.root(problem)
-    sols = mcts.run(root, *args, **kwargs, time_limit=7200)
-    e_t_solution = ExamTimetablingSolution(problem, sols.best.data)
+    kwargs.setdefault("sols", mcts.Solutions(codec=BookingCodec(problem)))      # Incumbents are kept as compact deltas of period/room codes
+    kwargs.setdefault("transpositions", ITCTreeNode.TRANSPOSITION_SIZE)      # A state reached again (through another assignment order) reuses its rollout
+    sols = mcts.run(root, *args, **kwargs, time_limit=7200 * (1 - local_search_share))
+    data, local_search = LocalSearch.improve(problem, sols.best.data, 7200 * local_search_share, rng_seed=kwargs.get("rng_seed"))
+    mcts.info("Local search: {}".format(local_search))
+    e_t_solution = ExamTimetablingSolution(problem, data)
 
     with open(output_file, "w") as file:
-        for booking in sols.best.data:
+        for booking in data:
             if hasattr(booking.rooms, '__iter__') and not isinstance(booking.rooms, str):
                 room_numbers = [room.number for room in booking.rooms]
                 file.write(f"{(booking.exam.number, booking.period.number, room_numbers)}\n")
             else:
                 file.write(f"{(booking.exam.number, booking.period.number, booking.rooms.number)}\n")
-        file.write(f"Hard constraints -> {e_t_solution.distance_to_feasibility()}\n")
-        file.write(f"Conflicting exams -> {e_t_solution.conflicting_exams()}\n")
-        file.write(f"Overbooked periods -> {e_t_solution.overbooked_periods()}\n")
-        file.write(f"Short Periods -> {e_t_solution.too_short_periods()}\n")
-        file.write(f"Period constraints -> {e_t_solution.period_constraint_violations()}\n")
-        file.write(f"Room constraints -> {e_t_solution.room_constraint_violations()}\n")
-        file.write(f"Soft constraints -> {e_t_solution.soft_constraint_violations()}\n")
-        file.write(f"Two in a row -> {e_t_solution.two_in_a_row_penalty()}\n")
-        file.write(f"Two in a day -> {e_t_solution.two_in_a_day_penalty()}\n")
-        file.write(f"Period spread -> {e_t_solution.period_spread_penalty()}\n")
-        file.write(f"Mixed durations -> {e_t_solution.mixed_durations_penalty()}\n")
-        file.write(f"Frontload -> {e_t_solution.frontload_penalty()}\n")
-        file.write(f"Period penalty -> {e_t_solution.period_penalty()}\n")
-        file.write(f"Room penalty -> {e_t_solution.room_penalty()}\n")
+        for line in e_t_solution.evaluate_all().lines():      # Every component is computed once
+            file.write(f"{line}\n")
 
 class ITCTreeNode(mcts.TreeNode):
+    WIDENING_K = 2.0      # Progressive widening over the (prior-ordered) feasible periods of each exam
+    TRANSPOSITION_SIZE = 10000      # Partial timetables (and their rollouts) kept by run_monte_carlo's transposition table, by Zobrist hash
+
     @classmethod
     def root(cls, problem: ExamTimetablingProblem):
         root = cls()
         root.exams_left = []
         root.exams_assigned = {}
         root.problem = problem
-        root.lower_bound = None
+        root.hard_constraints = HardConstraintTracker(problem)      # Hard violations of the assignments made so far, updated as exams are placed
         # DSatur data structures
         root.num_exams = len(problem.exams)
         root.unassigned_exams = set(range(root.num_exams))
         root.saturation_degrees = [0] * root.num_exams      # tracking saturation degree (number of distinct adjacent colors/periods)
         root.adjacent_periods = [set() for _ in range(root.num_exams)]      # tracking periods used by adjacent exams
+        root.zobrist = 0      # Zobrist hash of the (exam, period, rooms) assignments made so far
         return root
 
     def copy(self):
@@ -56,11 +52,12 @@ class ITCTreeNode(mcts.TreeNode):
         clone.exams_left = list(self.exams_left)
         clone.exams_assigned = dict(self.exams_assigned)
         clone.problem = self.problem
-        clone.lower_bound = None
+        clone.hard_constraints = self.hard_constraints.copy()
         clone.num_exams = self.num_exams
         clone.unassigned_exams = set(self.unassigned_exams)
         clone.saturation_degrees = list(self.saturation_degrees)
         clone.adjacent_periods = [set(periods) for periods in self.adjacent_periods]
+        clone.zobrist = self.zobrist
         return clone
     
     def next_exam(self):
@@ -183,24 +180,35 @@ class ITCTreeNode(mcts.TreeNode):
                     self.problem.room_period_full_dictionary[(room, period)] = True
 
         self.unassigned_exams.remove(exam_id)
+        self.zobrist ^= self.problem.assignment_hash(exam, period, self.exams_assigned[exam][1])
+        self.hard_constraints.place(exam, period, self.exams_assigned[exam][1])
 
         # Updating saturation degrees
-        for adj_exam in range(self.num_exams):
-            if adj_exam != exam_id and adj_exam in self.unassigned_exams:
-                if self.problem.clash_matrix[exam_id, adj_exam] > 0:
-                    if period not in self.adjacent_periods[adj_exam]:
-                        self.adjacent_periods[adj_exam].add(period)
-                        self.saturation_degrees[adj_exam] += 1
-
-    def simulation_apply(self, period):
+        for adj_exam in self.problem.clash_neighbours[exam_id]:
+            if adj_exam in self.unassigned_exams:
+                if period not in self.adjacent_periods[adj_exam]:
+                    self.adjacent_periods[adj_exam].add(period)
+                    self.saturation_degrees[adj_exam] += 1
+
+    def branch_priors(self, periods):      # Least-constraining period first: prior decreases with the unassigned neighbours that would lose the period
+        exam_id = self.exams_left[0].number
+        clashes = self.problem.clash_matrix[exam_id]
+        neighbours = [self.adjacent_periods[i] for i in self.unassigned_exams if i != exam_id and clashes[i] > 0]
+        return [1.0 / (1 + sum(1 for adjacent in neighbours if period not in adjacent)) for period in periods]
+
+    def state_key(self):      # Identical partial timetables share statistics in the transposition table
+        return self.zobrist
+
+    def simulation_apply(self, period, solution=None):      # Rollouts pass their own, incrementally updated, solution
         if not self.exams_left:
             print("SHOULD NOT HAPPEN -- simulation_apply")
 
         exam = self.exams_left.pop(0)
         exam_id = exam.number
 
-        solution = Solution(self.problem)
-        solution.fill(self.exams_assigned)
+        if solution is None:
+            solution = Solution(self.problem)
+            solution.fill(self.exams_assigned)
         feasibility_tester = FeasibilityTester(self.problem)
         students_needed = len(exam.students)
         feasible_rooms = []
@@ -265,14 +273,14 @@ class ITCTreeNode(mcts.TreeNode):
             self.exams_assigned[exam] = (period, multiple_rooms)
 
         self.unassigned_exams.remove(exam_id)
+        self.hard_constraints.place(exam, period, self.exams_assigned[exam][1])
 
         # Updating saturation degrees
-        for adj_exam in range(self.num_exams):
-            if adj_exam != exam_id and adj_exam in self.unassigned_exams:
-                if self.problem.clash_matrix[exam_id, adj_exam] > 0:
-                    if period not in self.adjacent_periods[adj_exam]:
-                        self.adjacent_periods[adj_exam].add(period)
-                        self.saturation_degrees[adj_exam] += 1
+        for adj_exam in self.problem.clash_neighbours[exam_id]:
+            if adj_exam in self.unassigned_exams:
+                if period not in self.adjacent_periods[adj_exam]:
+                    self.adjacent_periods[adj_exam].add(period)
+                    self.saturation_degrees[adj_exam] += 1
 
     # Normal simulate
     #def simulate(self):
@@ -297,14 +305,15 @@ class ITCTreeNode(mcts.TreeNode):
     #    )
     
     # Heuristic simulate
-    def simulate(self):
+    def simulate(self):      # Rollout stopping at the first hard violation, which is tracked incrementally as exams are placed
         node = self.copy()
 
         solution = Solution(node.problem)
         solution.fill(node.exams_assigned)
         feasibility_tester = FeasibilityTester(node.problem)
+        hard_constraints = node.hard_constraints
 
-        while solution.calculate_score() == 0:
+        while hard_constraints.violations == 0:
             if not node.unassigned_exams:
                 break
 
@@ -322,38 +331,30 @@ class ITCTreeNode(mcts.TreeNode):
             else:
                 period_scores = []
                 for period in feasible_periods:
-                    conflict_count = 0
-                    for adj_exam in range(node.num_exams):
-                        if node.problem.clash_matrix[exam_id, adj_exam] > 0:
-                            for assigned_exam, (assigned_period, _) in node.exams_assigned.items():
-                                if assigned_exam.number == adj_exam and assigned_period == period:
-                                    conflict_count += 1
+                    conflict_count = sum(1 for adj_exam in hard_constraints.period_exams[period.number]      # Assigned exams in the period clashing with this one
+                                         if node.problem.clash_matrix[exam_id, adj_exam] > 0)
                     period_scores.append((period, conflict_count))
                 
                 period_scores.sort(key=lambda x: x[1])
                 period = period_scores[0][0]
             
             node.exams_left = [exam]
-            node.simulation_apply(period)
-            solution.fill(node.exams_assigned)
+            node.simulation_apply(period, solution)
+            solution.set_exam(period, node.exams_assigned[exam][1], exam)
         
         infeas = len(node.unassigned_exams)
         if infeas > 0:
             return mcts.Solution(value=mcts.Infeasible(infeas),
                                  data=solution.dictionary_to_list())
-        elif infeas == 0 and solution.calculate_score() != 0:
+        elif infeas == 0 and hard_constraints.violations != 0:
             return mcts.Solution(value=mcts.Infeasible(infeas),
                                  data=solution.dictionary_to_list())
         else:
             return mcts.Solution(value=(infeas),
                                  data=solution.dictionary_to_list())
 
-    def bound(self):
-        if self.lower_bound is None:
-            solution = Solution(self.problem)
-            solution.fill(self.exams_assigned)
-            self.lower_bound = solution.calculate_score()
-        return self.lower_bound
+    def bound(self):      # Hard violations of the assignments made so far
+        return self.hard_constraints.violations
 
 def main():
     choice = input("Would you like to run mcts on just one of the 12 datasets or all?\n")
@@ -4,24 +4,29 @@ import copy
 import math
 import sys
 sys.path.append('..')
-from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester, LocalSearch
+from rr.opt.mcts.simple import Lex, ProgressReporter, TranspositionTable
+
+SOFT_RADIX = 1000000      # Node values are (hard, soft) packed as hard * SOFT_RADIX + soft, so sums stay exact integers
 
 class ExamTimetableState:
     def __init__(self, problem, assigned_exams=None):
         self.problem = problem  # ITC2007 problem instance
         self.assigned_exams = assigned_exams or {}
 
-        self.period_remaining_capacity = self.problem.period_capacity
+        self.period_remaining_capacity = dict(self.problem.period_capacity)      # Own copy, the problem's capacities are left untouched
         
         # DSatur data structures
         self.num_exams = len(problem.exams)
         self.unassigned_exams = set(range(self.num_exams))
         self.saturation_degrees = [0] * self.num_exams  # number of distinct adjacent periods
         self.adjacent_periods = [set() for _ in range(self.num_exams)]  # periods used by adjacent exams
+        self.zobrist = 0  # Zobrist hash of the assignments (identifies equal partial timetables)
                 
         if assigned_exams:
-            for exam, (period, _) in assigned_exams.items():
+            for exam, (period, room_info) in assigned_exams.items():
                 self.unassigned_exams.remove(exam.number)      # Remove exams already assigned
+                self.zobrist ^= self.problem.assignment_hash(exam, period, room_info)      # Add assignment to the hash
                 self.period_remaining_capacity[period] -= len(exam.students)      # Update period capacity for exam assigned
                 self._update_saturation(exam.number, period)      # Update saturation for already assigned exams
     
@@ -141,13 +146,23 @@ class ExamTimetableState:
             
         return [random.choice(self.problem.rooms)]      # If not enough rooms just send random room
 
-    def apply_action(self, action):      # Application of branch
+    def apply_action(self, action):      # Application of branch, deriving the new state from this one instead of replaying all assignments
         exam, period, room_info = action
         
         # Create a new state with the additional assignment
-        new_assigned = dict(self.assigned_exams)
-        new_assigned[exam] = (period, room_info)
-        new_state = ExamTimetableState(self.problem, new_assigned)
+        new_state = ExamTimetableState.__new__(ExamTimetableState)
+        new_state.problem = self.problem
+        new_state.assigned_exams = dict(self.assigned_exams)
+        new_state.assigned_exams[exam] = (period, room_info)
+        new_state.period_remaining_capacity = dict(self.period_remaining_capacity)
+        new_state.period_remaining_capacity[period] -= len(exam.students)
+        new_state.num_exams = self.num_exams
+        new_state.unassigned_exams = set(self.unassigned_exams)
+        new_state.unassigned_exams.remove(exam.number)
+        new_state.saturation_degrees = list(self.saturation_degrees)
+        new_state.adjacent_periods = list(self.adjacent_periods)      # Sets are shared with this state until _update_saturation replaces them
+        new_state.zobrist = self.zobrist ^ self.problem.assignment_hash(exam, period, room_info)
+        new_state._update_saturation(exam.number, period)
         
         # Update room fullness if exam is exclusive
         if exam.exclusive:
@@ -159,13 +174,21 @@ class ExamTimetableState:
             
         return new_state
     
-    def _update_saturation(self, assigned_exam_id, period):      # Update saturation degrees for unassigned exams
-        for exam_id in self.unassigned_exams:
-            if self.problem.clash_matrix[assigned_exam_id, exam_id] > 0:
-                if period not in self.adjacent_periods[exam_id]:
-                    self.adjacent_periods[exam_id].add(period)
+    def _update_saturation(self, assigned_exam_id, period):      # Update saturation degrees for unassigned exams clashing with the assigned one
+        for exam_id in self.problem.clash_neighbours[assigned_exam_id]:
+            if exam_id in self.unassigned_exams:
+                adjacent = self.adjacent_periods[exam_id]
+                if period not in adjacent:
+                    self.adjacent_periods[exam_id] = adjacent | {period}      # Copy-on-write, the old set may belong to the parent state
                     self.saturation_degrees[exam_id] += 1
 
+class SharedStats:      # Statistics shared by all nodes with the same partial timetable (transposition table entry)
+    def __init__(self):
+        self.visits = 0
+        self.value = 0
+        self.result = None  # Cached simulation result of the state
+
+
 class TimetableNode:
     def __init__(self, state, parent=None, action=None):
         self.state = state
@@ -174,6 +197,7 @@ class TimetableNode:
         self.children = []
         self.visits = 0
         self.value = 0  # Lower value = better timetable
+        self.shared = None  # SharedStats of the node's state when a transposition table is used
         self.untried_actions = self.state.get_legal_actions()
         
     def is_fully_expanded(self):      # Check if all possible child nodes have been created
@@ -203,7 +227,8 @@ class TimetableNode:
             
         # UCB1 for minimization (lower value is better)
         def ucb_score(child):
-            exploitation = child.value / max(child.visits, 1)
+            stats = child if child.shared is None else child.shared      # Transpositions pool their statistics
+            exploitation = stats.value / (max(stats.visits, 1) * SOFT_RADIX)      # Mean hard violations, soft penalty as the fractional part
             # Negative exploration component for minimization
             exploration = -exploration_weight * math.sqrt(2 * math.log(self.visits) / max(child.visits, 1))
             return exploitation + exploration
@@ -226,10 +251,13 @@ def backpropagate(node, result):      # Update of node values going up the tree
     while node is not None:
         node.visits += 1
         node.value += result
+        if node.shared is not None:
+            node.shared.visits += 1
+            node.shared.value += result
         node = node.parent
 
 
-def simulate(state):      # Heuristic simulation from the given state to completion
+def simulate(state, softs=False):      # Heuristic simulation from the given state to completion, returns (hard, soft or None, bookings)
     # Deep copy to avoid modifying the original
     current_state = copy.deepcopy(state)
     
@@ -304,25 +332,27 @@ def simulate(state):      # Heuristic simulation from the given state to complet
         current_state = current_state.apply_action(action)
         
     solution.fill(current_state.assigned_exams)
-    return (solution.calculate_score(), solution.calculate_softs(), solution.dictionary_to_list())
+    return solution.evaluate(softs)      # Soft violations are only computed for feasible rollouts, unless softs is set; hard is exact, since infeasible rollouts are ranked by it
 
 
-def mcts_search(problem, time_budget=7200):
+def mcts_search(problem, time_budget=7200, transposition_size=None, progress_interval=10.0, infeasible_softs=False):
     # Initialize with empty timetable
     initial_state = ExamTimetableState(problem)
     root = TimetableNode(initial_state)
+    transpositions = None if transposition_size is None else TranspositionTable(transposition_size, entry_factory=SharedStats)
     f_best_score , inf_best_score = None, None
     singleton = False
     end_time = time.time() + time_budget
     iteration = 0
+    # Progress messages are throttled to one every progress_interval seconds of wall-clock time
+    progress = ProgressReporter(progress_interval, emit=print)
     try:
         print("Starting Search")
         while time.time() < end_time:
             iteration += 1
-            if iteration % 100 == 0:
-                if not singleton:
-                    print(f"Iteration {iteration}, best infeasible solution: {inf_best_score}")
-                else: print(f"Iteration {iteration}, best feasible solution: {f_best_score}")
+            if not singleton:
+                progress.report("Iteration {}, best infeasible solution: {}", iteration, inf_best_score)
+            else: progress.report("Iteration {}, best feasible solution: {}", iteration, f_best_score)
 
             # 1. Selection
             node = select_node(root)
@@ -336,8 +366,15 @@ def mcts_search(problem, time_budget=7200):
                 print("No more expansion steps")
                 break
             
-            # 3. Simulation
-            score, soft_violations, data = simulate(node.state)
+            # 3. Simulation (reusing the cached result if the partial timetable was already reached through another branch)
+            if transpositions is not None and node.shared is None:
+                node.shared = transpositions.lookup(node.state.zobrist)
+            if node.shared is not None and node.shared.result is not None:
+                score, soft_violations, data = node.shared.result
+            else:
+                score, soft_violations, data = simulate(node.state, softs=infeasible_softs)
+                if node.shared is not None:
+                    node.shared.result = (score, soft_violations, data)
             if score == 0:
                 if not singleton: 
                     print(f"Found feasible solution at iteration {iteration}")
@@ -354,12 +391,14 @@ def mcts_search(problem, time_budget=7200):
                 best_data = data 
             
             # 4. Backpropagation
-            soft_score = soft_violations / 1000000
-            backpropagate(node, score+soft_score)
+            backpropagate(node, Lex(score, soft_violations or 0).pack(SOFT_RADIX))      # Infeasible rollouts only break ties on soft violations with infeasible_softs
             
     except KeyboardInterrupt:
         print("Keyboard break")
 
+    if transpositions is not None:
+        print(f"Transposition table: {transpositions}")
+
     # Return feasible solution found during simulation
     if not singleton:
         print(f"Stopped at iteration {iteration}, with best infeasible solution=({inf_best_score})")
@@ -367,11 +406,14 @@ def mcts_search(problem, time_budget=7200):
     return best_data
 
 
-def run_monte_carlo(input_file, output_file):
+def run_monte_carlo(input_file, output_file, local_search_share=0.1, **kwargs):      # The last local_search_share of the time budget improves the soft cost of the best solution
     problem = ExamTimetablingProblem.from_file(input_file)
     
     # Run MCTS search
-    solution_data = mcts_search(problem)
+    time_budget = kwargs.pop("time_budget", 7200)
+    solution_data = mcts_search(problem, time_budget=time_budget * (1 - local_search_share), **kwargs)
+    solution_data, local_search = LocalSearch.improve(problem, solution_data, time_budget * local_search_share)
+    print(f"Local search: {local_search}")
     
     # Create solution object
     e_t_solution = ExamTimetablingSolution(problem, solution_data)
@@ -384,20 +426,8 @@ def run_monte_carlo(input_file, output_file):
                 file.write(f"{(booking.exam.number, booking.period.number, room_numbers)}\n")
             else:
                 file.write(f"{(booking.exam.number, booking.period.number, booking.rooms.number)}\n")
-        file.write(f"Hard constraints -> {e_t_solution.distance_to_feasibility()}\n")
-        file.write(f"Conflicting exams -> {e_t_solution.conflicting_exams()}\n")
-        file.write(f"Overbooked periods -> {e_t_solution.overbooked_periods()}\n")
-        file.write(f"Short Periods -> {e_t_solution.too_short_periods()}\n")
-        file.write(f"Period constraints -> {e_t_solution.period_constraint_violations()}\n")
-        file.write(f"Room constraints -> {e_t_solution.room_constraint_violations()}\n")
-        file.write(f"Soft constraints -> {e_t_solution.soft_constraint_violations()}\n")
-        file.write(f"Two in a row -> {e_t_solution.two_in_a_row_penalty()}\n")
-        file.write(f"Two in a day -> {e_t_solution.two_in_a_day_penalty()}\n")
-        file.write(f"Period spread -> {e_t_solution.period_spread_penalty()}\n")
-        file.write(f"Mixed durations -> {e_t_solution.mixed_durations_penalty()}\n")
-        file.write(f"Frontload -> {e_t_solution.frontload_penalty()}\n")
-        file.write(f"Period penalty -> {e_t_solution.period_penalty()}\n")
-        file.write(f"Room penalty -> {e_t_solution.room_penalty()}\n")
+        for line in e_t_solution.evaluate_all().lines():      # Every component is computed once
+            file.write(f"{line}\n")
 
 
 def main():
@@ -5,32 +5,23 @@ import sys
 sys.path.append('..')
 
 import rr.opt.mcts.simple as mcts
-from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester, BookingCodec, LocalSearch
 
-def run_monte_carlo(input_file, output_file, *args, **kwargs):
+def run_monte_carlo(input_file, output_file, *args, local_search_share=0.1, **kwargs):      # The last local_search_share of the time limit improves the soft cost of the best solution
     problem = ExamTimetablingProblem.from_file(input_file)
     mcts.config_logging(level="INFO")
     root = ITCTreeNode.root(problem)
-    sols = mcts.run(root, *args, **kwargs, time_limit=7200)
-    e_t_solution = ExamTimetablingSolution(problem, sols.best.data)
+    kwargs.setdefault("sols", mcts.Solutions(codec=BookingCodec(problem)))      # Incumbents are kept as compact deltas of period/room codes
+    sols = mcts.run(root, *args, **kwargs, time_limit=7200 * (1 - local_search_share))
+    data, local_search = LocalSearch.improve(problem, sols.best.data, 7200 * local_search_share, rng_seed=kwargs.get("rng_seed"))
+    mcts.info("Local search: {}".format(local_search))
+    e_t_solution = ExamTimetablingSolution(problem, data)
 
     with open(output_file, "w") as file:
-        for booking in sols.best.data:
+        for booking in data:
             file.write(f"{(booking.exam.number, booking.period.number, booking.room.number)}\n")
-        file.write(f"Hard constraints -> {e_t_solution.distance_to_feasibility()}\n")
-        file.write(f"Conflicting exams -> {e_t_solution.conflicting_exams()}\n")
-        file.write(f"Overbooked periods -> {e_t_solution.overbooked_periods()}\n")
-        file.write(f"Short Periods -> {e_t_solution.too_short_periods()}\n")
-        file.write(f"Period constraints -> {e_t_solution.period_constraint_violations()}\n")
-        file.write(f"Room constraints -> {e_t_solution.room_constraint_violations()}\n")
-        file.write(f"Soft constraints -> {e_t_solution.soft_constraint_violations()}\n")
-        file.write(f"Two in a row -> {e_t_solution.two_in_a_row_penalty()}\n")
-        file.write(f"Two in a day -> {e_t_solution.two_in_a_day_penalty()}\n")
-        file.write(f"Period spread -> {e_t_solution.period_spread_penalty()}\n")
-        file.write(f"Mixed durations -> {e_t_solution.mixed_durations_penalty()}\n")
-        file.write(f"Frontload -> {e_t_solution.frontload_penalty()}\n")
-        file.write(f"Period penalty -> {e_t_solution.period_penalty()}\n")
-        file.write(f"Room penalty -> {e_t_solution.room_penalty()}\n")
+        for line in e_t_solution.evaluate_all().lines():      # Every component is computed once
+            file.write(f"{line}\n")
 
 class ITCTreeNode(mcts.TreeNode):
     @classmethod
@@ -1,43 +1,38 @@
 import random
 import time
+import numpy as np
 
 import sys
 sys.path.append('..')
 
 import rr.opt.mcts.simple as mcts
-from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, FeasibilityTester, BookingCodec, BatchEvaluator, LocalSearch
 
-def run_monte_carlo(input_file, output_file, *args, **kwargs):
+def run_monte_carlo(input_file, output_file, *args, local_search_share=0.1, **kwargs):      # The last local_search_share of the time limit improves the soft cost of the best solution
     problem = ExamTimetablingProblem.from_file(input_file)
     mcts.config_logging(level="INFO")
     root = ITCTreeNode.root(problem)
-    sols = mcts.run(root, *args, **kwargs, time_limit=3600)
-    e_t_solution = ExamTimetablingSolution(problem, sols.best.data)
+    kwargs.setdefault("sols", mcts.Solutions(codec=BookingCodec(problem)))      # Incumbents are kept as compact deltas of period/room codes
+    sols = mcts.run(root, *args, **kwargs, time_limit=3600 * (1 - local_search_share))
+    data, local_search = LocalSearch.improve(problem, sols.best.data, 3600 * local_search_share, rng_seed=kwargs.get("rng_seed"))
+    mcts.info("Local search: {}".format(local_search))
+    e_t_solution = ExamTimetablingSolution(problem, data)
 
     with open(output_file, "w") as file:
-        file.write(f"{sols.best.data}\n")
-        file.write(f"Hard constraints -> {e_t_solution.distance_to_feasibility()}\n")
-        file.write(f"Conflicting exams -> {e_t_solution.conflicting_exams()}\n")
-        file.write(f"Overbooked periods -> {e_t_solution.overbooked_periods()}\n")
-        file.write(f"Short Periods -> {e_t_solution.too_short_periods()}\n")
-        file.write(f"Period constraints -> {e_t_solution.period_constraint_violations()}\n")
-        file.write(f"Room constraints -> {e_t_solution.room_constraint_violations()}\n")
-        file.write(f"Soft constraints -> {e_t_solution.soft_constraint_violations()}\n")
-        file.write(f"Two in a row -> {e_t_solution.two_in_a_row_penalty()}\n")
-        file.write(f"Two in a day -> {e_t_solution.two_in_a_day_penalty()}\n")
-        file.write(f"Period spread -> {e_t_solution.period_spread_penalty()}\n")
-        file.write(f"Mixed durations -> {e_t_solution.mixed_durations_penalty()}\n")
-        file.write(f"Frontload -> {e_t_solution.frontload_penalty()}\n")
-        file.write(f"Period penalty -> {e_t_solution.period_penalty()}\n")
-        file.write(f"Room penalty -> {e_t_solution.room_penalty()}\n")
+        file.write(f"{data}\n")
+        for line in e_t_solution.evaluate_all().lines():      # Every component is computed once
+            file.write(f"{line}\n")
 
 class ITCTreeNode(mcts.TreeNode):
+    ROLLOUTS = 100      # Random playouts scored together by each simulation
+
     @classmethod
     def root(cls, problem: ExamTimetablingProblem):
         root = cls()
         root.exams_left = problem.exams_by_clashes()
         root.exams_assigned = {}
         root.problem = problem
+        root.evaluator = BatchEvaluator(problem)
         root.upper_bound = None
         return root
 
@@ -46,6 +41,7 @@ class ITCTreeNode(mcts.TreeNode):
         clone.exams_left = list(self.exams_left)
         clone.exams_assigned = dict(self.exams_assigned)
         clone.problem = self.problem
+        clone.evaluator = self.evaluator
         clone.upper_bound = None
         return clone
 
@@ -71,16 +67,19 @@ class ITCTreeNode(mcts.TreeNode):
         room = random.choice(self.problem.rooms)
         self.exams_assigned[exam] = (period, room)
 
-    def simulate(self):
-        node = self.copy()
-        while len(node.exams_left) > 0:
-            node.apply(random.choice(node.problem.periods))  # monte carlo simulation
-        
-        solution = Solution(node.problem)
-        solution.fill(node.exams_assigned)
+    def simulate(self):      # Batch monte carlo simulation, the best of ROLLOUTS random completions is returned
+        periods = np.full(len(self.problem.exams), -1)
+        rooms = np.full(len(self.problem.exams), -1)
+        for exam, (period, room) in self.exams_assigned.items():
+            periods[exam.number] = period.number
+            rooms[exam.number] = room.number
+        rng = np.random.default_rng(random.getrandbits(64))      # Seeded from random, so rng_seed still reproduces runs
+        batch_periods, batch_rooms = self.evaluator.random_completions(rng, self.ROLLOUTS, periods, rooms)
+        scores = self.evaluator.distance_to_feasibility_period(batch_periods)
+        best = np.argmin(scores)
         return mcts.Solution(
-            value=(solution.calculate_score_periods()),
-            data=solution.dictionary_to_list(),
+            value=int(scores[best]),
+            data=self.evaluator.bookings(batch_periods[best], batch_rooms[best]),
         )
 
     #def bound(self):
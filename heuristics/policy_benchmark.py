@@ -0,0 +1,50 @@
+import csv
+import sys
+sys.path.append('..')
+
+import rr.opt.mcts.simple as mcts
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution
+from dsatur_monte import ITCTreeNode
+
+POLICIES = {      # Selection policies compared by the benchmark (None is the engine's default adapted UCT)
+    "default": None,
+    "uct": mcts.UCT(),
+    "ucb1-tuned": mcts.UCB1Tuned(),
+    "rank": mcts.RankBased(exploration_weight=0.01),
+    "thompson": mcts.ThompsonSampling(),
+    "puct": mcts.PUCT(),
+}
+
+def make_root(input_file):      # Fresh problem for each run, since node expansion updates the problem's room/period occupancy
+    return ITCTreeNode.root(ExamTimetablingProblem.from_file(input_file))
+
+def soft_cost(root, sol):      # Soft constraint violations of the best timetable, None if it is infeasible
+    if not sol.is_feas:
+        return None
+    return ExamTimetablingSolution(root.problem, sol.data).soft_constraint_violations()
+
+def run_benchmark(input_files, output_file, time_limit=300, repeats=1):
+    mcts.config_logging(level="INFO")
+    results = mcts.benchmark(input_files, make_root, POLICIES, repeats=repeats, evaluate=soft_cost, time_limit=time_limit)
+
+    with open(output_file, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(results[0]))
+        writer.writeheader()
+        for result in results:
+            writer.writerow({key: str(value) if key == "best" else value for key, value in result.items()})
+
+    for result in results:
+        first_feas = "-" if result["first_feas_time"] is None else f"{result['first_feas_time']:.1f}s (iter {result['first_feas_iter']})"
+        print(f"{result['instance']:>10} {result['policy']:>12} run {result['repeat']}: first feasible {first_feas}, best {result['best']}, soft cost {result['score']}")
+
+def main():
+    choice = input("Would you like to benchmark the selection policies on just one of the 12 datasets or all?\n")
+    time_limit = float(input("Time limit per run (seconds)?\n"))
+    if choice.lower() == "all":
+        input_files = {f"set{i}": f"../datasets/exam_comp_set{i}.exam" for i in range(1,13)}
+    else:
+        input_files = {f"set{choice.lower()}": f"../datasets/exam_comp_set{choice.lower()}.exam"}
+    run_benchmark(input_files, "../solutions/policy_benchmark.csv", time_limit=time_limit)
+
+if __name__ == "__main__":
+    main()
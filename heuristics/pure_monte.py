@@ -1,43 +1,38 @@
 import random
 import time
+import numpy as np
 
 import sys
 sys.path.append('..')
 
 import rr.opt.mcts.simple as mcts
-from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Solution, BookingCodec, BatchEvaluator, LocalSearch
 
-def run_monte_carlo(input_file, output_file, *args, **kwargs):
+def run_monte_carlo(input_file, output_file, *args, local_search_share=0.1, **kwargs):      # The last local_search_share of the time limit improves the soft cost of the best solution
     problem = ExamTimetablingProblem.from_file(input_file)
     solution = Solution(problem)
     mcts.config_logging(level="INFO")
     root = ITCTreeNode.root(solution)
-    sols = mcts.run(root, *args, **kwargs, time_limit=3600)
-    e_t_solution = ExamTimetablingSolution(problem, sols.best.data)
+    kwargs.setdefault("sols", mcts.Solutions(codec=BookingCodec(problem)))      # Incumbents are kept as compact deltas of period/room codes
+    sols = mcts.run(root, *args, **kwargs, time_limit=3600 * (1 - local_search_share))
+    data, local_search = LocalSearch.improve(problem, sols.best.data, 3600 * local_search_share, rng_seed=kwargs.get("rng_seed"))
+    mcts.info("Local search: {}".format(local_search))
+    e_t_solution = ExamTimetablingSolution(problem, data)
     
     with open(output_file, "w") as file:
-        file.write(f"{sols.best.data}\n")
-        file.write(f"Hard constraints -> {e_t_solution.distance_to_feasibility()}\n")
-        file.write(f"Conflicting exams -> {e_t_solution.conflicting_exams()}\n")
-        file.write(f"Overbooked periods -> {e_t_solution.overbooked_periods()}\n")
-        file.write(f"Short Periods -> {e_t_solution.too_short_periods()}\n")
-        file.write(f"Period constraints -> {e_t_solution.period_constraint_violations()}\n")
-        file.write(f"Room constraints -> {e_t_solution.room_constraint_violations()}\n")
-        file.write(f"Soft constraints -> {e_t_solution.soft_constraint_violations()}\n")
-        file.write(f"Two in a row -> {e_t_solution.two_in_a_row_penalty()}\n")
-        file.write(f"Two in a day -> {e_t_solution.two_in_a_day_penalty()}\n")
-        file.write(f"Period spread -> {e_t_solution.period_spread_penalty()}\n")
-        file.write(f"Mixed durations -> {e_t_solution.mixed_durations_penalty()}\n")
-        file.write(f"Frontload -> {e_t_solution.frontload_penalty()}\n")
-        file.write(f"Period penalty -> {e_t_solution.period_penalty()}\n")
-        file.write(f"Room penalty -> {e_t_solution.room_penalty()}\n")
+        file.write(f"{data}\n")
+        for line in e_t_solution.evaluate_all().lines():      # Every component is computed once
+            file.write(f"{line}\n")
 
 class ITCTreeNode(mcts.TreeNode):
+    ROLLOUTS = 100      # Random playouts scored together by each simulation
+
     @classmethod
     def root(cls, solution: Solution):
         root = cls()
         root.exams_left = solution.problem.exams_by_clashes()
         root.solution = solution
+        root.evaluator = BatchEvaluator(solution.problem)
         root.upper_bound = None
         return root
 
@@ -45,6 +40,7 @@ class ITCTreeNode(mcts.TreeNode):
         clone = mcts.TreeNode.copy(self)
         clone.exams_left = list(self.exams_left)
         clone.solution = self.solution
+        clone.evaluator = self.evaluator
         clone.upper_bound = None
         return clone
 
@@ -55,13 +51,22 @@ class ITCTreeNode(mcts.TreeNode):
         exam = self.exams_left.pop()
         self.solution.set_exam(period, random.choice(self.solution.problem.rooms), exam)
 
-    def simulate(self):
-        node = self.copy()
-        while len(node.exams_left) > 0:
-            node.apply(random.choice(node.solution.problem.periods))  # monte carlo simulation
+    def simulate(self):      # Batch monte carlo simulation, the best of ROLLOUTS random completions is returned
+        num_exams = len(self.solution.problem.exams)
+        periods = np.full(num_exams, -1)
+        rooms = np.full(num_exams, -1)
+        exams_left = set(self.exams_left)
+        for exam, (period, room) in self.solution.bookings.items():
+            if exam not in exams_left:
+                periods[exam.number] = period.number
+                rooms[exam.number] = room.number
+        rng = np.random.default_rng(random.getrandbits(64))      # Seeded from random, so rng_seed still reproduces runs
+        batch_periods, batch_rooms = self.evaluator.random_completions(rng, self.ROLLOUTS, periods, rooms)
+        scores = self.evaluator.distance_to_feasibility(batch_periods, batch_rooms)
+        best = np.argmin(scores)
         return mcts.Solution(
-            value=(node.solution.calculate_score()),
-            data=node.solution.dictionary_to_list(),
+            value=int(scores[best]),
+            data=self.evaluator.bookings(batch_periods[best], batch_rooms[best]),
         )
 
 
@@ -0,0 +1,306 @@
+import ast
+import time
+from typing import Dict, List, Optional, Tuple
+
+import sys
+sys.path.append('..')
+
+import rr.opt.mcts.simple as mcts
+from itc2007_framework import ExamTimetablingProblem, ExamTimetablingSolution, Booking, LocalSearch
+
+def run_tabu_search(input_file, output_file, time_limit=7200, initial_file=None, rng_seed=None, **kwargs):      # Standalone, or improving the solution file written by any other heuristic
+    problem = ExamTimetablingProblem.from_file(input_file)
+    mcts.config_logging(level="INFO")
+    bookings = read_bookings(problem, initial_file) if initial_file is not None else []
+    data, search = TabuSearch.improve(problem, bookings, time_limit, rng_seed=rng_seed, **kwargs)
+    mcts.info("Tabu search: {}".format(search))
+    e_t_solution = ExamTimetablingSolution(problem, data)
+
+    with open(output_file, "w") as file:
+        for booking in data:
+            if hasattr(booking.rooms, '__iter__') and not isinstance(booking.rooms, str):
+                room_numbers = [room.number for room in booking.rooms]
+                file.write(f"{(booking.exam.number, booking.period.number, room_numbers)}\n")
+            else:
+                file.write(f"{(booking.exam.number, booking.period.number, booking.rooms.number)}\n")
+        for line in e_t_solution.evaluate_all().lines():      # Every component is computed once
+            file.write(f"{line}\n")
+
+def read_bookings(problem: ExamTimetablingProblem, solution_file) -> List[Booking]:      # Bookings of a solution file with one (exam, period, rooms) tuple line per exam, as written by dsatur_monte, mcts, da_mcts and run_tabu_search, the report lines are skipped
+    bookings = []
+    with open(solution_file) as file:
+        for line in file:
+            if not line.startswith("("):
+                continue
+            exam, period, rooms = ast.literal_eval(line.strip())
+            rooms = [problem.rooms[room] for room in rooms] if isinstance(rooms, list) else problem.rooms[rooms]
+            bookings.append(Booking(problem.exams[exam], problem.periods[period], rooms))
+    if len(bookings) != len(problem.exams):      # Files holding a list of bookings on a single line (pure_monte, period_monte) can't be parsed
+        raise ValueError(f"{solution_file} has {len(bookings)} (exam, period, rooms) lines for {len(problem.exams)} exams.")
+    return bookings
+
+class TabuSearch(LocalSearch):      # Tabu search over (period, room) assignments from any complete, partial or empty timetable, reaching feasibility first and then minimizing the soft cost
+    SAMPLE_EXAMS = 10      # Exams sampled for the candidate list of each iteration, among the conflicting ones while the timetable is infeasible
+    SAMPLE_PERIODS = 4      # Period moves sampled for each exam, along with one room move, one ejection, one Kempe chain and one swap
+    TENURE_RANDOM = 10      # Tabu tenure of an (exam, period) attribute is randrange(TENURE_RANDOM) + TENURE_FACTOR * conflicting exams iterations, as in Tabucol
+    TENURE_FACTOR = 0.6
+
+    def __init__(self, problem: ExamTimetablingProblem, bookings: List[Booking], rng_seed: Optional[int] = None):
+        self.hard = 0      # Hard violations of the placed exams, updated by insert and remove
+        self.overflow = 0      # Seats booked beyond room capacities
+        self.capacities = [room.capacity for room in problem.rooms]
+        super().__init__(problem, bookings, rng_seed)
+        self.seat_weight = sum(self.students) / len(self.students)      # Overflowing seats worth one hard violation while infeasible, the average exam size
+        self.long_periods = [[period.number for period in problem.periods if period.duration >= exam.duration] or list(range(len(problem.periods)))
+                             for exam in problem.exams]      # Periods long enough for each exam, the only ones moves and construction use
+        self.groups: List[List[int]] = []      # EXAM_COINCIDENCE group of each exam, which period moves carry along
+        for exam in range(len(problem.exams)):      # Depth-first search of the EXAM_COINCIDENCE graph
+            group, stack = {exam}, [exam]
+            while stack:
+                for other in self.coincident[stack.pop()] - group:
+                    group.add(other)
+                    stack.append(other)
+            self.groups.append(sorted(group))
+
+        unplaced = {exam for exam in range(len(problem.exams)) if self.periods[exam] == self.unplaced}
+        blocked = {exam: {int(self.periods[other]) for other in self.neighbours[exam] if self.periods[other] != self.unplaced} for exam in unplaced}
+        while unplaced:      # Exams missing from the given timetable in DSatur order (most periods blocked by placed neighbours, then most neighbours), each at its least violating period
+            exam = max(unplaced, key=lambda e: (len(blocked[e]), len(self.neighbours[e])))
+            period, rooms = self.construct(exam)
+            self.insert(exam, period, rooms)
+            unplaced.discard(exam)
+            for other in self.neighbours[exam] & unplaced:
+                blocked[other].add(period)
+
+        self.conflicting = {exam for exam in range(len(problem.exams)) if self.violated(exam)}      # Exams involved in a hard violation, the only ones moved while infeasible
+        self.tabu: Dict[Tuple[int, int], int] = {}      # Iteration until which each (exam, period) attribute is tabu, set when the exam leaves the period
+        self.initial_hard, self.initial_cost = self.hard, self.cost
+        self.best_hard, self.best_cost = self.hard, self.cost
+        self.best = self.snapshot()
+        self.feasible_time = 0.0 if self.hard == 0 else None      # Seconds until the first feasible timetable
+
+    def __str__(self) -> str:
+        feasible_time = "-" if self.feasible_time is None else f"{self.feasible_time:.1f}s"
+        return (f"TabuSearch(initial=({self.initial_hard}, {self.initial_cost}), best=({self.best_hard}, {self.best_cost}), "
+                f"first feasible={feasible_time}, iterations={self.iterations}, elapsed={self.elapsed:.1f}s)")
+
+    def violations(self, exam: int, period: int, rooms: Tuple[int, ...]) -> int:      # Hard violations between an exam at (period, rooms) and the other placed exams, room sharing aside
+        violations = 2 * len(self.neighbours[exam] & self.period_exams[period])      # Conflicting exams (and EXCLUSION constraints), counted for both exams as in conflicting_exams
+        violations += self.durations[exam] > self.problem.periods[period].duration
+        for constraint in self.period_constraints.get(exam, ()):
+            other = constraint.exam_two if constraint.exam_one == exam else constraint.exam_one
+            other_period = int(self.periods[other])
+            if other_period == self.unplaced:
+                continue
+            if constraint.constraint_type == "EXAM_COINCIDENCE":
+                violations += other_period != period
+            elif constraint.constraint_type == "AFTER":      # Strictly after, as LocalSearch.feasible requires
+                one, two = (period, other_period) if constraint.exam_one == exam else (other_period, period)
+                violations += self.period_times[one] <= self.period_times[two]
+        if len(rooms) > 1:
+            violations += self.students[exam] > sum(self.capacities[room] for room in rooms)
+        return violations
+
+    def slot_violations(self, period: int, rooms: Tuple[int, ...]) -> int:      # Seating and room sharing violations in the given rooms of a period
+        violations = 0
+        for room in rooms:
+            slot = (period, room)
+            exams = self.slot_exams.get(slot)
+            if not exams:
+                continue
+            if len(exams) == 1:      # A multi-room exam alone in its rooms is checked against their total capacity by violations
+                exam = next(iter(exams))
+                violations += len(self.rooms[exam]) == 1 and self.students[exam] > self.capacities[room]
+                continue
+            violations += self.slot_seats[slot] > self.capacities[room]
+            violations += sum(1 for exam in exams if exam in self.exclusive or len(self.rooms[exam]) > 1)      # ROOM_EXCLUSIVE and multi-room exams must be alone
+        return violations
+
+    def excess(self, period: int, rooms: Tuple[int, ...]) -> int:      # Seats booked beyond capacity in the given rooms of a period (single-room bookings only)
+        if len(rooms) > 1:
+            return 0
+        return max(0, self.slot_seats.get((period, rooms[0]), 0) - self.capacities[rooms[0]])
+
+    def violated(self, exam: int) -> bool:      # Whether a placed exam is involved in any hard violation
+        period, rooms = int(self.periods[exam]), self.rooms[exam]
+        return self.violations(exam, period, rooms) > 0 or self.slot_violations(period, rooms) > 0
+
+    def insert(self, exam: int, period: int, rooms: Tuple[int, ...]) -> int:
+        before, excess = self.slot_violations(period, rooms), self.excess(period, rooms)
+        self.hard += self.violations(exam, period, rooms)
+        added = super().insert(exam, period, rooms)
+        self.hard += self.slot_violations(period, rooms) - before
+        self.overflow += self.excess(period, rooms) - excess
+        return added
+
+    def remove(self, exam: int) -> int:
+        period, rooms = int(self.periods[exam]), self.rooms[exam]
+        before, excess = self.slot_violations(period, rooms), self.excess(period, rooms)
+        removed = super().remove(exam)
+        self.hard -= self.violations(exam, period, rooms)
+        self.hard += self.slot_violations(period, rooms) - before
+        self.overflow += self.excess(period, rooms) - excess
+        return removed
+
+    def fitting_room(self, exam: int, period: int) -> Tuple[int, ...]:      # Room of a period with the least free seats that still fit the exam (the most free seats if none does)
+        best, best_key = None, None
+        for room, capacity in enumerate(self.capacities):
+            slot = (period, room)
+            others = self.slot_exams.get(slot)
+            if others and (exam in self.exclusive or not self.exclusive.isdisjoint(others)):
+                continue
+            free = capacity - self.slot_seats.get(slot, 0)
+            key = (free < self.students[exam], abs(free - self.students[exam]))
+            if best_key is None or key < best_key:
+                best, best_key = room, key
+        return (best,) if best is not None else (self.rng.randrange(len(self.capacities)),)
+
+    def target_rooms(self, exam: int, period: int) -> Tuple[int, ...]:      # Rooms of an exam moving to another period, its own if they still fit
+        rooms = self.rooms[exam]
+        if len(rooms) == 1 and self.slot_seats.get((period, rooms[0]), 0) + self.students[exam] > self.capacities[rooms[0]]:
+            return self.fitting_room(exam, period)
+        return rooms
+
+    def construct(self, exam: int) -> Tuple[int, Tuple[int, ...]]:      # (period, rooms) of an unplaced exam with the fewest added violations, then the least soft cost
+        best, best_key = None, None
+        for period in self.long_periods[exam]:
+            rooms = self.fitting_room(exam, period)
+            hard = self.hard
+            soft = self.insert(exam, period, rooms)
+            hard = self.hard - hard
+            self.remove(exam)
+            key = (hard, soft, self.rng.random())
+            if best_key is None or key < best_key:
+                best, best_key = (period, rooms), key
+        return best
+
+    def candidates(self) -> List[Tuple[Tuple[int, int, Tuple[int, ...]], ...]]:      # Candidate list of sampled moves, each a tuple of (exam, period, rooms) assignments
+        rng = self.rng
+        pool = list(self.conflicting) if self.conflicting else range(len(self.problem.exams))
+        candidates = []
+        for exam in rng.sample(pool, min(self.SAMPLE_EXAMS, len(pool))):
+            period, rooms = int(self.periods[exam]), self.rooms[exam]
+            for _ in range(self.SAMPLE_PERIODS):      # Period moves of the exam's coincidence group
+                target = rng.choice(self.long_periods[exam])
+                if target != period:
+                    candidates.append(tuple((member, target, self.target_rooms(member, target)) for member in self.groups[exam]))
+
+            room = (rng.randrange(len(self.problem.rooms)),)      # Room move
+            if room != rooms:
+                candidates.append(((exam, period, room),))
+
+            target = rng.choice(self.long_periods[exam])      # Ejection, a conflicting exam takes a period and its (at most two) clashing exams there go to random periods
+            blockers = self.neighbours[exam] & self.period_exams[target]
+            if exam in self.conflicting and target != period and 0 < len(blockers) <= 2:
+                move = [(exam, target, self.target_rooms(exam, target))]
+                for other in blockers:
+                    other_target = rng.choice(self.long_periods[other])
+                    move.append((other, other_target, self.target_rooms(other, other_target)))
+                candidates.append(tuple(move))
+
+            target = rng.choice(self.long_periods[exam])      # Kempe chain between the exam's period and another, each exam keeping its rooms if they still fit
+            if target != period:
+                chain = self.kempe_chain(exam, target)
+                member_targets = [(member, target if self.periods[member] == period else period) for member in chain]
+                candidates.append(tuple((member, member_target, self.target_rooms(member, member_target)) for member, member_target in member_targets))
+
+            target = rng.choice(self.long_periods[exam])      # Swap with an exam of another period, exchanging periods and rooms (single-room and multi-room exams alike, as in LocalSearch.step)
+            if target != period and self.period_exams[target]:
+                other = rng.choice(list(self.period_exams[target]))
+                if self.durations[other] <= self.problem.periods[period].duration and self.multi_room[exam] == self.multi_room[other]:
+                    candidates.append(((exam, target, self.rooms[other]), (other, period, rooms)))
+        return candidates
+
+    def delta(self, move: Tuple[Tuple[int, int, Tuple[int, ...]], ...]) -> Tuple[int, int, int]:      # (hard, soft, overflow) deltas of a move, the timetable is left unchanged
+        old = [(exam, int(self.periods[exam]), self.rooms[exam]) for exam, _, _ in move]
+        hard, cost, overflow = self.hard, self.cost, self.overflow
+        for exam, _, _ in move:
+            self.remove(exam)
+        for assignment in move:
+            self.insert(*assignment)
+        delta = (self.hard - hard, self.cost - cost, self.overflow - overflow)
+        for exam, _, _ in move:
+            self.remove(exam)
+        for assignment in old:
+            self.insert(*assignment)
+        return delta
+
+    def tabu_move(self, move: Tuple[Tuple[int, int, Tuple[int, ...]], ...]) -> bool:      # Whether a move puts any exam back in a period it left less than its tenure ago
+        return any(self.tabu.get((exam, period), -1) > self.iterations for exam, period, _ in move if period != self.periods[exam])
+
+    def apply(self, move: Tuple[Tuple[int, int, Tuple[int, ...]], ...]):      # Applies a move, makes each exam's old period tabu for it and updates the conflicting exams
+        old = [(exam, int(self.periods[exam]), self.rooms[exam]) for exam, _, _ in move]
+        for exam, _, _ in move:
+            self.remove(exam)
+        for assignment in move:
+            self.insert(*assignment)
+        affected = set()
+        for (exam, old_period, old_rooms), (_, period, rooms) in zip(old, move):
+            if period != old_period:
+                tenure = self.rng.randrange(self.TENURE_RANDOM) + int(self.TENURE_FACTOR * len(self.conflicting))
+                self.tabu[(exam, old_period)] = self.iterations + tenure
+            if rooms != old_rooms and len(rooms) == 1:      # Room moves book a single Room, as in LocalSearch.step
+                self.multi_room[exam] = False
+            affected.add(exam)
+            affected.update(self.neighbours[exam] & (self.period_exams[old_period] | self.period_exams[period]))
+            for constraint in self.period_constraints.get(exam, ()):
+                affected.update((constraint.exam_one, constraint.exam_two))
+            for room in old_rooms:
+                affected.update(self.slot_exams.get((old_period, room), ()))
+            for room in rooms:
+                affected.update(self.slot_exams.get((period, room), ()))
+        for exam in affected:
+            if self.violated(exam):
+                self.conflicting.add(exam)
+            else:
+                self.conflicting.discard(exam)
+
+    def step(self) -> bool:
+        # Applies the best non-tabu candidate, even if it worsens the timetable. A tabu candidate is allowed if it beats the best timetable
+        # (the aspiration criterion). Candidates are ranked by (hard, soft) once feasible; before that, by hard violations weighted with
+        # overflowing seats, ties broken at random
+        best, best_key = None, None
+        for move in self.candidates():
+            hard, soft, overflow = self.delta(move)
+            key = (self.hard + hard, self.cost + soft)
+            if self.tabu_move(move) and not key < (self.best_hard, self.best_cost):
+                continue
+            if self.best_hard > 0:
+                key = (key[0] * self.seat_weight + self.overflow + overflow, self.rng.random())
+            if best_key is None or key < best_key:
+                best, best_key = move, key
+        if best is None:
+            return False
+        self.apply(best)
+        return True
+
+    def run(self, time_limit: float, iter_limit: Optional[int] = None) -> List[Booking]:      # Runs for time_limit seconds and returns the best timetable, the least violating one until feasible
+        start = time.perf_counter()
+        while iter_limit is None or self.iterations < iter_limit:
+            if time.perf_counter() - start >= time_limit:
+                break
+            if self.step():
+                self.accepted += 1
+                if (self.hard, self.cost) < (self.best_hard, self.best_cost):
+                    self.best_hard, self.best_cost = self.hard, self.cost
+                    self.best = self.snapshot()
+                    if self.hard == 0 and self.feasible_time is None:
+                        self.feasible_time = self.elapsed + time.perf_counter() - start
+            self.iterations += 1
+
+        self.elapsed += time.perf_counter() - start
+        return self.bookings()
+
+def main():
+    choice = input("Would you like to run tabu search on just one of the 12 datasets or all?\n")
+    time_limit = float(input("Time limit per dataset (seconds)?\n"))
+    improve = input("Improve the existing solution files (yes/no)?\n").lower() == "yes"      # As written by any of the other heuristics
+    datasets = range(1,13) if choice.lower() == "all" else [choice.lower()]
+    for i in datasets:
+        print(f"Dataset {i}")
+        initial_file = f"../solutions/solution_{i}.txt" if improve else None
+        run_tabu_search(f"../datasets/exam_comp_set{i}.exam", f"../solutions/tabu_solution_{i}.txt", time_limit=time_limit,
+                        initial_file=initial_file, rng_seed=int(time.time()*1000))
+
+if __name__ == "__main__":
+    main()
@@ -12,5 +12,10 @@ from .exam_timetabling_problem import ExamTimetablingProblem
 from .exam_timetabling_solution import ExamTimetablingSolution
 from .solution import Solution
 from .feasibility_tester import FeasibilityTester
+from .booking_codec import BookingCodec
+from .hard_constraint_tracker import HardConstraintTracker
+from .batch_evaluator import BatchEvaluator
+from .evaluation_report import EvaluationReport
+from .local_search import LocalSearch
 
-__all__ = ["Exam", "Period", "Room", "PeriodHardConstraint", "RoomHardConstraint", "Booking", "InstitutionalWeighting", "ExamTimetablingProblem", "ExamTimetablingSolution", "Solution", "FeasibilityTester"]
+__all__ = ["Exam", "Period", "Room", "PeriodHardConstraint", "RoomHardConstraint", "Booking", "InstitutionalWeighting", "ExamTimetablingProblem", "ExamTimetablingSolution", "Solution", "FeasibilityTester", "BookingCodec", "HardConstraintTracker", "BatchEvaluator", "EvaluationReport", "LocalSearch"]
@@ -0,0 +1,160 @@
+import numpy as np
+from typing import Dict, List
+from .booking import Booking
+from .exam_timetabling_problem import ExamTimetablingProblem
+
+class BatchEvaluator:      # Vectorized evaluation of K complete timetables at once, given as K x E arrays of period and room numbers (one room per exam, as in random playouts)
+    HARD_COMPONENTS = ("conflicting_exams", "overbooked_periods", "too_short_periods", "period_constraint_violations", "room_constraint_violations")
+    SOFT_COMPONENTS = ("two_in_a_row_penalty", "two_in_a_day_penalty", "period_spread_penalty", "mixed_durations_penalty", "frontload_penalty", "period_penalty", "room_penalty")
+    CHUNK_SIZE = 256      # Timetables scored together by evaluate, bounding the size of the K x pairs temporaries
+
+    def __init__(self, problem: ExamTimetablingProblem):
+        self.problem = problem
+        self.clash_one, self.clash_two = np.nonzero(np.triu(problem.clash_matrix > 0, k=1))      # Clashing exam pairs (clash_matrix is symmetric, each pair counts twice)
+        self.clash_weights = problem.clash_matrix[self.clash_one, self.clash_two]      # Students shared by each clashing pair
+        self.students = np.array([len(exam.students) for exam in problem.exams])
+        self.exam_durations = np.array([exam.duration for exam in problem.exams])
+        self.period_durations = np.array([period.duration for period in problem.periods])
+        self.room_capacities = np.array([room.capacity for room in problem.rooms])
+
+        datetimes = sorted({period.get_datetime() for period in problem.periods})
+        self.period_times = np.array([datetimes.index(period.get_datetime()) for period in problem.periods])      # Chronological rank of each period
+        self.period_penalties = np.array([period.penalty for period in problem.periods])
+        self.room_penalties = np.array([room.penalty for room in problem.rooms])
+        durations = sorted({exam.duration for exam in problem.exams})
+        self.duration_ids = np.array([durations.index(exam.duration) for exam in problem.exams])      # Index of each exam's duration among the distinct durations
+
+        self.period_constraints = {}      # (exam_one, exam_two) number arrays of the period hard constraints of each type
+        for constraint_type in ("EXAM_COINCIDENCE", "EXCLUSION", "AFTER"):
+            constraints = problem.type_has_exams(constraint_type)
+            self.period_constraints[constraint_type] = (np.array([c.exam_one for c in constraints], dtype=int),
+                                                        np.array([c.exam_two for c in constraints], dtype=int))
+        self.exclusive_exams = [c.exam_number for c in problem.room_hard_constraints if c.constraint_type == "ROOM_EXCLUSIVE"]
+
+        self.weightings = problem.weightings
+        frontload = self.weightings.get("FRONTLOAD")
+        if frontload is not None:
+            largest_exams = sorted(problem.exams, key=lambda e: len(e.students), reverse=True)[:frontload.paramOne]
+            self.largest_exams = np.array([exam.number for exam in largest_exams], dtype=int)
+            self.last_periods = np.zeros(len(problem.periods), dtype=bool)      # Whether each period is one of the last paramTwo periods
+            self.last_periods[max(0, len(problem.periods) - frontload.paramTwo):] = True
+
+    def random_completions(self, rng: np.random.Generator, k: int, periods: np.ndarray, rooms: np.ndarray):      # K copies of a partial timetable (-1 marks unassigned exams), completed with uniformly random periods and rooms
+        free = np.flatnonzero(periods < 0)
+        batch_periods = np.repeat(periods[np.newaxis, :], k, axis=0)
+        batch_rooms = np.repeat(rooms[np.newaxis, :], k, axis=0)
+        batch_periods[:, free] = rng.integers(0, len(self.problem.periods), size=(k, len(free)))
+        batch_rooms[:, free] = rng.integers(0, len(self.problem.rooms), size=(k, len(free)))
+        return batch_periods, batch_rooms
+
+    def encode(self, bookings: List[Booking]):      # Period and room number arrays of one complete timetable, the inverse of bookings
+        periods = np.full(len(self.problem.exams), -1)
+        rooms = np.full(len(self.problem.exams), -1)
+        for booking in bookings:
+            periods[booking.exam.number] = booking.period.number
+            rooms[booking.exam.number] = booking.rooms.number
+        return periods, rooms
+
+    def bookings(self, periods: np.ndarray, rooms: np.ndarray) -> List[Booking]:      # Bookings of one timetable (a row of the batch)
+        problem = self.problem
+        return [Booking(exam, problem.periods[periods[exam.number]], problem.rooms[rooms[exam.number]]) for exam in problem.exams]
+
+    def conflicting_exams(self, periods: np.ndarray) -> np.ndarray:
+        return 2 * np.count_nonzero(periods[:, self.clash_one] == periods[:, self.clash_two], axis=1)
+
+    def too_short_periods(self, periods: np.ndarray) -> np.ndarray:
+        return np.count_nonzero(self.exam_durations > self.period_durations[periods], axis=1)
+
+    def period_constraint_violations(self, periods: np.ndarray) -> np.ndarray:
+        one, two = self.period_constraints["EXAM_COINCIDENCE"]
+        violations = np.count_nonzero(periods[:, one] != periods[:, two], axis=1)
+        one, two = self.period_constraints["EXCLUSION"]
+        violations += np.count_nonzero(periods[:, one] == periods[:, two], axis=1)
+        one, two = self.period_constraints["AFTER"]
+        violations += np.count_nonzero(self.period_times[periods[:, one]] < self.period_times[periods[:, two]], axis=1)
+        return violations
+
+    def overbooked_periods(self, rooms: np.ndarray) -> np.ndarray:
+        return np.count_nonzero(self.students > self.room_capacities[rooms], axis=1)
+
+    def room_constraint_violations(self, periods: np.ndarray, rooms: np.ndarray) -> np.ndarray:
+        violations = np.zeros(len(periods), dtype=int)
+        for exam_number in self.exclusive_exams:      # An exclusive exam is violated if any other exam shares its period and room
+            sharing = (periods == periods[:, exam_number, np.newaxis]) & (rooms == rooms[:, exam_number, np.newaxis])
+            violations += np.count_nonzero(sharing, axis=1) > 1
+        return violations
+
+    def period_pair_penalty(self, periods: np.ndarray, matrix: np.ndarray) -> np.ndarray:      # Sum of clash * matrix[p_one, p_two] over the clashing pairs of each timetable
+        return matrix[periods[:, self.clash_one], periods[:, self.clash_two]] @ self.clash_weights
+
+    def two_in_a_row_penalty(self, periods: np.ndarray) -> np.ndarray:
+        return self.period_pair_penalty(periods, self.problem.two_in_a_row_matrix)
+
+    def two_in_a_day_penalty(self, periods: np.ndarray) -> np.ndarray:
+        return self.period_pair_penalty(periods, self.problem.two_in_a_day_matrix)
+
+    def period_spread_penalty(self, periods: np.ndarray) -> np.ndarray:
+        return self.period_pair_penalty(periods, self.problem.period_spread_matrix)
+
+    def mixed_durations_penalty(self, periods: np.ndarray, rooms: np.ndarray) -> np.ndarray:      # Distinct (period, room, duration) minus distinct (period, room) is the sum of (durations - 1) over used rooms
+        weighting = self.weightings.get("NONMIXEDDURATIONS")
+        if weighting is None:
+            return np.zeros(len(periods), dtype=int)
+        slots = periods * len(self.problem.rooms) + rooms
+        slot_durations = slots * (self.duration_ids.max() + 1) + self.duration_ids
+        return (self._distinct(slot_durations) - self._distinct(slots)) * weighting.paramOne
+
+    @staticmethod
+    def _distinct(values: np.ndarray) -> np.ndarray:      # Number of distinct values in each row
+        ordered = np.sort(values, axis=1)
+        return 1 + np.count_nonzero(ordered[:, 1:] != ordered[:, :-1], axis=1)
+
+    def frontload_penalty(self, periods: np.ndarray) -> np.ndarray:
+        weighting = self.weightings.get("FRONTLOAD")
+        if weighting is None:
+            return np.zeros(len(periods), dtype=int)
+        return weighting.paramThree * np.count_nonzero(self.last_periods[periods[:, self.largest_exams]], axis=1)
+
+    def period_penalty(self, periods: np.ndarray) -> np.ndarray:
+        return self.period_penalties[periods].sum(axis=1)
+
+    def room_penalty(self, rooms: np.ndarray) -> np.ndarray:
+        return self.room_penalties[rooms].sum(axis=1)
+
+    def soft_constraint_violations(self, periods: np.ndarray, rooms: np.ndarray) -> np.ndarray:      # As ExamTimetablingSolution.soft_constraint_violations, for each timetable
+        return (self.two_in_a_row_penalty(periods) + self.two_in_a_day_penalty(periods) + self.period_spread_penalty(periods) +
+                self.mixed_durations_penalty(periods, rooms) + self.frontload_penalty(periods) + self.period_penalty(periods) +
+                self.room_penalty(rooms))
+
+    def components(self, periods: np.ndarray, rooms: np.ndarray) -> Dict[str, np.ndarray]:      # Every hard and soft component of each timetable, by ExamTimetablingSolution method name
+        return {
+            "conflicting_exams": self.conflicting_exams(periods),
+            "overbooked_periods": self.overbooked_periods(rooms),
+            "too_short_periods": self.too_short_periods(periods),
+            "period_constraint_violations": self.period_constraint_violations(periods),
+            "room_constraint_violations": self.room_constraint_violations(periods, rooms),
+            "two_in_a_row_penalty": self.two_in_a_row_penalty(periods),
+            "two_in_a_day_penalty": self.two_in_a_day_penalty(periods),
+            "period_spread_penalty": self.period_spread_penalty(periods),
+            "mixed_durations_penalty": self.mixed_durations_penalty(periods, rooms),
+            "frontload_penalty": self.frontload_penalty(periods),
+            "period_penalty": self.period_penalty(periods),
+            "room_penalty": self.room_penalty(rooms),
+        }
+
+    def evaluate(self, periods: np.ndarray, rooms: np.ndarray, chunk_size: int = None) -> Dict[str, np.ndarray]:      # Components plus hard and soft totals of N timetables, scored chunk_size at a time to bound memory
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        periods, rooms = np.atleast_2d(periods), np.atleast_2d(rooms)
+        chunks = [self.components(periods[start:start + chunk_size], rooms[start:start + chunk_size])
+                  for start in range(0, len(periods), chunk_size)]
+        results = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in self.HARD_COMPONENTS + self.SOFT_COMPONENTS}
+        results["distance_to_feasibility"] = sum(results[name] for name in self.HARD_COMPONENTS)
+        results["soft_constraint_violations"] = sum(results[name] for name in self.SOFT_COMPONENTS)
+        return results
+
+    def distance_to_feasibility_period(self, periods: np.ndarray) -> np.ndarray:      # As ExamTimetablingSolution.distance_to_feasibility_period, for each timetable
+        return self.conflicting_exams(periods) + self.too_short_periods(periods) + self.period_constraint_violations(periods)
+
+    def distance_to_feasibility(self, periods: np.ndarray, rooms: np.ndarray) -> np.ndarray:      # As ExamTimetablingSolution.distance_to_feasibility, for each timetable
+        return (self.distance_to_feasibility_period(periods) + self.overbooked_periods(rooms) +
+                self.room_constraint_violations(periods, rooms))
@@ -0,0 +1,39 @@
+from typing import Dict, List, Sequence, Tuple, Union
+from .booking import Booking
+from .exam_timetabling_problem import ExamTimetablingProblem
+
+class BookingCodec:      # Encodes lists of Bookings as flat int sequences, e.g. for the incumbents of rr.opt.mcts.simple.Solutions
+    UNASSIGNED = -1
+
+    def __init__(self, problem: ExamTimetablingProblem):
+        self.problem = problem
+        self.room_sets: List[Union[int, Tuple[int, ...]]] = []      # Distinct room assignments seen so far (a room number or a tuple of room numbers)
+        self.room_set_ids: Dict[Union[int, Tuple[int, ...]], int] = {}      # Index of each room assignment in room_sets
+
+    def room_set_id(self, rooms) -> int:      # Interns a booking's rooms, keeping whether they were a single Room or a list of Rooms
+        key = tuple(room.number for room in rooms) if hasattr(rooms, '__iter__') else rooms.number
+        room_set_id = self.room_set_ids.get(key)
+        if room_set_id is None:
+            room_set_id = self.room_set_ids[key] = len(self.room_sets)
+            self.room_sets.append(key)
+        return room_set_id
+
+    def encode(self, bookings: List[Booking]) -> List[int]:      # Code is [period of each exam] + [room set of each exam], by exam number
+        num_exams = len(self.problem.exams)
+        code = [self.UNASSIGNED] * (2 * num_exams)
+        for booking in bookings:
+            code[booking.exam.number] = booking.period.number
+            code[num_exams + booking.exam.number] = self.room_set_id(booking.rooms)
+        return code
+
+    def decode(self, code: Sequence[int]) -> List[Booking]:      # Rebuilds the Bookings of an encoded solution, in exam number order
+        num_exams = len(self.problem.exams)
+        bookings = []
+        for exam in self.problem.exams:
+            period_number = code[exam.number]
+            if period_number == self.UNASSIGNED:
+                continue
+            key = self.room_sets[code[num_exams + exam.number]]
+            rooms = [self.problem.rooms[number] for number in key] if isinstance(key, tuple) else self.problem.rooms[key]
+            bookings.append(Booking(exam, self.problem.periods[period_number], rooms))
+        return bookings
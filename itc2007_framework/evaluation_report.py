@@ -0,0 +1,41 @@
+from dataclasses import dataclass, fields
+from typing import List
+
+@dataclass(frozen=True)
+class EvaluationReport:      # Every hard and soft component of a solution, computed once by ExamTimetablingSolution.evaluate_all
+    conflicting_exams: int                  # Conflicting exams scheduled in the same period    (14)
+    overbooked_periods: int                 # Room over-occupancy                               (12)
+    too_short_periods: int                  # Period over-utilization                           (13)
+    period_constraint_violations: int       # Period-related constraint  violations             (15, 16, 17)
+    room_constraint_violations: int         # Room-related constraint violations                (18)
+    two_in_a_row_penalty: int               # Two exams in a row        (19)
+    two_in_a_day_penalty: int               # Two exams in a day        (20)
+    period_spread_penalty: int              # Period spread issues      (21)
+    mixed_durations_penalty: int            # Mixed durations           (23)
+    frontload_penalty: int                  # Large exam constraints    (26)
+    period_penalty: int                     # Period penalties          (27)
+    room_penalty: int                       # Room penalties            (28)
+
+    HARD_LABELS = ("Conflicting exams", "Overbooked periods", "Short Periods", "Period constraints", "Room constraints")
+    SOFT_LABELS = ("Two in a row", "Two in a day", "Period spread", "Mixed durations", "Frontload", "Period penalty", "Room penalty")
+
+    @property
+    def distance_to_feasibility(self) -> int:      # Number of hard constraint violations
+        return (self.conflicting_exams + self.overbooked_periods + self.too_short_periods +
+                self.period_constraint_violations + self.room_constraint_violations)
+
+    @property
+    def soft_constraint_violations(self) -> int:      # Number of soft constraint violations
+        return (self.two_in_a_row_penalty + self.two_in_a_day_penalty + self.period_spread_penalty + self.mixed_durations_penalty +
+                self.frontload_penalty + self.period_penalty + self.room_penalty)
+
+    def lines(self) -> List[str]:      # Report lines as written by the run_monte_carlo functions, "<component> -> <value>"
+        values = [getattr(self, field.name) for field in fields(self)]
+        hard, soft = values[:len(self.HARD_LABELS)], values[len(self.HARD_LABELS):]
+        return ([f"Hard constraints -> {self.distance_to_feasibility}"] +
+                [f"{label} -> {value}" for label, value in zip(self.HARD_LABELS, hard)] +
+                [f"Soft constraints -> {self.soft_constraint_violations}"] +
+                [f"{label} -> {value}" for label, value in zip(self.SOFT_LABELS, soft)])
+
+    def __str__(self) -> str:
+        return "\n".join(self.lines())
@@ -1,4 +1,5 @@
 import re
+import random
 import numpy as np
 from typing import List, Dict
 from datetime import date, time
@@ -19,6 +20,8 @@ class ExamTimetablingProblem:
         self.institutional_weightings = institutional_weightings      # Institutional weightings for soft constraints
         self.room_period_full_dictionary = self.dictionary_room_period()      # Dicionary to track fullness of room-period pairs
         self.period_capacity = self.calculate_period_capacities()      # Dicionary to track capacity of each period
+        self.zobrist_periods = None      # Random 64-bit keys for (exam, period) assignments, built on first use of assignment_hash
+        self.zobrist_rooms = None      # Random 64-bit keys for (exam, room) assignments, built on first use of assignment_hash
 
         # Initializing clash matrix
         num_exams = len(exams)
@@ -30,6 +33,13 @@ class ExamTimetablingProblem:
                     self.clash_matrix[i, j] = len(set(exam_one.students) & set(exam_two.students))
         
         self.exclusion_in_matrix()      # Filling clash_matrix with EXCLUSION constraint
+        self.clash_neighbours = [np.flatnonzero(row).tolist() for row in self.clash_matrix]      # Exams clashing with each exam (nonzero entries of its clash_matrix row)
+        self.weightings = self.weightings_by_type()      # First institutional weighting of each type, looked up once
+        self.two_in_a_row_matrix, self.two_in_a_day_matrix, self.period_spread_matrix = self.period_pair_matrices()
+        self.proximity_matrix = self.two_in_a_row_matrix + self.two_in_a_day_matrix + self.period_spread_matrix      # Weighted penalty per shared student of each pair of periods
+        self.student_groups = None      # Distinct exam sets of the students (STUDENT in ITC07.ipynb), built on first use of group_proximity_cost
+        self.student_group_sizes = None      # How many students share each group (sizeStudent in ITC07.ipynb)
+        self.student_group_exams = None      # Exam numbers of each group, padded with -1
         self.exams_exclusive()      # Updating all exclusive boolean of exams with EXCLUSIVE constraint
 
     @classmethod
@@ -235,6 +245,73 @@ class ExamTimetablingProblem:
             self.clash_matrix[constraint.exam_one, constraint.exam_two] += 1
             self.clash_matrix[constraint.exam_two, constraint.exam_one] += 1
 
+    def weightings_by_type(self) -> Dict[str, InstitutionalWeighting]:
+        weightings = {}
+        for weighting in self.institutional_weightings:
+            weightings.setdefault(weighting.weightingType, weighting)
+        return weightings
+
+    def period_pair_matrices(self):      # P x P penalties per shared student for TWOINAROW, TWOINADAY and PERIODSPREAD, zero where a weighting is not defined
+        numbers = np.array([period.number for period in self.periods])
+        dates = np.array([period.date.toordinal() for period in self.periods])
+        gap = np.abs(numbers[:, np.newaxis] - numbers[np.newaxis, :])
+        same_day = dates[:, np.newaxis] == dates[np.newaxis, :]
+
+        matrices = []
+        for weighting_type, pairs in (("TWOINAROW", same_day & (gap == 1)), ("TWOINADAY", same_day & (gap != 1))):
+            weighting = self.weightings.get(weighting_type)
+            matrices.append(pairs.astype(int) * (weighting.paramOne if weighting is not None else 0))
+        spread = self.weightings.get("PERIODSPREAD")
+        matrices.append(((gap > 0) & (gap <= spread.paramOne)).astype(int) if spread is not None else np.zeros_like(gap))      # Period spread costs one per shared student
+        return matrices
+
+    def proximity_cost(self, periods: np.ndarray, matrix: np.ndarray = None) -> int:      # Sum of clash[i, j] * matrix[p_i, p_j] over exam pairs, for an array of period numbers by exam number (default matrix is proximity_matrix)
+        matrix = self.proximity_matrix if matrix is None else matrix
+        return int(np.sum(np.triu(self.clash_matrix * matrix[np.ix_(periods, periods)], k=1)))
+
+    def proximity_delta(self, periods: np.ndarray, exam_number: int, period_number: int) -> int:      # Change in proximity_cost when one exam of a complete assignment moves to another period
+        old_row = self.proximity_matrix[periods[exam_number], periods]
+        new_row = self.proximity_matrix[period_number, periods]
+        return int(np.dot(self.clash_matrix[exam_number], new_row - old_row))
+
+    def group_students(self):      # Collapses students with identical exam sets into weighted groups, EXCLUSION marks in clash_matrix become groups of one pseudo-student
+        student_exams = {}
+        for exam in self.exams:
+            for student in set(exam.students):
+                student_exams.setdefault(student, []).append(exam.number)
+        group_sizes = {}
+        for exams in student_exams.values():
+            if len(exams) > 1:      # Students with a single exam never incur proximity penalties
+                group = tuple(sorted(exams))
+                group_sizes[group] = group_sizes.get(group, 0) + 1
+        for constraint in self.type_has_exams("EXCLUSION"):
+            group = tuple(sorted((constraint.exam_one, constraint.exam_two)))
+            group_sizes[group] = group_sizes.get(group, 0) + 1
+        return list(group_sizes), list(group_sizes.values())
+
+    def build_student_groups(self):      # Fills student_groups, student_group_sizes and the padded G x L student_group_exams array
+        self.student_groups, self.student_group_sizes = self.group_students()
+        self.student_group_exams = np.full((len(self.student_groups), max(map(len, self.student_groups), default=0)), -1, dtype=int)
+        for index, group in enumerate(self.student_groups):
+            self.student_group_exams[index, :len(group)] = group
+
+    def student_groups_cheaper(self) -> bool:      # Whether group_proximity_cost visits fewer (group, exam pair) entries than proximity_cost visits exam pairs
+        if self.student_group_exams is None:
+            self.build_student_groups()
+        num_groups, group_length = self.student_group_exams.shape
+        return num_groups * group_length * group_length < len(self.exams) * len(self.exams)
+
+    def group_proximity_cost(self, periods: np.ndarray, matrix: np.ndarray = None) -> int:      # proximity_cost evaluated per student group, sum of size * matrix[p_i, p_j] over the exam pairs of each group (exams with period -1 are skipped)
+        if self.student_group_exams is None:
+            self.build_student_groups()
+        matrix = self.proximity_matrix if matrix is None else matrix
+        exams = self.student_group_exams
+        group_periods = np.where(exams >= 0, np.asarray(periods)[exams], -1)
+        placed = group_periods >= 0
+        pairs = np.triu(placed[:, :, np.newaxis] & placed[:, np.newaxis, :], k=1)
+        costs = matrix[group_periods[:, :, np.newaxis], group_periods[:, np.newaxis, :]] * pairs
+        return int(np.dot(self.student_group_sizes, costs.sum(axis=(1, 2))))
+
     def room_exclusivity(self, exam: Exam) -> bool:
         return any(constraint for constraint in self.room_hard_constraints if constraint.exam_number == exam.number)
     
@@ -242,3 +319,21 @@ class ExamTimetablingProblem:
         exam_clashes = [(exam, np.sum(self.clash_matrix[i])) for i, exam in enumerate(self.exams)]
         sorted_exams = sorted(exam_clashes, key=lambda x: (not x[0].exclusive, -x[1]))
         return [exam for exam, _ in sorted_exams]
+
+    def build_zobrist_keys(self, seed: int = 2007):      # Draws one random 64-bit key per (exam, period) and (exam, room) pair
+        rng = random.Random(seed)
+        self.zobrist_periods = [[rng.getrandbits(64) for _ in self.periods] for _ in self.exams]
+        self.zobrist_rooms = [[rng.getrandbits(64) for _ in self.rooms] for _ in self.exams]
+
+    def assignment_hash(self, exam: Exam, period: Period, rooms) -> int:      # Zobrist key of an assignment, XOR-ing the keys of all assignments gives the hash of a (partial) timetable
+        if self.zobrist_periods is None:
+            self.build_zobrist_keys()
+
+        key = self.zobrist_periods[exam.number][period.number]
+        exam_rooms = self.zobrist_rooms[exam.number]
+        if hasattr(rooms, '__iter__'):
+            for room in rooms:
+                key ^= exam_rooms[room.number]
+        else:
+            key ^= exam_rooms[rooms.number]
+        return key
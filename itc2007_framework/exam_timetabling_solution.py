@@ -1,23 +1,45 @@
-from typing import List
+import numpy as np
+from typing import Dict, List, Optional, Tuple
 from .exam_timetabling_problem import ExamTimetablingProblem
 from .booking import Booking
+from .evaluation_report import EvaluationReport
+from .profiling import timed
 
 class ExamTimetablingSolution:
     def __init__(self, problem: ExamTimetablingProblem, bookings: List[Booking]): 
         self.problem = problem      # The problem to solve
         self.bookings = bookings    # List of bookings for this solution
 
+        # Indexes built once so that lookups are O(1)
+        self.exam_bookings: List[Optional[Booking]] = [None] * len(problem.exams)      # Booking of each exam, by exam number (None if not booked)
+        self.period_bookings: List[List[Booking]] = [[] for _ in problem.periods]      # Bookings in each period, by period number
+        self.room_bookings: Dict[Tuple[int, int], List[Booking]] = {}      # Bookings in each (period number, room number)
+        for booking in bookings:
+            if self.exam_bookings[booking.exam.number] is None:
+                self.exam_bookings[booking.exam.number] = booking
+            self.period_bookings[booking.period.number].append(booking)
+            for room in self.booking_rooms(booking):
+                self.room_bookings.setdefault((booking.period.number, room.number), []).append(booking)
+
+    @staticmethod
+    def booking_rooms(booking: Booking) -> List:        # Rooms of a booking as a list, whether it holds a single Room or a list of Rooms
+        if hasattr(booking.rooms, '__iter__') and not isinstance(booking.rooms, str):
+            return booking.rooms
+        return [booking.rooms]
+
     def __str__(self) -> str:       # String representation of bookings. Each line represents the period and and room of each exam with them appearing as in the input file
         output = []
         for exam_num in range(len(self.bookings)):
-            booking = next((b for b in self.bookings if b.exam.number == exam_num), None)
+            booking = self.exam_bookings[exam_num] if exam_num < len(self.exam_bookings) else None
             if booking is None:
                 raise RuntimeError("Unknown error: Booking not found for exam number.")
             
-            output.append(f"{booking.period.number},{booking.room.number}")
+            room_numbers = ",".join(str(room.number) for room in self.booking_rooms(booking))
+            output.append(f"{booking.period.number},{room_numbers}")
         
         return "\n".join(output)
 
+    @timed("evaluate.distance_to_feasibility")
     def distance_to_feasibility(self) -> int:   # Computation of number of hard constraint violations
         return (
             self.conflicting_exams() +                  # Conflicting exams scheduled in the same period    (14)
@@ -27,6 +49,7 @@ class ExamTimetablingSolution:
             self.room_constraint_violations()           # Room-related constraint violations                (18)
         )
     
+    @timed("evaluate.distance_to_feasibility_period")
     def distance_to_feasibility_period(self) -> int:   # Computation of number of hard constraint violations ignoring rooms
         return (
             self.conflicting_exams() +                  # Conflicting exams scheduled in the same period    (14)
@@ -34,6 +57,7 @@ class ExamTimetablingSolution:
             self.period_constraint_violations()         # Period-related constraint  violations             (15, 16, 17)
         )
 
+    @timed("evaluate.soft_constraint_violations")
     def soft_constraint_violations(self) -> int:    # Computation of number of soft constraint violations
         return (
             self.two_in_a_row_penalty() +       # Two exams in a row        (19)
@@ -45,27 +69,46 @@ class ExamTimetablingSolution:
             self.room_penalty()                 # Room penalties            (28)
         )
 
-    def conflicting_exams(self) -> int:                 # Returns the number of conflicting exams scheduled in the same period
-        conflits = 0
-        for booking_a in self.bookings:
-            for booking_b in self.bookings:
-                if booking_a.exam.number == booking_b.exam.number: 
-                    continue
+    def is_feasible(self) -> bool:      # Checks the hard constraints cheapest first, stopping at the first violated one
+        return not (self.too_short_periods() or self.overbooked_periods() or self.period_constraint_violations() or
+                    self.room_constraint_violations() or self.conflicting_exams())
+
+    def evaluate_tiered(self, softs: bool = False, exact: bool = True) -> Tuple[int, Optional[int]]:      # Hard violations, and soft violations only if feasible or softs is requested (None otherwise)
+        if exact:
+            hard = self.distance_to_feasibility()
+        else:      # Lower bound on distance_to_feasibility: the first violated hard component, cheapest first (0 exactly when feasible)
+            hard = (self.too_short_periods() or self.overbooked_periods() or self.period_constraint_violations() or
+                    self.room_constraint_violations() or self.conflicting_exams())
+        soft = self.soft_constraint_violations() if hard == 0 or softs else None
+        return hard, soft
+
+    def evaluate_all(self) -> EvaluationReport:      # Computes every hard and soft component once
+        return EvaluationReport(
+            conflicting_exams=self.conflicting_exams(),
+            overbooked_periods=self.overbooked_periods(),
+            too_short_periods=self.too_short_periods(),
+            period_constraint_violations=self.period_constraint_violations(),
+            room_constraint_violations=self.room_constraint_violations(),
+            two_in_a_row_penalty=self.two_in_a_row_penalty(),
+            two_in_a_day_penalty=self.two_in_a_day_penalty(),
+            period_spread_penalty=self.period_spread_penalty(),
+            mixed_durations_penalty=self.mixed_durations_penalty(),
+            frontload_penalty=self.frontload_penalty(),
+            period_penalty=self.period_penalty(),
+            room_penalty=self.room_penalty(),
+        )
 
-                period_clash = booking_a.period.number == booking_b.period.number       # Checking if both exams are in the same period
-                students_share = self.problem.clash_matrix[booking_a.exam.number][booking_b.exam.number] > 0        # Checking if there are students that are enrolled in both exams
-                if period_clash and students_share:     # If yes than conflits are increased
-                    conflits += 1
-        
-        return conflits
+    def conflicting_exams(self) -> int:                 # Returns the number of conflicting exams scheduled in the same period
+        exams = np.array([booking.exam.number for booking in self.bookings], dtype=int)
+        periods = np.array([booking.period.number for booking in self.bookings], dtype=int)
+        period_clash = periods[:, np.newaxis] == periods[np.newaxis, :]       # Checking which pairs of exams are in the same period
+        students_share = self.problem.clash_matrix[np.ix_(exams, exams)] > 0        # Checking which pairs of exams have students enrolled in both (the diagonal is zero)
+        return int(np.count_nonzero(period_clash & students_share))     # Each conflicting pair counts once for each of its exams
 
     def overbooked_periods(self) -> int:                # Returns the number of periods where seating capacity is exceeded
         overbooked = 0
         for booking in self.bookings:
-            if hasattr(booking.rooms, '__iter__') and not isinstance(booking.rooms, str):      # If booking.rooms is iterable (a list)
-                total_capacity = sum(room.capacity for room in booking.rooms)
-            else:
-                total_capacity = booking.rooms.capacity
+            total_capacity = sum(room.capacity for room in self.booking_rooms(booking))
             if len(booking.exam.students) > total_capacity:
                 overbooked += 1
         return overbooked
@@ -82,8 +125,8 @@ class ExamTimetablingSolution:
         period_violations = 0
         for constraint in self.problem.period_hard_constraints:
             # Finding the bookings associated with the exams in the constraint
-            booking_one = next((b for b in self.bookings if b.exam.number == constraint.exam_one), None)
-            booking_two = next((b for b in self.bookings if b.exam.number == constraint.exam_two), None)
+            booking_one = self.exam_bookings[constraint.exam_one]
+            booking_two = self.exam_bookings[constraint.exam_two]
 
             if booking_one is None or booking_two is None:      # Skips if one of the exams is not yet allocated
                 continue
@@ -106,71 +149,38 @@ class ExamTimetablingSolution:
         room_violations = 0
         for constraint in self.problem.room_hard_constraints:
             if constraint.constraint_type == "ROOM_EXCLUSIVE":
-                booking = next((b for b in self.bookings if b.exam.number == constraint.exam_number), None)    # Finding the booking associated with the exam in the constraint
+                booking = self.exam_bookings[constraint.exam_number]    # Finding the booking associated with the exam in the constraint
                 if booking is None:     # Skips if exam has not yet been placed
                     continue
-                
-                # Check if booking.rooms is iterable
-                if hasattr(booking.rooms, '__iter__') and not isinstance(booking.rooms, str):
-                    rooms_to_check = booking.rooms
-                else:
-                    rooms_to_check = [booking.rooms]
-
-                not_alone = False
-                for room in rooms_to_check:
-                    for b in self.bookings:
-                        if b.exam.number != booking.exam.number and b.period.number == booking.period.number:
-                            if hasattr(b.rooms, '__iter__') and not isinstance(b.rooms, str):
-                                if any(room.number == other_room.number for other_room in b.rooms):
-                                    not_alone = True
-                                    break
-                            else:
-                                if room.number == b.rooms.number:
-                                    not_alone = True
-                                    break
-                    if not_alone:
-                        break
+
+                not_alone = any(        # Checking if any other exam is booked in one of its rooms in the same period
+                    b.exam.number != booking.exam.number
+                    for room in self.booking_rooms(booking)
+                    for b in self.room_bookings[(booking.period.number, room.number)]
+                )
                 if not_alone:
                     room_violations += 1
         
         return room_violations
 
     def two_in_a_row_penalty(self) -> int:              # Returns the penalty for scheduling two exams consecutively, for students
-        row_penalty = 0
-        weighting = next((w for w in self.problem.institutional_weightings if w.weightingType == "TWOINAROW"), None)       # Finding the weighting
-        if weighting is None:       # If weight is not defined then penalty is 0
-            return 0
-        
-        for i, booking_a in enumerate(self.bookings):
-            for booking_b in self.bookings[i+1:]:
-
-                in_a_row = abs(booking_a.period.number - booking_b.period.number) == 1      # Checking if periods are next to each other
-                same_day = booking_a.period.date == booking_b.period.date       # Checking if date is the same
-
-                if in_a_row and same_day:       # If exams are on neighboring periods and in the same day, then the penalty is added with the number of students in both exams multiplying by the weighting parameter
-                    row_penalty += weighting.paramOne * self.problem.clash_matrix[booking_a.exam.number][booking_b.exam.number]
-
-        return row_penalty
+        return self.period_pair_penalty(self.problem.two_in_a_row_matrix)
 
     def two_in_a_day_penalty(self) -> int:              # Returns the penalty for scheduling two exams on the same day
-        day_penalty = 0
-        weighting = next((w for w in self.problem.institutional_weightings if w.weightingType == "TWOINADAY"), None)       # Finding the weighting
-        if weighting is None:       # If weight is not defined then penalty is 0
-            return 0
-        
-        for i, booking_a in enumerate(self.bookings):
-            for booking_b in self.bookings[i+1:]:
-
-                not_in_a_row = abs(booking_a.period.number - booking_b.period.number) != 1      # Checking if periods are not next to each other
-                same_day = booking_a.period.date == booking_b.period.date       # Checking if date is the same
-                if not_in_a_row and same_day:       # If exams are on not neighboring periods but in the same day, then the penalty is added with the number of students in both exams multiplying by the weighting parameter
-                    day_penalty += weighting.paramOne * self.problem.clash_matrix[booking_a.exam.number][booking_b.exam.number]
+        return self.period_pair_penalty(self.problem.two_in_a_day_matrix)
 
-        return day_penalty
+    def period_pair_penalty(self, matrix) -> int:       # Sums clash_matrix[a, b] * matrix[period a, period b] over every pair of booked exams
+        if self.problem.student_groups_cheaper():      # Per student group on problems whose students share few, short exam sets
+            periods = np.array([-1 if booking is None else booking.period.number for booking in self.exam_bookings], dtype=int)
+            return self.problem.group_proximity_cost(periods, matrix)
+        exams = np.array([booking.exam.number for booking in self.bookings], dtype=int)
+        periods = np.array([booking.period.number for booking in self.bookings], dtype=int)
+        clashes = self.problem.clash_matrix[np.ix_(exams, exams)]       # Students shared by each pair of booked exams
+        return int(np.sum(np.triu(clashes * matrix[np.ix_(periods, periods)], k=1)))
 
     def frontload_penalty(self) -> int:                 # Returns the penalty for frontloading large exams
         load_penalty = 0
-        weighting = next((w for w in self.problem.institutional_weightings if w.weightingType == "FRONTLOAD"), None)       # Finding the weighting
+        weighting = self.problem.weightings.get("FRONTLOAD")       # Finding the weighting
         if weighting is None:       # If weight is not defined then penalty is 0
             return 0
         
@@ -181,7 +191,7 @@ class ExamTimetablingSolution:
         last_periods = self.problem.periods[last_periods_index:]
 
         for exam in largest_exams:
-            exam_booked = next((b for b in self.bookings if b.exam.number == exam.number), None)        # Checking if exam is already booked
+            exam_booked = self.exam_bookings[exam.number]        # Checking if exam is already booked
             if exam_booked is None:      # If not skip
                 continue
             
@@ -192,52 +202,23 @@ class ExamTimetablingSolution:
 
     def mixed_durations_penalty(self) -> int:           # Returns the penalty for mixed exam durations in the same period
         mixed_penalty = 0
-        weighting = next((w for w in self.problem.institutional_weightings if w.weightingType == "NONMIXEDDURATIONS"), None)       # Finding the weighting
+        weighting = self.problem.weightings.get("NONMIXEDDURATIONS")       # Finding the weighting
         if weighting is None:       # If weight is not defined then penalty is 0
             return 0
         
-        for period in self.problem.periods:
-            for room in self.problem.rooms:
-                room_period_bookings = []      # Getting all bookings in the same period and room
-                for booking in self.bookings:
-                    if booking.period.number == period.number:
-                        if hasattr(booking.rooms, '__iter__') and not isinstance(booking.rooms, str):
-                            if any(r.number == room.number for r in booking.rooms):
-                                room_period_bookings.append(booking)
-                        else:
-                            if booking.rooms.number == room.number:
-                                room_period_bookings.append(booking)
-                if not room_period_bookings:        # Skipping if no exam is booked
-                    continue
-
-                unique_durations = {b.exam.duration for b in room_period_bookings}      # Getting unique durations from exams
-                num_unique_durations = len(unique_durations)
-                mixed_penalty += (num_unique_durations - 1) * weighting.paramOne    # If unique durations is above 1 then penalty is applied
+        for room_period_bookings in self.room_bookings.values():       # Bookings in each used period and room
+            unique_durations = {b.exam.duration for b in room_period_bookings}      # Getting unique durations from exams
+            num_unique_durations = len(unique_durations)
+            mixed_penalty += (num_unique_durations - 1) * weighting.paramOne    # If unique durations is above 1 then penalty is applied
         return mixed_penalty
 
     def period_spread_penalty(self) -> int:             # Returns the penalty for scheduling exams too closely together
-        spread_penalty = 0
-        weighting = next((w for w in self.problem.institutional_weightings if w.weightingType == "PERIODSPREAD"), None)       # Finding the weighting
-        if weighting is None:       # If weight is not defined then penalty is 0
-            return 0
-        
-        for booking_a in self.bookings:
-            for booking_b in self.bookings:
-                spread = booking_b.period.number - booking_a.period.number
-                if spread <= 0:     # Ignoring cases where exams are in the same period or earlier
-                    continue
-                
-                if spread <= weighting.paramOne:
-                    spread_penalty += self.problem.clash_matrix[booking_a.exam.number][booking_b.exam.number]
-        return spread_penalty
+        return self.period_pair_penalty(self.problem.period_spread_matrix)
 
     def room_penalty(self) -> int:                      # Returns the penalty for room-related soft constraint violations
         r_penalty = 0
         for booking in self.bookings:
-            if hasattr(booking.rooms, '__iter__') and not isinstance(booking.rooms, str):
-                r_penalty += sum(room.penalty for room in booking.rooms)
-            else:
-                r_penalty += booking.rooms.penalty
+            r_penalty += sum(room.penalty for room in self.booking_rooms(booking))
         return r_penalty
 
     def period_penalty(self) -> int:                    # Returns the penalty for period-related soft constraint violations
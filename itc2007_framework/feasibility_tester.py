@@ -3,11 +3,13 @@ from .period import Period
 from .room import Room
 from .exam_timetabling_problem import ExamTimetablingProblem
 from .solution import Solution 
+from .profiling import timed
 
 class FeasibilityTester:
     def __init__(self, problem: ExamTimetablingProblem):
         self.problem = problem
 
+    @timed("feasibility.feasible_period")
     def feasible_period(self, solution: Solution, assign_exam: Exam, period: Period) -> bool:
         exams = self.problem.exams_with_coincidence(assign_exam)
         if not all(exam.duration <= period.duration for exam in exams):      # Checking if assign_exam or any exam linked by EXAM_COINCIDENCE surpass period's length
@@ -31,6 +33,7 @@ class FeasibilityTester:
 
         return True
     
+    @timed("feasibility.feasible_room")
     def feasible_room(self, solution: Solution, assign_exam: Exam, period: Period, room: Room) -> bool:
         capacity = self.current_room_capacity(solution, period, room)
         if len(assign_exam.students) > capacity:      # Checking if exam can fit in room
@@ -45,6 +48,7 @@ class FeasibilityTester:
             
         return True
     
+    @timed("feasibility.feasible_rooms")
     def feasible_rooms(self, solution: Solution, assign_exam: Exam, period: Period, room: Room) -> bool:
         capacity = self.current_room_capacity(solution, period, room)
         if self.problem.room_exclusivity(assign_exam) and capacity != room.capacity:      # Checks if exam has room constraint and is fully available
@@ -0,0 +1,86 @@
+from typing import Dict, List, Set, Tuple
+from .exam import Exam
+from .period import Period
+from .period_hard_constraint import PeriodHardConstraint
+from .exam_timetabling_problem import ExamTimetablingProblem
+
+class HardConstraintTracker:      # Incrementally counts hard constraint violations, as ExamTimetablingSolution.distance_to_feasibility does, while exams are placed one at a time
+    def __init__(self, problem: ExamTimetablingProblem):
+        self.problem = problem
+        self.violations = 0      # Current distance to feasibility of the placed exams
+        self.exam_periods: Dict[int, Period] = {}      # Period of each placed exam, by exam number
+        self.period_exams: List[List[int]] = [[] for _ in problem.periods]      # Numbers of the exams placed in each period, by period number
+        self.room_exams: Dict[Tuple[int, int], List[int]] = {}      # Numbers of the exams placed in each (period number, room number)
+        self.not_alone: Set[int] = set()      # Placed ROOM_EXCLUSIVE exams that share a room with another exam
+        # Constraint indexes, shared by all copies
+        self.period_constraints: Dict[int, List[PeriodHardConstraint]] = {}      # Period hard constraints involving each exam
+        for constraint in problem.period_hard_constraints:
+            for exam_number in {constraint.exam_one, constraint.exam_two}:
+                self.period_constraints.setdefault(exam_number, []).append(constraint)
+        self.exclusive_counts: Dict[int, int] = {}      # Number of ROOM_EXCLUSIVE constraints of each exam
+        for constraint in problem.room_hard_constraints:
+            if constraint.constraint_type == "ROOM_EXCLUSIVE":
+                self.exclusive_counts[constraint.exam_number] = self.exclusive_counts.get(constraint.exam_number, 0) + 1
+
+    def copy(self) -> "HardConstraintTracker":
+        clone = HardConstraintTracker.__new__(HardConstraintTracker)
+        clone.problem = self.problem
+        clone.violations = self.violations
+        clone.exam_periods = dict(self.exam_periods)
+        clone.period_exams = [list(exams) for exams in self.period_exams]
+        clone.room_exams = {key: list(exams) for key, exams in self.room_exams.items()}
+        clone.not_alone = set(self.not_alone)
+        clone.period_constraints = self.period_constraints
+        clone.exclusive_counts = self.exclusive_counts
+        return clone
+
+    def fill(self, dictionary) -> int:      # Places all exams of an {exam: (period, rooms)} dictionary, returns the resulting violations
+        for exam, (period, rooms) in dictionary.items():
+            self.place(exam, period, rooms)
+        return self.violations
+
+    def place(self, exam: Exam, period: Period, rooms) -> int:      # Books an exam and returns the number of violations it adds, in O(exams in the period + constraints of the exam)
+        exam_number = exam.number
+        rooms = rooms if hasattr(rooms, '__iter__') else [rooms]
+        self.exam_periods[exam_number] = period
+        added = 0
+
+        # Conflicting exams, counted once for each of the two exams in a clashing pair
+        clashes = self.problem.clash_matrix[exam_number]
+        added += 2 * sum(1 for other in self.period_exams[period.number] if clashes[other] > 0)
+        self.period_exams[period.number].append(exam_number)
+
+        # Room over-occupancy and period over-utilization
+        if len(exam.students) > sum(room.capacity for room in rooms):
+            added += 1
+        if exam.duration > period.duration:
+            added += 1
+
+        # Period-related constraints whose two exams are now placed
+        for constraint in self.period_constraints.get(exam_number, ()):
+            period_one = self.exam_periods.get(constraint.exam_one)
+            period_two = self.exam_periods.get(constraint.exam_two)
+            if period_one is None or period_two is None:
+                continue
+            if constraint.constraint_type == "EXAM_COINCIDENCE":
+                added += period_one.number != period_two.number
+            elif constraint.constraint_type == "EXCLUSION":
+                added += period_one.number == period_two.number
+            elif constraint.constraint_type == "AFTER":
+                added += period_one.get_datetime() < period_two.get_datetime()
+
+        # Room-related constraints, an exclusive exam is violated once it shares any of its rooms
+        sharing = set()
+        for room in rooms:
+            exams = self.room_exams.setdefault((period.number, room.number), [])
+            sharing.update(exams)
+            exams.append(exam_number)
+        sharing.discard(exam_number)
+        if sharing:
+            for other in sharing | {exam_number}:
+                if other in self.exclusive_counts and other not in self.not_alone:
+                    self.not_alone.add(other)
+                    added += self.exclusive_counts[other]
+
+        self.violations += added
+        return added
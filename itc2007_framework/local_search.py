@@ -0,0 +1,302 @@
+import math
+import random
+import time
+import numpy as np
+from typing import Dict, List, Optional, Set, Tuple
+from .booking import Booking
+from .exam_timetabling_problem import ExamTimetablingProblem
+from .exam_timetabling_solution import ExamTimetablingSolution
+
+class LocalSearch:      # Improves the soft cost of a feasible timetable with period moves, room moves, exam swaps and Kempe chains, evaluated incrementally, never breaking a hard constraint
+    MOVES = ("period", "room", "swap", "kempe")
+    MOVE_WEIGHTS = (0.3, 0.2, 0.2, 0.3)      # Probability of trying each move
+
+    def __init__(self, problem: ExamTimetablingProblem, bookings: List[Booking], rng_seed: Optional[int] = None):
+        self.problem = problem
+        self.given = bookings
+        self.rng = random.Random(rng_seed)
+        num_exams, num_periods = len(problem.exams), len(problem.periods)
+        self.improvable = len(bookings) == num_exams and ExamTimetablingSolution(problem, bookings).is_feasible()      # Incomplete or infeasible timetables are left untouched
+
+        # Problem data as plain lists and arrays
+        self.unplaced = num_periods      # Sentinel period of an exam taken out of the timetable
+        self.proximity = np.zeros((num_periods + 1, num_periods + 1), dtype=int)      # problem.proximity_matrix with a zero row and column for the sentinel
+        self.proximity[:num_periods, :num_periods] = problem.proximity_matrix
+        self.students = [len(exam.students) for exam in problem.exams]
+        self.durations = [exam.duration for exam in problem.exams]
+        self.neighbours: List[Set[int]] = [set(neighbours) for neighbours in problem.clash_neighbours]
+        self.neighbour_numbers = [np.array(neighbours, dtype=int) for neighbours in problem.clash_neighbours]      # As arrays, with the clash_matrix weight of each neighbour
+        self.neighbour_clashes = [problem.clash_matrix[exam.number, numbers] for exam, numbers in zip(problem.exams, self.neighbour_numbers)]
+        datetimes = sorted({period.get_datetime() for period in problem.periods})
+        self.period_times = [datetimes.index(period.get_datetime()) for period in problem.periods]      # Chronological rank of each period
+        self.period_constraints: Dict[int, list] = {}      # Period hard constraints involving each exam
+        for constraint in problem.period_hard_constraints:
+            for exam_number in {constraint.exam_one, constraint.exam_two}:
+                self.period_constraints.setdefault(exam_number, []).append(constraint)
+        self.coincident: List[Set[int]] = [set() for _ in problem.exams]      # EXAM_COINCIDENCE partners of each exam, which Kempe chains move along
+        for constraint in problem.type_has_exams("EXAM_COINCIDENCE"):
+            self.coincident[constraint.exam_one].add(constraint.exam_two)
+            self.coincident[constraint.exam_two].add(constraint.exam_one)
+        self.exclusive = {c.exam_number for c in problem.room_hard_constraints if c.constraint_type == "ROOM_EXCLUSIVE"}
+        frontload = problem.weightings.get("FRONTLOAD")
+        self.frontload_exams = set()
+        self.last_periods = [False] * num_periods
+        if frontload is not None:
+            largest_exams = sorted(problem.exams, key=lambda e: len(e.students), reverse=True)[:frontload.paramOne]
+            self.frontload_exams = {exam.number for exam in largest_exams}
+            for index in range(max(0, num_periods - frontload.paramTwo), num_periods):
+                self.last_periods[index] = True
+        self.frontload_penalty = frontload.paramThree if frontload is not None else 0
+        mixed = problem.weightings.get("NONMIXEDDURATIONS")
+        self.mixed_penalty = mixed.paramOne if mixed is not None else 0
+
+        # Timetable state
+        self.periods = np.full(num_exams, self.unplaced, dtype=int)      # Period number of each exam
+        self.rooms: List[Tuple[int, ...]] = [()] * num_exams      # Room numbers of each exam
+        self.multi_room = [False] * num_exams      # Whether each exam was booked with a list of rooms
+        self.period_exams: List[Set[int]] = [set() for _ in problem.periods]      # Exams in each period
+        self.slot_exams: Dict[Tuple[int, int], Set[int]] = {}      # Exams in each (period, room)
+        self.slot_seats: Dict[Tuple[int, int], int] = {}      # Students seated in each (period, room), as FeasibilityTester.current_room_capacity counts them
+        self.slot_durations: Dict[Tuple[int, int], Dict[int, int]] = {}      # Number of exams of each duration in each (period, room)
+        self.cost = 0
+        for booking in bookings:
+            rooms = ExamTimetablingSolution.booking_rooms(booking)
+            self.multi_room[booking.exam.number] = rooms is booking.rooms
+            self.insert(booking.exam.number, booking.period.number, tuple(room.number for room in rooms))
+
+        self.initial_cost = self.best_cost = self.cost
+        self.best = self.snapshot()
+        self.iterations = 0
+        self.accepted = 0
+        self.elapsed = 0.0
+        # Acceptance schedule, set by run
+        self.schedule = None
+        self.history: List[int] = []      # Late acceptance: costs of the last history_length iterations
+        self.temperature = 0.0      # Simulated annealing: current temperature
+
+    @classmethod
+    def improve(cls, problem: ExamTimetablingProblem, bookings: List[Booking], time_limit: float, rng_seed: Optional[int] = None, **kwargs):
+        # Post-optimisation stage of the run_monte_carlo functions, returns the improved bookings (the given ones if infeasible) and the search
+        search = cls(problem, bookings, rng_seed)
+        return search.run(time_limit, **kwargs), search
+
+    def __str__(self) -> str:
+        return (f"LocalSearch(initial={self.initial_cost}, best={self.best_cost}, iterations={self.iterations}, "
+                f"accepted={self.accepted}, elapsed={self.elapsed:.1f}s)")
+
+    def snapshot(self) -> Tuple[np.ndarray, List[Tuple[int, ...]], List[bool]]:      # Copy of the current timetable, as kept in self.best: periods, rooms and multi_room flags
+        return self.periods.copy(), list(self.rooms), list(self.multi_room)
+
+    def contribution(self, exam: int, period: int, rooms: Tuple[int, ...]) -> int:      # Soft cost added by placing an exam at (period, rooms), given the other placed exams
+        problem = self.problem
+        cost = int(np.dot(self.neighbour_clashes[exam], self.proximity[period, self.periods[self.neighbour_numbers[exam]]]))      # Two in a row, two in a day and period spread, over the clashing exams only
+        cost += problem.periods[period].penalty + sum(problem.rooms[room].penalty for room in rooms)
+        if exam in self.frontload_exams and self.last_periods[period]:
+            cost += self.frontload_penalty
+        for room in rooms:
+            durations = self.slot_durations.get((period, room))
+            if durations and self.durations[exam] not in durations:      # A new duration in a used room
+                cost += self.mixed_penalty
+        return cost
+
+    def insert(self, exam: int, period: int, rooms: Tuple[int, ...]) -> int:      # Places an exam and returns the soft cost it adds
+        added = self.contribution(exam, period, rooms)
+        self.periods[exam] = period
+        self.rooms[exam] = rooms
+        self.period_exams[period].add(exam)
+        for room in rooms:
+            slot = (period, room)
+            self.slot_exams.setdefault(slot, set()).add(exam)
+            self.slot_seats[slot] = self.slot_seats.get(slot, 0) + self.students[exam]
+            durations = self.slot_durations.setdefault(slot, {})
+            durations[self.durations[exam]] = durations.get(self.durations[exam], 0) + 1
+        self.cost += added
+        return added
+
+    def remove(self, exam: int) -> int:      # Takes an exam out of the timetable and returns the soft cost it removes
+        period, rooms = int(self.periods[exam]), self.rooms[exam]
+        self.periods[exam] = self.unplaced
+        self.period_exams[period].discard(exam)
+        for room in rooms:
+            slot = (period, room)
+            self.slot_exams[slot].discard(exam)
+            self.slot_seats[slot] -= self.students[exam]
+            durations = self.slot_durations[slot]
+            durations[self.durations[exam]] -= 1
+            if durations[self.durations[exam]] == 0:
+                del durations[self.durations[exam]]
+        removed = self.contribution(exam, period, rooms)
+        self.cost -= removed
+        return removed
+
+    def feasible(self, exam: int, period: int, rooms: Tuple[int, ...]) -> bool:      # Whether an unplaced exam can be placed at (period, rooms) without any hard violation
+        if self.durations[exam] > self.problem.periods[period].duration:
+            return False
+        if not self.neighbours[exam].isdisjoint(self.period_exams[period]):      # Clashing exams (and EXCLUSION constraints, marked in clash_matrix)
+            return False
+        for constraint in self.period_constraints.get(exam, ()):
+            other = constraint.exam_two if constraint.exam_one == exam else constraint.exam_one
+            other_period = int(self.periods[other])
+            if other_period == self.unplaced:
+                continue
+            if constraint.constraint_type == "EXAM_COINCIDENCE" and other_period != period:
+                return False
+            if constraint.constraint_type == "AFTER":      # exam_one strictly after exam_two, as FeasibilityTester requires
+                one, two = (period, other_period) if constraint.exam_one == exam else (other_period, period)
+                if self.period_times[one] <= self.period_times[two]:
+                    return False
+
+        capacity = 0
+        for room in rooms:
+            slot = (period, room)
+            others = self.slot_exams.get(slot)
+            if others and (exam in self.exclusive or not self.exclusive.isdisjoint(others)):      # ROOM_EXCLUSIVE exams are alone in their rooms
+                return False
+            if len(rooms) > 1 and others:      # Multi-room bookings only use empty rooms
+                return False
+            capacity += self.problem.rooms[room].capacity - self.slot_seats.get(slot, 0)
+        return capacity >= self.students[exam]
+
+    def accept(self, delta: int) -> bool:      # Whether to keep a feasible move, self.cost being the cost after it
+        if delta <= 0:
+            return True
+        if self.schedule == "late_acceptance":
+            return self.cost <= self.history[self.iterations % len(self.history)]
+        if self.schedule == "annealing":
+            return self.rng.random() < math.exp(-delta / self.temperature)
+        return False
+
+    def relocate(self, exam: int, period: int, rooms: Tuple[int, ...]) -> bool:      # Period or room move, kept if feasible and accepted
+        old = (int(self.periods[exam]), self.rooms[exam])
+        delta = -self.remove(exam)
+        if self.feasible(exam, period, rooms):
+            delta += self.insert(exam, period, rooms)
+            if self.accept(delta):
+                return True
+            self.remove(exam)
+        self.insert(exam, *old)
+        return False
+
+    def swap(self, exam_one: int, exam_two: int) -> bool:      # Exchanges the periods and rooms of two exams, kept if feasible and accepted
+        old_one = (int(self.periods[exam_one]), self.rooms[exam_one])
+        old_two = (int(self.periods[exam_two]), self.rooms[exam_two])
+        delta = -self.remove(exam_one) - self.remove(exam_two)
+        if self.feasible(exam_one, *old_two):
+            delta += self.insert(exam_one, *old_two)
+            if self.feasible(exam_two, *old_one):
+                delta += self.insert(exam_two, *old_one)
+                if self.accept(delta):
+                    return True
+                self.remove(exam_two)
+            self.remove(exam_one)
+        self.insert(exam_one, *old_one)
+        self.insert(exam_two, *old_two)
+        return False
+
+    def kempe_chain(self, exam: int, period: int) -> List[int]:      # Connected component of the exam in the conflict graph restricted to its period and another one (depth-first)
+        members = self.period_exams[int(self.periods[exam])] | self.period_exams[period]
+        chain, stack = [exam], [exam]
+        seen = {exam}
+        while stack:
+            current = stack.pop()
+            for other in (self.neighbours[current] | self.coincident[current]) & members:
+                if other not in seen:
+                    seen.add(other)
+                    chain.append(other)
+                    stack.append(other)
+        return chain
+
+    def kempe_swap(self, chain: List[int], period_one: int, period_two: int, apply: bool = True) -> Tuple[Optional[int], bool]:
+        # Swaps the two periods of a chain's exams (keeping their rooms), returns the soft cost delta (None if it breaks a hard
+        # constraint) and whether the swap was kept. With apply=False, or if the move is not accepted, the timetable is restored
+        old = [(exam, int(self.periods[exam]), self.rooms[exam]) for exam in chain]
+        delta = -sum(self.remove(exam) for exam in chain)
+        inserted = []
+        for exam, period, rooms in old:
+            target = period_two if period == period_one else period_one
+            if not self.feasible(exam, target, rooms):
+                break
+            delta += self.insert(exam, target, rooms)
+            inserted.append(exam)
+        feasible = len(inserted) == len(chain)
+        if feasible and apply and self.accept(delta):
+            return delta, True
+        for exam in inserted:
+            self.remove(exam)
+        for exam, period, rooms in old:
+            self.insert(exam, period, rooms)
+        return (delta if feasible else None), False
+
+    def kempe_delta(self, exam: int, period: int) -> Optional[int]:      # Soft cost delta of the Kempe chain move of an exam to a period (None if infeasible), without applying it
+        chain = self.kempe_chain(exam, period)
+        return self.kempe_swap(chain, int(self.periods[exam]), period, apply=False)[0]
+
+    def step(self) -> bool:      # Tries one random move
+        rng = self.rng
+        exam = rng.randrange(len(self.problem.exams))
+        move = rng.choices(self.MOVES, self.MOVE_WEIGHTS)[0]
+        if move == "period":
+            period = rng.randrange(len(self.problem.periods))
+            if period == self.periods[exam]:
+                return False
+            return self.relocate(exam, period, self.rooms[exam])
+        if move == "room":
+            room = (rng.randrange(len(self.problem.rooms)),)
+            if room == self.rooms[exam]:
+                return False
+            if self.relocate(exam, int(self.periods[exam]), room):
+                self.multi_room[exam] = False
+                return True
+            return False
+        if move == "kempe":
+            period = rng.randrange(len(self.problem.periods))
+            if period == self.periods[exam]:
+                return False
+            chain = self.kempe_chain(exam, period)
+            return self.kempe_swap(chain, int(self.periods[exam]), period)[1]
+        other = rng.randrange(len(self.problem.exams))
+        if self.periods[other] == self.periods[exam] or self.multi_room[exam] != self.multi_room[other]:
+            return False
+        return self.swap(exam, other)
+
+    def run(self, time_limit: float, schedule: str = "late_acceptance", history_length: int = 1000,
+            initial_temperature: Optional[float] = None, final_temperature: float = 0.5, iter_limit: Optional[int] = None) -> List[Booking]:
+        # Runs for time_limit seconds and returns the best timetable. Schedules are late acceptance (a move is kept if no worse than the
+        # current cost or the cost history_length iterations ago) and simulated annealing (geometric cooling over the time limit)
+        if schedule not in ("late_acceptance", "annealing"):
+            raise ValueError(f"Unknown schedule {schedule}.")
+        if not self.improvable:
+            return self.given
+        if time_limit <= 0:
+            return self.bookings()
+        start = time.perf_counter()
+        self.schedule = schedule
+        self.history = [self.cost] * history_length
+        initial_temperature = initial_temperature or max(1.0, 0.001 * self.cost)
+        self.temperature = initial_temperature
+
+        while iter_limit is None or self.iterations < iter_limit:
+            if self.iterations % 100 == 0:
+                progress = (time.perf_counter() - start) / time_limit
+                if progress >= 1:
+                    break
+                self.temperature = initial_temperature * (final_temperature / initial_temperature) ** progress
+            if self.step():
+                self.accepted += 1
+                if self.cost < self.best_cost:
+                    self.best_cost = self.cost
+                    self.best = self.snapshot()
+            self.history[self.iterations % history_length] = self.cost
+            self.iterations += 1
+
+        self.elapsed += time.perf_counter() - start
+        return self.bookings()
+
+    def bookings(self) -> List[Booking]:      # Bookings of the best timetable found, rooms kept as a Room or a list of Rooms as they were given
+        problem = self.problem
+        periods, rooms, multi_room = self.best
+        bookings = []
+        for exam in problem.exams:
+            exam_rooms = [problem.rooms[room] for room in rooms[exam.number]]
+            bookings.append(Booking(exam, problem.periods[periods[exam.number]], exam_rooms if multi_room[exam.number] else exam_rooms[0]))
+        return bookings
@@ -0,0 +1 @@
+from rr.opt.mcts.simple import timed      # Hot paths are timed into the PhaseStats of the search running in the current thread, and called directly otherwise
@@ -5,6 +5,7 @@ from .room import Room
 from .booking import Booking
 from .exam_timetabling_problem import ExamTimetablingProblem
 from .exam_timetabling_solution import ExamTimetablingSolution
+from .profiling import timed
 
 class Solution:
     def __init__(self, problem: ExamTimetablingProblem):
@@ -83,6 +84,13 @@ class Solution:
         solution = ExamTimetablingSolution(self.problem, bookings)
         return solution.soft_constraint_violations()
     
+    def evaluate(self, softs: bool = False, exact: bool = True):      # (hard, soft, bookings) from a single Booking list and ExamTimetablingSolution, soft is None unless feasible or softs is requested, hard is a lower bound unless exact
+        bookings = self.dictionary_to_list()
+        solution = ExamTimetablingSolution(self.problem, bookings)
+        hard, soft = solution.evaluate_tiered(softs, exact)
+        return hard, soft, bookings
+
+    @timed("solution.fill")      # Rebuilding the working solution from an assignment dictionary
     def fill(self, dictionary):
         # Clearing existing bookings and pre_associations
         self.bookings = {}
@@ -3,12 +3,25 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import asyncio
+import gzip
 import itertools
+import json
 import logging
 import logging.config
+import os
+import pickle
 import random
+import sys
+import threading
 import time
+from array import array
+from collections import OrderedDict
+from functools import wraps
 from math import log, sqrt
+from time import perf_counter
+
+import numpy as np
 
 
 __version__ = "0.3.0"
@@ -18,6 +31,7 @@ __license__ = "MIT"
 
 
 INF = float("inf")
+NAN = float("nan")
 logger = logging.getLogger(__name__)
 debug = logger.debug
 info = logger.info
@@ -25,7 +39,10 @@ warn = logger.warning
 
 
 def run(root, time_limit=INF, iter_limit=INF, pruning=None,
-        rng_seed=None, rng_state=None, log_iter_interval=1000, sols=None):
+        rng_seed=None, rng_state=None, log_iter_interval=1000, log_time_interval=None, sols=None,
+        max_nodes=None, max_bytes=None, commit_iter_interval=None, commit_time_interval=None,
+        transpositions=None, checkpoint_path=None, checkpoint_interval=600.0, resume_from=None,
+        stats=None, selection_policy=None, stop_value=0):
     """
     Monte Carlo Tree Search for **minimization** problems.
 
@@ -33,7 +50,7 @@ def run(root, time_limit=INF, iter_limit=INF, pruning=None,
         Objective functions (and bounds) for maximization problems must be multiplied by -1.
 
     Arguments:
-        root (TreeNode): the root of the search tree.
+        root (TreeNode): the root of the search tree. May be `None` if `resume_from` is given.
         time_limit (float): maximum CPU time allowed.
         iter_limit (int): maximum number of iterations.
         pruning (bool or None): make the search use/not use pruning if true/false. If `None` is
@@ -42,13 +59,119 @@ def run(root, time_limit=INF, iter_limit=INF, pruning=None,
         rng_state: an RNG state tuple, as obtained from `random.getstate()`. Can be used to set a
             particular RNG state at the start of the search.
         log_iter_interval (int): interval, in number of iterations, between automatic log messages.
+        log_time_interval (float): interval, in wall-clock seconds, between automatic log messages.
+            If given, takes the place of `log_iter_interval` (see :class:`ProgressReporter`).
         sols (Solutions): a Solutions object obtained from a previous run of MCTS. If this argument
-            is provided, a previous search can be resumed from the point where it stopped.
+            is provided, a previous search can be resumed from the point where it stopped. An
+            empty Solutions object (*e.g.* configured with a codec) starts a new search.
+        max_nodes (int): maximum number of nodes kept in the tree. When the tree grows past this
+            limit, the least promising subtrees are collapsed back into leaves (see
+            :meth:`TreeNode.evict`). No limit is enforced if `None` is given (default).
+        max_bytes (int): approximate memory limit for the tree, in bytes. This is converted into
+            a node limit using a running average of :meth:`TreeNode.nbytes` over newly created
+            nodes, and can be combined with `max_nodes` (the tightest limit applies).
+        commit_iter_interval (int): interval, in number of iterations, between commits. A commit
+            makes the best child of the current root the new root of the search (see
+            :meth:`TreeNode.commit`), freeing all its sibling subtrees. This concentrates the
+            search on the remaining decisions of very deep trees. Disabled if `None` (default).
+        commit_time_interval (float): interval, in CPU seconds, between commits. Can be combined
+            with `commit_iter_interval` (a commit happens when either interval has elapsed).
+        transpositions (TranspositionTable or int): a transposition table (or the maximum size of
+            a new one) shared by all nodes whose :meth:`TreeNode.state_key` returns the same key.
+            Nodes reaching an already known state reuse its cached rollout instead of simulating,
+            and select using the statistics of all nodes with that state. Disabled if `None`.
+        checkpoint_path (str): file to which checkpoints of the search (see
+            :func:`save_checkpoint`) are periodically written. Disabled if `None` (default).
+        checkpoint_interval (float): interval, in CPU seconds, between checkpoints.
+        resume_from (str): path of a checkpoint file. If given, the search tree, `Solutions`
+            object, RNG state and iteration/commit counts are restored from it (see
+            :func:`load_checkpoint`), and the search continues from that point. Explicit `sols`,
+            `rng_seed` and `rng_state` arguments take precedence over the checkpointed ones.
+        stats (PhaseStats): if given, the time spent in each phase of the search (select, expand,
+            simulate, backpropagate, prune) and in the branches and apply steps of expansions is
+            recorded in this object, along with the domain functions decorated with
+            :func:`timed` (see :class:`PhaseStats`).
+        selection_policy (SelectionPolicy): policy scoring the candidates at each level of the
+            selection step. Defaults to the root class' :attr:`TreeNode.SELECTION_POLICY`.
+        stop_value: objective value at which the search stops, marking the best solution as
+            optimal (*e.g.* a known lower bound). A number given for :class:`Lex` values applies to
+            every level, so the default of 0 stops at ``Lex(0, 0)``. Disabled if `None`.
+
+    Note:
+        With commits enabled the search is no longer exhaustive, so running out of nodes does not
+        prove optimality. The `root` argument also stops being the root of the search tree after
+        the first commit.
 
     Returns:
         `Solutions` object containing the best solution found by the search, as well as the list
         of incumbent solutions during the search.
     """
+    search = run_steps(
+        root, time_limit=time_limit, iter_limit=iter_limit, pruning=pruning,
+        rng_seed=rng_seed, rng_state=rng_state, log_iter_interval=log_iter_interval,
+        log_time_interval=log_time_interval, sols=sols,
+        max_nodes=max_nodes, max_bytes=max_bytes, commit_iter_interval=commit_iter_interval,
+        commit_time_interval=commit_time_interval, transpositions=transpositions,
+        checkpoint_path=checkpoint_path, checkpoint_interval=checkpoint_interval,
+        resume_from=resume_from, stats=stats, selection_policy=selection_policy,
+        stop_value=stop_value, step_iter_interval=None,
+    )
+    while True:
+        try:
+            next(search)
+        except StopIteration as stop:
+            return stop.value
+
+
+async def run_async(root, step_iter_interval=100, on_step=None, **kwargs):
+    """Coroutine version of :func:`run` for cooperative scheduling with :mod:`asyncio`.
+
+    The search gives control back to the event loop every `step_iter_interval` iterations, so
+    several searches (*e.g.* one per instance) can be interleaved in a single thread, and tasks
+    can be cancelled to enforce external time budgets. If given, `on_step` is called with the
+    current `Solutions` object at each step, which can be used to stream incumbents to a
+    consumer. The remaining keyword arguments are passed on to :func:`run_steps`.
+
+    Returns:
+        The final `Solutions` object.
+    """
+    search = run_steps(root, step_iter_interval=step_iter_interval, **kwargs)
+    try:
+        while True:
+            try:
+                sols = next(search)
+            except StopIteration as stop:
+                return stop.value
+            if on_step is not None:
+                on_step(sols)
+            await asyncio.sleep(0)
+    finally:
+        search.close()
+
+
+def run_steps(root, time_limit=INF, iter_limit=INF, pruning=None,
+              rng_seed=None, rng_state=None, log_iter_interval=1000, log_time_interval=None,
+              sols=None, max_nodes=None, max_bytes=None, commit_iter_interval=None,
+              commit_time_interval=None, transpositions=None, checkpoint_path=None,
+              checkpoint_interval=600.0, resume_from=None, stats=None, selection_policy=None,
+              stop_value=0, step_iter_interval=1000):
+    """Generator version of :func:`run`, which takes the same arguments.
+
+    The search is suspended every `step_iter_interval` iterations, yielding the current
+    `Solutions` object, so the caller can inspect or stream incumbents, interleave several
+    searches, or stop the search at any point with ``close()``. CPU time spent while suspended is
+    not charged to the search's `time_limit`. If `step_iter_interval` is `None`, the search only
+    stops at its limits (this is how :func:`run` drives it).
+
+    Returns:
+        The final `Solutions` object, as the value of the `StopIteration` exception raised when
+        the generator finishes.
+    """
+    if resume_from is not None:
+        info("Restoring checkpoint from {}...".format(resume_from))
+        root, ckpt_sols, ckpt_rng_state, ckpt_i, ckpt_commits = load_checkpoint(resume_from)
+        sols = ckpt_sols if sols is None else sols
+        random.setstate(ckpt_rng_state)  # may still be overridden by rng_seed/rng_state below
     if pruning is None:
         # Guess pruning by comparing the bound() method from the root node's class with the
         # bound() method from the base TreeNode class.
@@ -61,61 +184,329 @@ def run(root, time_limit=INF, iter_limit=INF, pruning=None,
         info("Setting RNG state to...\n\t{}".format(rng_state_repr))
         random.setstate(rng_state)
     info("Pruning is {}.".format("enabled" if pruning else "disabled"))
-
+    if isinstance(transpositions, int):
+        transpositions = TranspositionTable(max_size=transpositions)
+    if transpositions is not None:
+        info("Transposition table enabled (max size {}).".format(transpositions.max_size))
+        if resume_from is not None:
+            transpositions.attach_tree(root)  # checkpoints don't store the transposition links
+    if max_nodes is not None or max_bytes is not None:
+        info("Tree size limited to {} nodes / {} bytes.".format(max_nodes, max_bytes))
+
+    progress = None if log_time_interval is None else ProgressReporter(log_time_interval)
+    timing = stats is not None
+    outer_stats = activate_stats(stats) if timing else None  # reactivated while suspended and at the end
     t0 = time.process_time()  # initial cpu time
-    if sols is None:
+    if sols is None or sols.feas_count + sols.infeas_count == 0:
         info("Starting new search")
-        sols = Solutions()  # object used to keep track of our best/worst solutions
         sol = root.simulate()  # run simulation from root and
         root.backpropagate(sol)  # backpropagate the solution
-        sols.update(sol)
+        if sols is None:
+            # object used to keep track of our best/worst solutions
+            sols = Solutions(lex=isinstance(sol.value, Lex))
+        sols.update(sol, iteration=0)
     else:
         info("Resuming previous search")
     t = time.process_time() - t0  # cpu time elapsed
-    i = 0  # iteration count
+    i = 0 if resume_from is None else ckpt_i  # iteration count
+    tree_size = root.tree_size()  # number of nodes currently in the tree
+    node_bytes = root.nbytes() if max_bytes is not None else None  # average bytes per node
+    node_limit = node_limit_for(max_nodes, max_bytes, node_bytes)
+    commits = 0 if resume_from is None else ckpt_commits  # number of commits (root changes) so far
+    i_commit, t_commit = i, t  # iteration count and cpu time at the last commit
+    t_checkpoint = t  # cpu time at the last checkpoint
+    checkpoint_pid = None  # process writing the last checkpoint in the background (if any)
 
     try:
         while i < iter_limit and t < time_limit:
-            logger.log(
-                level=logging.INFO if i % log_iter_interval == 0 else logging.DEBUG,
-                msg="[i={:<5} t={:3.02f}] {}".format(i, t, sols),
-            )
-            node = root.select(sols)  # selection step
+            # only format the progress message (including str(sols)) if it will be emitted
+            if progress is None:
+                level = logging.INFO if i % log_iter_interval == 0 else logging.DEBUG
+            else:
+                level = logging.INFO if progress.due() else logging.DEBUG
+            if logger.isEnabledFor(level):
+                logger.log(level, "[i=%-5d t=%3.02f] %s", i, t, sols)
+            if timing:
+                tp = perf_counter()
+            node = root.select(sols, selection_policy)  # selection step
+            if timing:
+                stats.add("select", perf_counter() - tp)
             # 
-            if sols.best.value == 0:
-                info("Search complete, solution is feasible")
+            if stop_value_reached(sols.best.value, stop_value):
+                info("Search complete, stop value reached")
                 sols.best.is_opt = True
                 break  # solution found
             #
             if node is None:
-                info("Search complete, solution is optimal")
-                sols.best.is_opt = True
+                if commits > 0:
+                    info("Search complete, committed tree exhausted")
+                else:
+                    info("Search complete, solution is optimal")
+                    sols.best.is_opt = True
                 break  # tree exhausted
+            if timing:
+                tp = perf_counter()
             new_children = node.expand(pruning=pruning, cutoff=sols.best.value)  # expansion step
+            if timing:
+                stats.add("expand", perf_counter() - tp)
             if len(new_children) == 0 and node.is_exhausted:
-                node.delete()
+                tree_size -= node.delete()
             else:
                 z0 = sols.best.value
                 for child in new_children:
-                    sol = child.simulate()  # simulation step
-                    child.backpropagate(sol)  # backpropagation step
-                    sols.update(sol)
+                    entry = None if transpositions is None else transpositions.attach(child)
+                    cached = entry is not None and entry.sim_sol is not None
+                    if cached:
+                        sol = entry.sim_sol  # cached rollout of a transposition
+                    elif timing:
+                        tp = perf_counter()
+                        sol = child.simulate()
+                        stats.add("simulate", perf_counter() - tp)
+                    else:
+                        sol = child.simulate()  # simulation step
+                    if timing:
+                        tp = perf_counter()
+                        child.backpropagate(sol)
+                        stats.add("backpropagate", perf_counter() - tp)
+                    else:
+                        child.backpropagate(sol)  # backpropagation step
+                    if not cached:
+                        # a cached rollout was already counted when it was first obtained
+                        sols.update(sol, iteration=i)
                     assert child.sim_count > 0
+                    if node_bytes is not None:
+                        node_bytes += (child.nbytes() - node_bytes) / tree_size
+                tree_size += len(new_children)
                 # prune only once after all child solutions have been accounted for
                 if pruning and sols.best.value < z0:
-                    ts0 = root.tree_size()
+                    ts0 = tree_size
+                    if timing:
+                        tp = perf_counter()
                     root.prune(sols.best.value)
-                    ts1 = root.tree_size()
+                    if timing:
+                        stats.add("prune", perf_counter() - tp)
+                    tree_size = ts1 = root.tree_size()
                     info("Pruning removed {} nodes ({} => {})".format(ts0 - ts1, ts0, ts1))
+            # collapse unpromising subtrees if the tree has outgrown its memory budget
+            if node_limit is not None:
+                node_limit = node_limit_for(max_nodes, max_bytes, node_bytes)
+                if tree_size > node_limit:
+                    ts0 = tree_size
+                    tree_size -= root.evict(tree_size - int(node_limit * root.EVICTION_RATIO), sols)
+                    info("Eviction removed {} nodes ({} => {})".format(
+                        ts0 - tree_size, ts0, tree_size))
             # update elapsed time and iteration counter
             t = time.process_time() - t0
             i += 1
+            # commit to the best child of the root once the commit interval has elapsed
+            if ((commit_iter_interval is not None and i - i_commit >= commit_iter_interval) or
+                    (commit_time_interval is not None and t - t_commit >= commit_time_interval)):
+                i_commit, t_commit = i, t
+                new_root = root.commit()
+                if new_root is not None:
+                    ts0 = tree_size
+                    root = new_root
+                    tree_size = root.tree_size()
+                    commits += 1
+                    info("Commit #{} removed {} nodes ({} => {})".format(
+                        commits, ts0 - tree_size, ts0, tree_size))
+            # write a checkpoint in the background once the checkpoint interval has elapsed
+            if checkpoint_path is not None and t - t_checkpoint >= checkpoint_interval:
+                t_checkpoint = t
+                wait_checkpoint(checkpoint_pid)
+                checkpoint_pid = save_checkpoint(checkpoint_path, root, sols, background=True,
+                                                 iteration=i, commits=commits)
+                info("Checkpoint of {} nodes started at iter {}".format(tree_size, i))
+            if timing:
+                stats.tick(i)
+            # hand control back to the caller once the step interval has elapsed
+            if step_iter_interval is not None and i % step_iter_interval == 0:
+                t_suspend = time.process_time()
+                if timing:
+                    activate_stats(outer_stats)
+                yield sols
+                if timing:
+                    outer_stats = activate_stats(stats)
+                t0 += time.process_time() - t_suspend  # don't charge suspended time
     except KeyboardInterrupt:
         info("Keyboard interrupt!")
+    except GeneratorExit:
+        info("Search closed by caller")
+    finally:
+        if timing:
+            activate_stats(outer_stats)
+    if checkpoint_path is not None:
+        wait_checkpoint(checkpoint_pid)
+        save_checkpoint(checkpoint_path, root, sols, iteration=i, commits=commits)
+        info("Checkpoint of {} nodes written to {}".format(tree_size, checkpoint_path))
     info("Finished at iter {} ({:.02f}s): {}".format(i, t, sols))
+    if transpositions is not None:
+        info("Transpositions: {}".format(transpositions))
+    if timing:
+        stats.tick(i, force=True)
+        info("Phase timings: {}".format(stats))
     return sols
 
 
+class ProgressReporter(object):
+    """Throttles progress messages to at most one every `interval` seconds of wall-clock time,
+    independently of how long each iteration takes. Messages are only formatted when they are
+    actually emitted, so the reporter can be consulted on every iteration of a search loop.
+
+    Arguments:
+        interval (float): minimum wall-clock time, in seconds, between two messages.
+        emit: callable receiving each formatted message. Defaults to this module's `info`.
+    """
+    __slots__ = ("interval", "emit", "t_next")
+
+    def __init__(self, interval=10.0, emit=None):
+        self.interval = interval
+        self.emit = info if emit is None else emit
+        self.t_next = time.monotonic()  # the first message is emitted right away
+
+    def due(self):
+        """Check whether a message should be emitted now, and if so, restart the interval."""
+        now = time.monotonic()
+        if now < self.t_next:
+            return False
+        self.t_next = now + self.interval
+        return True
+
+    def report(self, msg, *args):
+        """Emit `msg.format(*args)` if the interval has elapsed since the last message."""
+        if self.due():
+            self.emit(msg.format(*args))
+            return True
+        return False
+
+
+class PhaseTimer(object):
+    """Call count, total/maximum duration and a histogram of durations for a single phase.
+    Histogram bucket `k` counts the calls that took less than `2**k` microseconds (and at least
+    `2**(k-1)`, for `k > 0`).
+    """
+    __slots__ = ("count", "total", "max", "hist")
+
+    HIST_SIZE = 32
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.hist = [0] * self.HIST_SIZE
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.hist[min(int(duration * 1e6).bit_length(), self.HIST_SIZE - 1)] += 1
+
+    def as_dict(self):
+        last = max([k for k, n in enumerate(self.hist) if n > 0] or [-1])
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count > 0 else 0.0,
+            "max": self.max,
+            "hist": self.hist[:last + 1],
+        }
+
+
+class PhaseStats(object):
+    """Low-overhead timing statistics for the phases of a search, keyed by phase name.
+
+    :func:`run` records the select, expand, simulate, backpropagate and prune phases, as well as
+    the ``branches`` (start of an expansion, see :meth:`TreeNode.branches`) and ``apply`` (copy
+    of the parent and :meth:`TreeNode.apply`) phases of each expansion. Phases are timed
+    inclusively, *e.g.* the time spent in ``branches`` is also counted in ``expand``. Domain-level
+    hot paths are timed by decorating them with :func:`timed`, which records into the stats
+    object of the search running in the current thread (see :func:`activate_stats`).
+
+    If `path` is given, a snapshot of the statistics is appended to that file as a JSON line
+    every `interval` seconds (wall-clock time) while the search runs, and once more at the end.
+    """
+    def __init__(self, path=None, interval=60.0):
+        self.phases = OrderedDict()
+        self.path = path
+        self.interval = interval
+        self.t_start = self.t_dump = perf_counter()
+
+    def __str__(self):
+        descr = ", ".join(
+            "{}={}x{:.3g}ms".format(name, timer.count, 1e3 * timer.total / max(timer.count, 1))
+            for name, timer in self.phases.items()
+        )
+        return "{}({})".format(type(self).__name__, descr)
+
+    def __repr__(self):
+        return "<{} @{:x}>".format(self, id(self))
+
+    def timer(self, phase):
+        timer = self.phases.get(phase)
+        if timer is None:
+            timer = self.phases[phase] = PhaseTimer()
+        return timer
+
+    def add(self, phase, duration):
+        self.timer(phase).add(duration)
+
+    def as_dict(self):
+        return {name: timer.as_dict() for name, timer in self.phases.items()}
+
+    def tick(self, iteration, force=False):
+        """Append a JSON line with the current statistics to `path` if `interval` seconds have
+        elapsed since the last one (or if `force` is true).
+        """
+        if self.path is None:
+            return
+        now = perf_counter()
+        if not force and now - self.t_dump < self.interval:
+            return
+        self.t_dump = now
+        record = {"iteration": iteration, "elapsed": now - self.t_start, "phases": self.as_dict()}
+        with open(self.path, "a") as ostream:
+            ostream.write(json.dumps(record) + "\n")
+
+
+_timing = threading.local()  # holds the PhaseStats of the search running in each thread (if any)
+
+
+def activate_stats(stats):
+    """Make `stats` (a :class:`PhaseStats` object, or `None`) receive the timings of the
+    :func:`timed` functions called from the current thread, until another one is activated.
+    :func:`run_steps` activates its own `stats` while the search runs, and reactivates the
+    previous ones whenever it is suspended or finishes, so interleaved (*e.g.* through
+    :func:`run_async`) or nested searches each record their own timings.
+
+    Returns:
+        The previously active stats object, to be reactivated afterwards.
+    """
+    previous = getattr(_timing, "stats", None)
+    _timing.stats = stats
+    return previous
+
+
+def timed(phase):
+    """Decorator timing every call to a function (or method) under `phase`, in the stats object
+    made active by :func:`activate_stats`. Without active stats, the function is called
+    directly, so domain-level hot paths can be decorated permanently at little cost.
+    """
+    def decorator(function):
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            stats = getattr(_timing, "stats", None)
+            if stats is None:
+                return function(*args, **kwargs)
+            t = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.add(phase, perf_counter() - t)
+        return timed_function
+    return decorator
+
+
 class Infeasible(object):
     """
     Infeasible objects can be compared with other objects (such as floats), but always compare as
@@ -168,6 +559,65 @@ class Infeasible(object):
         return isinstance(obj, Infeasible) and self.infeas <= obj.infeas
 
 
+class Lex(tuple):
+    """
+    Lexicographic objective values, *e.g.* ``Lex(hard, soft)``. Levels are given from the most to
+    the least significant, and the first level measures infeasibility: values whose first level is
+    positive are infeasible. Since Lex objects are plain tuples, they compare natively (without
+    any Python-level comparison code) in :meth:`Solutions.update`, :meth:`TreeNode.backpropagate`
+    and pruning, but they can't be mixed with numbers or :class:`Infeasible` objects in the same
+    search. The search detects lexicographic values from the root's first simulation (see
+    :class:`Solutions`), and :meth:`TreeNode.selection_score` normalises them level by level (see
+    :meth:`exploit`).
+
+    .. code-block:: python
+
+        class MyNode(mcts.TreeNode):
+            # (...)
+
+            def simulate(self):
+                # (...)
+                return mcts.Solution(value=mcts.Lex(hard_violations, soft_penalty))
+
+            # (...)
+    """
+    __slots__ = ()
+
+    def __new__(cls, *levels):
+        return tuple.__new__(cls, levels)
+
+    def __str__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(map(str, self)))
+
+    def __repr__(self):
+        return "<{} @{:x}>".format(self, id(self))
+
+    @property
+    def is_feas(self):
+        return self[0] <= 0
+
+    def exploit(self, best, worst):
+        """Position of this value between `best` (1.0) and `worst` (0.0), measured on the most
+        significant level in which `best` and `worst` differ. Values lexicographically between
+        `best` and `worst` share their levels up to that one, and lie between them on it, so
+        each level is normalised by its own range instead of an arbitrary weight.
+        """
+        for z, z_best, z_worst in zip(self, best, worst):
+            if z_best != z_worst:
+                return (z_worst - z) / (z_worst - z_best)
+        return 0.0
+
+    def pack(self, radix):
+        """Pack the levels into a single integer, in base `radix` (which must exceed the range
+        of every level but the first). Packed values compare, add up, and average like the
+        corresponding Lex values, which suits searches that accumulate sums of values.
+        """
+        packed = 0
+        for z in self:
+            packed = packed * radix + z
+        return packed
+
+
 class Solution(object):
     """Base class for solution objects. The :meth:`simulate` method of :class:`TreeNode` objects
     should return a :class:`Solution` object. Solutions can have solution data attached, but this
@@ -177,7 +627,10 @@ class Solution(object):
         assert value is not None
         self.value = value  # objective function value (may be an Infeasible object)
         self.data = data  # solution data
-        self.is_infeas = isinstance(value, Infeasible)  # infeasible solution flag
+        if isinstance(value, Lex):
+            self.is_infeas = not value.is_feas  # infeasible solution flag
+        else:
+            self.is_infeas = isinstance(value, Infeasible)
         self.is_feas = not self.is_infeas  # feasible solution flag
         self.is_opt = False  # optimal solution flag ("manually" set by run())
 
@@ -188,19 +641,62 @@ class Solution(object):
         return "<{} @{:x}>".format(self, id(self))
 
 
+class Incumbent(object):
+    """Compact record of a solution that improved the best overall solution during the search
+    (see :attr:`Solutions.list`). Only the value, the iteration number, and a timestamp are kept,
+    along with the solution data in the form chosen by the :class:`Solutions` object's codec.
+    """
+    __slots__ = ("value", "iteration", "timestamp", "delta")
+
+    def __init__(self, value, iteration, timestamp, delta):
+        self.value = value  # objective function value (may be an Infeasible object)
+        self.iteration = iteration  # search iteration in which the solution was found
+        self.timestamp = timestamp  # wall-clock time at which the solution was found
+        self.delta = delta  # (size, indices, values) of code changes, or raw data without codec
+
+    def __str__(self):
+        return "{}(value={}, iteration={})".format(type(self).__name__, self.value, self.iteration)
+
+    @property
+    def is_feas(self):
+        value = self.value
+        return value.is_feas if isinstance(value, Lex) else not isinstance(value, Infeasible)
+
+    def __repr__(self):
+        return "<{} @{:x}>".format(self, id(self))
+
+
 class Solutions(object):
     """Simple auxiliary object whose only responsibility is to keep track of best and worst
     feasible and infeasible solutions, the best overall solution, and also a list of increasingly
     better solutions found during the search.
+
+    Only the best/worst solutions are kept as full :class:`Solution` objects. The list of
+    incumbents holds :class:`Incumbent` records, whose data is stored compactly if a `codec` is
+    given: an object with an ``encode(data)`` method returning a flat sequence of ints, and a
+    ``decode(code)`` method doing the reverse. Each incumbent then only stores the entries of its
+    code that differ from the previous incumbent's, and the solution data is rebuilt on demand by
+    :meth:`incumbent_data`. Without a codec, incumbents keep a reference to the solution data.
+
+    If `lex` is true, solution values must be :class:`Lex` objects (and the initial best/worst
+    solutions are set up accordingly).
     """
     # Initial values for attributes of Solutions object.
     INIT_FEAS_BEST = Solution(value=+INF, data="<initial best feas solution>")
     INIT_FEAS_WORST = Solution(value=-INF, data="<initial worst feas solution>")
     INIT_INFEAS_BEST = Solution(value=Infeasible(+INF), data="<initial best infeas solution>")
     INIT_INFEAS_WORST = Solution(value=Infeasible(-INF), data="<initial worst infeas solution>")
-
-    def __init__(self, *sols):
-        self.list = []  # Solution list (only keeps solutions that improve upper bound)
+    # Initial values for searches with lexicographic (Lex) objective values.
+    INIT_LEX_FEAS_BEST = Solution(value=Lex(0, +INF), data="<initial best feas solution>")
+    INIT_LEX_FEAS_WORST = Solution(value=Lex(0, -INF), data="<initial worst feas solution>")
+    INIT_LEX_INFEAS_BEST = Solution(value=Lex(+INF), data="<initial best infeas solution>")
+    INIT_LEX_INFEAS_WORST = Solution(value=Lex(-INF), data="<initial worst infeas solution>")
+
+    def __init__(self, *sols, codec=None, lex=False):
+        self.list = []  # Incumbent list (only keeps solutions that improve upper bound)
+        self.codec = codec  # encoder/decoder of solution data into flat int sequences
+        self.last_code = None  # code of the last incumbent (the base of the next delta)
+        self.lex = lex  # whether solution values are Lex objects
         self.best = self.INIT_INFEAS_BEST  # best overall solution
         self.feas_count = 0  # number of feasible solutions seen
         self.feas_best = self.INIT_FEAS_BEST  # best feasible solution
@@ -208,6 +704,12 @@ class Solutions(object):
         self.infeas_count = 0  # number of infeasible solutions seen
         self.infeas_best = self.INIT_INFEAS_BEST  # best (least) infeasible solution
         self.infeas_worst = self.INIT_INFEAS_WORST  # worst (most) infeasible solution
+        if lex:
+            self.best = self.INIT_LEX_INFEAS_BEST
+            self.feas_best = self.INIT_LEX_FEAS_BEST
+            self.feas_worst = self.INIT_LEX_FEAS_WORST
+            self.infeas_best = self.INIT_LEX_INFEAS_BEST
+            self.infeas_worst = self.INIT_LEX_INFEAS_WORST
         for sol in sols:
             self.update(sol)
 
@@ -236,30 +738,300 @@ class Solutions(object):
     def infeas_pct(self):
         return self.infeas_ratio * 100.0
 
-    def update(self, sol):
+    def update(self, sol, iteration=None):
         # Update best and worst feasible solutions
         if sol.is_feas:
             self.feas_count += 1
             if sol.value < self.feas_best.value:
-                debug("New best feasible solution: {} -> {}".format(self.feas_best, sol))
+                debug("New best feasible solution: %s -> %s", self.feas_best, sol)
                 self.feas_best = sol
             if sol.value > self.feas_worst.value:
-                debug("New worst feasible solution: {} -> {}".format(self.feas_worst, sol))
+                debug("New worst feasible solution: %s -> %s", self.feas_worst, sol)
                 self.feas_worst = sol
         # Update best and worst infeasible solutions
         else:
             self.infeas_count += 1
             if sol.value < self.infeas_best.value:
-                debug("New best infeasible solution: {} -> {}".format(self.infeas_best, sol))
+                debug("New best infeasible solution: %s -> %s", self.infeas_best, sol)
                 self.infeas_best = sol
             if sol.value > self.infeas_worst.value:
-                debug("New worst infeasible solution: {} -> {}".format(self.infeas_worst, sol))
+                debug("New worst infeasible solution: %s -> %s", self.infeas_worst, sol)
                 self.infeas_worst = sol
         # Update best overall solution
         if sol.value < self.best.value:
-            info("New best solution: {} -> {}".format(self.best, sol))
+            info("New best solution: %s -> %s", self.best, sol)
             self.best = sol
-            self.list.append(sol)
+            self.list.append(Incumbent(sol.value, iteration, time.time(), self.encode(sol.data)))
+
+    def encode(self, data):
+        """Compute the delta of `data` relative to the last incumbent, using the codec."""
+        if self.codec is None:
+            return data
+        code = self.codec.encode(data)
+        prev = self.last_code
+        if prev is None or len(prev) != len(code):
+            changed = range(len(code))
+        else:
+            changed = [k for k, v in enumerate(code) if prev[k] != v]
+        self.last_code = array("l", code)
+        return len(code), array("l", changed), array("l", (code[k] for k in changed))
+
+    def incumbent_data(self, index=-1):
+        """Rebuild the solution data of the incumbent at position `index` of :attr:`list`, by
+        replaying the deltas of all incumbents up to it and decoding the result.
+        """
+        if self.codec is None:
+            return self.list[index].delta
+        index = range(len(self.list))[index]
+        code = array("l")
+        for incumbent in itertools.islice(self.list, index + 1):
+            size, changed, values = incumbent.delta
+            if size != len(code):
+                code = array("l", [0] * size)
+            for k, v in zip(changed, values):
+                code[k] = v
+        return self.codec.decode(code)
+
+
+class LRUCache(object):
+    """Bounded mapping which discards its least recently used entry when full, counting the hits
+    and misses of :meth:`get`. Used to memoize rollout results (or bounds) by state key, such as
+    the Zobrist hashes returned by :meth:`TreeNode.state_key`, and as the storage of
+    :class:`TranspositionTable`.
+
+    The cache holds no locks nor references to other processes, so it can be pickled along with
+    the nodes using it. Each worker of a process pool then keeps (and fills) its own copy.
+    """
+    _MISSING = object()
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return "{}(size={}, hits={}, misses={}, hit_ratio={:.3f})".format(
+            type(self).__name__, len(self.entries), self.hits, self.misses, self.hit_ratio)
+
+    def __repr__(self):
+        return "<{} @{:x}>".format(self, id(self))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def get(self, key, default=None):
+        """Get the value cached for `key` (marking it as recently used), or `default`."""
+        value = self.entries.get(key, self._MISSING)
+        if value is self._MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Cache `value` for `key`, discarding the least recently used entry if full."""
+        entries = self.entries
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class Transposition(object):
+    """Statistics shared by all tree nodes representing the same state (see
+    :class:`TranspositionTable`). Mirrors the `sim_sol` and `sim_best` of each :class:`TreeNode`.
+    """
+    __slots__ = ("sim_sol", "sim_best")
+
+    def __init__(self):
+        self.sim_sol = None  # first rollout obtained from this state (reused by transpositions)
+        self.sim_best = None  # best solution of simulations below nodes with this state
+
+    def update(self, sol):
+        if self.sim_best is None or self.sim_best.value > sol.value:
+            self.sim_best = sol
+
+
+class TranspositionTable(LRUCache):
+    """Bounded table mapping state keys (as given by :meth:`TreeNode.state_key`) to shared
+    statistics. When the table is full, the least recently used entry is discarded. Nodes which
+    are still linked to a discarded entry keep it, but it is no longer shared with new nodes.
+
+    The `entry_factory` argument allows other search implementations to reuse the table with
+    their own statistics objects.
+    """
+    def __init__(self, max_size=100000, entry_factory=Transposition):
+        LRUCache.__init__(self, max_size)
+        self.entry_factory = entry_factory
+
+    def lookup(self, key):
+        """Get the entry associated with `key`, creating a new entry if necessary."""
+        entry = self.get(key)
+        if entry is None:
+            entry = self.entry_factory()
+            self.put(key, entry)
+        return entry
+
+    def attach(self, node):
+        """Link a node to the entry of its state. Returns the entry, or `None` if the node does
+        not provide a state key.
+        """
+        key = node.state_key()
+        if key is None:
+            return None
+        node.transposition = entry = self.lookup(key)
+        return entry
+
+    def attach_tree(self, root):
+        """Link every node of the tree under `root` to the entry of its state, merging each
+        node's `sim_sol` and `sim_best` into its entry. This restores the links of a tree loaded
+        from a checkpoint (see :func:`load_checkpoint`).
+        """
+        stack = [root]
+        while len(stack) > 0:
+            node = stack.pop()
+            entry = self.attach(node)
+            if entry is not None:
+                if entry.sim_sol is None:
+                    entry.sim_sol = node.sim_sol
+                entry.update(node.sim_best)
+            if node.children is not None:
+                stack.extend(node.children)
+
+
+class SelectionStats(object):
+    """Statistics of the candidate nodes of one selection step, gathered once and shared by
+    selection policies (see :class:`SelectionPolicy`). Each numeric attribute is a NumPy array
+    with one entry per candidate, in the order of `nodes`, so policies score all candidates with
+    a few array operations. Candidates without a parent (*i.e.* the root) have an infinite parent
+    count, which makes count-based exploration terms infinite. Candidates without a prior have a
+    NaN `priors` entry (see `has_prior`). Objective values can be :class:`Infeasible` or
+    :class:`Lex` objects, so `values` is a plain list.
+    """
+    __slots__ = ("nodes", "counts", "parent_counts", "exploits", "values", "depths", "priors",
+                 "has_prior")
+
+    def __init__(self, nodes, sols):
+        self.nodes = nodes = list(nodes)
+        size = len(nodes)
+        self.counts = np.fromiter((node.sim_count for node in nodes), float, size)
+        self.parent_counts = np.fromiter((INF if node.parent is None else node.parent.sim_count
+                                          for node in nodes), float, size)
+        self.exploits = np.fromiter((node.exploit_score(sols) for node in nodes),
+                                    float, size)  # normalised, in [0, 1]
+        self.values = [(node.sim_best if node.transposition is None else
+                        node.transposition.sim_best).value for node in nodes]
+        self.depths = np.fromiter((len(node.path) for node in nodes), float, size)
+        self.priors = np.fromiter((NAN if node.prior is None else node.prior for node in nodes),
+                                  float, size)
+        self.has_prior = ~np.isnan(self.priors)
+
+
+class SelectionPolicy(object):
+    """Base class for selection policies, which score the candidates of each level of the
+    selection step from their :class:`SelectionStats` (the highest score wins, with ties broken
+    at random). A policy can be set as a node class' :attr:`TreeNode.SELECTION_POLICY` or passed
+    to :func:`run`.
+    """
+    def scores(self, stats):
+        """Return an array (or list) with the score of each candidate in `stats`."""
+        raise NotImplementedError()
+
+    def __str__(self):
+        params = ", ".join("{}={}".format(k, v) for k, v in sorted(vars(self).items()))
+        return "{}({})".format(type(self).__name__, params)
+
+    def __repr__(self):
+        return "<{} @{:x}>".format(self, id(self))
+
+
+class UCT(SelectionPolicy):
+    """The adapted UCT formula of :meth:`TreeNode.selection_score`: normalised exploitation plus
+    UCT exploration (PUCT for nodes with priors), plus a `1/(1+depth)` term favouring expansion of
+    shallow nodes.
+    """
+    def __init__(self, c=sqrt(2.0), puct_c=sqrt(2.0)):
+        self.c = c
+        self.puct_c = puct_c
+
+    def scores(self, stats):
+        n, N = stats.counts, stats.parent_counts
+        with np.errstate(invalid="ignore"):  # the root's infinite counts, in unused terms
+            explore = np.where(stats.has_prior, self.puct_c * stats.priors * np.sqrt(N) / (1 + n),
+                               self.c * np.sqrt(np.log(N) / n))
+        return stats.exploits + explore + 1.0 / (1.0 + stats.depths)
+
+
+class UCB1Tuned(SelectionPolicy):
+    """UCB1-Tuned, which scales exploration by an upper bound on each candidate's variance. Nodes
+    only keep their best solution, so the normalised exploitation `x` stands in for the mean
+    reward, and `x * (1 - x)` (the largest variance of a [0, 1] variable with mean `x`) for its
+    variance.
+    """
+    def scores(self, stats):
+        x = stats.exploits
+        log_ratio = np.log(stats.parent_counts) / stats.counts
+        variance = x * (1.0 - x) + np.sqrt(2.0 * log_ratio)
+        return x + np.sqrt(log_ratio * np.minimum(0.25, variance))
+
+
+class RankBased(SelectionPolicy):
+    """Rank-based selection, as in ``heuristics/da_mcts.py``: exploitation is `1/rank` of each
+    candidate's best solution among the candidates (best rank is 1, ties share a rank), plus UCT
+    exploration weighted by `exploration_weight`.
+    """
+    def __init__(self, exploration_weight=0.01):
+        self.exploration_weight = exploration_weight
+
+    def scores(self, stats):
+        values = stats.values  # may be Infeasible or Lex objects, so ranked in Python
+        ranks = np.empty(len(values))
+        rank, prev = 0, None
+        for k in sorted(range(len(values)), key=values.__getitem__):
+            if rank == 0 or values[k] != prev:
+                rank, prev = rank + 1, values[k]
+            ranks[k] = rank
+        explore = np.sqrt(2.0 * np.log(stats.parent_counts) / stats.counts)
+        return 1.0 / ranks + self.exploration_weight * explore
+
+
+class ThompsonSampling(SelectionPolicy):
+    """Thompson sampling on normalised values: each candidate's score is drawn from a Beta
+    distribution with mean close to its normalised exploitation `x`, whose spread shrinks as
+    the candidate's simulation count `n` grows (`n * x` successes out of `n` trials). The draws
+    use the :mod:`random` module, so they follow the search's RNG seed.
+    """
+    def scores(self, stats):
+        betavariate = random.betavariate
+        n, x = stats.counts, stats.exploits
+        alphas = (1.0 + n * x).tolist()
+        betas = (1.0 + n * (1.0 - x)).tolist()
+        return [betavariate(alpha, beta) for alpha, beta in zip(alphas, betas)]
+
+
+class PUCT(SelectionPolicy):
+    """PUCT, as used with policy priors in AlphaZero: exploitation plus `c * P * sqrt(N)/(1 + n)`.
+    Candidates without a prior (see :meth:`TreeNode.branch_priors`) get a uniform prior.
+    """
+    def __init__(self, c=sqrt(2.0)):
+        self.c = c
+
+    def scores(self, stats):
+        priors = np.where(stats.has_prior, stats.priors, 1.0 / len(stats.nodes))
+        return stats.exploits + self.c * priors * np.sqrt(stats.parent_counts) / (1 + stats.counts)
 
 
 class TreeNodeExpansion(object):
@@ -268,34 +1040,50 @@ class TreeNodeExpansion(object):
     This object creates a copy of a given parent node and applies the next (unexpanded) branch in
     its branch list on demand. When the parent node has been completely expanded, the 'next()'
     method will return None and the 'is_finished' flag is set to true.
+
+    If the node's class defines :meth:`TreeNode.branch_priors`, the branches are instead sorted
+    by decreasing prior, and each child gets the normalised prior of its branch.
     """
     def __init__(self, node):
         self.node = node
         self.branches = None
         self.next_branch = None
+        self.next_prior = None
         self.is_started = False
         self.is_finished = False
 
+    @timed("branches")
     def start(self):
         if self.is_started:
             raise ValueError("multiple attempts to start node expansion")
-        self.branches = iter(self.node.branches())
+        node = self.node
+        if type(node).branch_priors is TreeNode.branch_priors:
+            self.branches = zip(node.branches(), itertools.repeat(None))  # (picklable)
+        else:
+            branches = list(node.branches())
+            priors = node.branch_priors(branches)
+            total = sum(priors)
+            scale = 1.0 / total if total > 0 else 0.0
+            order = sorted(range(len(branches)), key=priors.__getitem__, reverse=True)
+            self.branches = iter([(branches[k], priors[k] * scale) for k in order])
         self.is_started = True
         self._advance_branch()
 
+    @timed("apply")
     def next(self):
         if self.is_finished:
             raise ValueError("node expansion is already finished")
         child = self.node.copy()
         child.apply(self.next_branch)
+        child.prior = self.next_prior
         self._advance_branch()
         return child
 
     def _advance_branch(self):
         try:
-            self.next_branch = next(self.branches)
+            self.next_branch, self.next_prior = next(self.branches)
         except StopIteration:
-            self.next_branch = None
+            self.next_branch = self.next_prior = None
             self.is_finished = True
 
 
@@ -309,8 +1097,11 @@ class TreeNode(object):
         - :meth:`apply`
     :MCTS-related methods:
         - :meth:`simulate`
+        - :meth:`branch_priors` *[optional]*
     :branch-and-bound related methods:
         - :meth:`bound` *[optional]*
+    :transposition related methods:
+        - :meth:`state_key` *[optional]*
     """
 
     Expansion = TreeNodeExpansion
@@ -345,6 +1136,10 @@ class TreeNode(object):
         self.sim_count = 0  # number of simulations in this subtree
         self.sim_sol = None  # solution of this node's own simulation
         self.sim_best = None  # best solution of simulations in this subtree
+        self.last_visit = 0  # root sim_count when this node was last traversed by select()
+        self.collapsed_best = None  # sim_best of the subtree discarded by collapse() (if any)
+        self.transposition = None  # statistics shared with nodes of the same state (if enabled)
+        self.prior = None  # normalised prior of the branch leading to this node (if any)
 
     @property
     def depth(self):
@@ -372,6 +1167,31 @@ class TreeNode(object):
                 count += len(children)
         return count
 
+    def nbytes(self):
+        """Rough estimate of the memory held by this node, in bytes.
+
+        The estimate covers the node object, its attribute dictionary, and the attribute values
+        (descending one level into containers). Attribute values which are the same object as in
+        the parent node, such as the problem instance, are considered shared and not counted.
+        Subclasses with a very different memory layout may override this method to provide a
+        better estimate for the `max_bytes` option of :func:`run`.
+        """
+        getsizeof = sys.getsizeof
+        parent_attrs = {} if self.parent is None else self.parent.__dict__
+        size = getsizeof(self) + getsizeof(self.__dict__)
+        for name, value in self.__dict__.items():
+            if parent_attrs.get(name) is value:
+                continue
+            size += getsizeof(value)
+            if isinstance(value, dict):
+                value = value.values()
+            elif not isinstance(value, (list, set)):
+                continue
+            for elem in value:
+                if isinstance(elem, (list, tuple, set, dict)):
+                    size += getsizeof(elem)
+        return size
+
     def add_child(self, node):
         node.path = self.path + (self,)
         node.parent = self
@@ -441,13 +1261,31 @@ class TreeNode(object):
     # children.
     SELECTION_ALLOW_INTERLEAVING = True
 
+    # Progressive widening: a node with n simulations in its subtree may only have up to
+    # WIDENING_K * n ** WIDENING_ALPHA children. While a partially expanded node is at this limit,
+    # selection descends into its children instead of expanding it further, which together with
+    # branch priors concentrates the search on the most promising branches of wide nodes.
+    # Disabled if WIDENING_K is None.
+    WIDENING_K = None
+    WIDENING_ALPHA = 0.5
+
+    # Weight of the PUCT exploration term, which replaces the UCT term for nodes with a prior.
+    PUCT_C = sqrt(2.0)
+
     # MCTS-related methods
-    def select(self, sols):
+    # Selection policy (see :class:`SelectionPolicy`) used by select(). If None, the candidates'
+    # own selection_score() methods are used.
+    SELECTION_POLICY = None
+
+    def select(self, sols, policy=None):
         """Pick the most favorable node for exploration.
 
         This method starts at the root and descends until a leaf is found. In each level the child
-        to descend to is the one with the best selection score.
+        to descend to is the one with the best selection score, as given by `policy` (or the
+        class' :attr:`SELECTION_POLICY`, or else :meth:`selection_score`).
         """
+        if policy is None:
+            policy = self.SELECTION_POLICY
         # Check if tree has been completely explored.
         if self.is_exhausted:
             return None
@@ -455,6 +1293,7 @@ class TreeNode(object):
         curr_node = None
         next_node = self
         allow_interleaving = self.SELECTION_ALLOW_INTERLEAVING
+        widening_k = self.WIDENING_K
         while next_node is not curr_node:
             curr_node = next_node
             curr_expansion = curr_node.expansion
@@ -462,11 +1301,20 @@ class TreeNode(object):
                 break
             if curr_expansion.is_finished:
                 cands = curr_node.children
+            elif widening_k is not None and 0 < len(curr_node.children) >= (
+                    widening_k * curr_node.sim_count ** self.WIDENING_ALPHA):
+                cands = curr_node.children  # widening limit reached, don't expand further yet
             elif allow_interleaving:
                 cands = itertools.chain(curr_node.children, [curr_node])
             else:
                 break
-            best_cands = max_elems(cands, key=lambda n: n.selection_score(sols))
+            curr_node.last_visit = self.sim_count
+            if policy is None:
+                best_cands = max_elems(cands, key=lambda n: n.selection_score(sols))
+            else:
+                stats = SelectionStats(cands, sols)
+                scores = np.asarray(policy.scores(stats))
+                best_cands = [stats.nodes[k] for k in np.flatnonzero(scores == scores.max())]
             next_node = best_cands[0] if len(best_cands) == 1 else random.choice(best_cands)
         # TODO: remove the debug lines below
         #     if curr_expansion.is_finished:
@@ -484,32 +1332,53 @@ class TreeNode(object):
         """Selection score uses an adapted UTC formula to balance exploration and exploitation.
 
         See https://en.wikipedia.org/wiki/Monte_Carlo_tree_search. The exploitation term has been
-        adapted to the optimization context, where there is no concept of win ratio.
+        adapted to the optimization context, where there is no concept of win ratio (see
+        :meth:`exploit_score`). This score is used unless a selection policy is given (see
+        :class:`SelectionPolicy`).
         """
-        if self.sim_best.is_feas:
-            z_node = self.sim_best.value
+        exploit = self.exploit_score(sols)
+        if self.parent is None:
+            explore = INF
+        elif self.prior is None:
+            explore = sqrt(2.0 * log(self.parent.sim_count) / self.sim_count)
+        else:
+            explore = self.PUCT_C * self.prior * sqrt(self.parent.sim_count) / (1 + self.sim_count)
+        expand = 1.0 / (1.0 + self.depth)
+        return exploit + explore + expand
+
+    def exploit_score(self, sols):
+        """Normalised value of the best solution in this node's subtree, in [0, 1] (higher is
+        better). Feasible solutions are mapped above infeasible ones, each within the range of
+        best/worst solutions of its kind found so far.
+        """
+        sim_best = self.sim_best if self.transposition is None else self.transposition.sim_best
+        if sim_best.is_feas:
+            z_node = sim_best.value
             z_best = sols.feas_best.value
             z_worst = sols.feas_worst.value
             min_exploit = sols.infeas_count / (sols.feas_count + sols.infeas_count)
             max_exploit = 1.0
+        elif sols.lex:
+            z_node = sim_best.value
+            z_best = sols.infeas_best.value
+            z_worst = sols.infeas_worst.value
+            min_exploit = 0.0
+            max_exploit = sols.infeas_count / (1 + sols.feas_count + sols.infeas_count)
         else:
-            z_node = self.sim_best.value.infeas
+            z_node = sim_best.value.infeas
             z_best = sols.infeas_best.value.infeas
             z_worst = sols.infeas_worst.value.infeas
             min_exploit = 0.0
             max_exploit = sols.infeas_count / (1 + sols.feas_count + sols.infeas_count)
-        if z_best == z_worst:
+        if sols.lex:
+            raw_exploit = z_node.exploit(z_best, z_worst)
+            assert 0.0 <= raw_exploit <= 1.0
+        elif z_best == z_worst:
             raw_exploit = 0.0
         else:
             raw_exploit = (z_worst - z_node) / (z_worst - z_best)
             assert 0.0 <= raw_exploit <= 1.0
-        exploit = min_exploit + raw_exploit * (max_exploit - min_exploit)
-        explore = (
-            INF if self.parent is None else
-            sqrt(2.0 * log(self.parent.sim_count) / self.sim_count)
-        )
-        expand = 1.0 / (1.0 + self.depth)
-        return exploit + explore + expand
+        return min_exploit + raw_exploit * (max_exploit - min_exploit)
 
     # Parameter controlling how many child nodes (at most) are created during each iteration. The
     # default value is 1, which means that nodes are expanded one child at a time. This allows
@@ -572,10 +1441,16 @@ class TreeNode(object):
         self.sim_count = 1
         self.sim_sol = sol
         self.sim_best = sol
+        if self.transposition is not None:
+            if self.transposition.sim_sol is None:
+                self.transposition.sim_sol = sol
+            self.transposition.update(sol)
         for ancestor in self.path:
             ancestor.sim_count += 1
             if ancestor.sim_best.value > sol.value:
                 ancestor.sim_best = sol
+            if ancestor.transposition is not None:
+                ancestor.transposition.update(sol)
 
     def delete(self):
         """Remove a leaf or an entire subtree from the search tree, updating its ancestors' stats.
@@ -584,8 +1459,12 @@ class TreeNode(object):
         all the nodes in its path, which is roughly equivalent to the opposite of backpropagate().
         Note that nodes in the path *must* be updated in bottom-up order.
         Note also that deletion of a node may trigger the deletion of its parent.
+
+        Returns:
+            The number of nodes removed from the tree.
         """
         node = self
+        removed = self.tree_size()
         while True:
             # Keep references to the path and parent since they'd be lost after remove_child().
             bottom_up_path = reversed(node.path)
@@ -597,15 +1476,108 @@ class TreeNode(object):
             for ancestor in bottom_up_path:
                 if ancestor.sim_best is not node.sim_best:
                     break
-                # New ancestor sim_best is the best of children's sim_best or its own sim_sol.
+                # New ancestor sim_best is the best of children's sim_best or its own sim_sol (or
+                # the best solution of a subtree discarded by a previous collapse()).
                 candidates = [child.sim_best for child in ancestor.children]
                 candidates.append(ancestor.sim_sol)
+                if ancestor.collapsed_best is not None:
+                    candidates.append(ancestor.collapsed_best)
                 ancestor.sim_best = min(candidates, key=lambda s: s.value)
             # Propagate deletion to parent if it exists (true for all nodes except root) and has
             # become exhausted (i.e. is fully expanded and has no more children).
             if parent is None or not parent.is_exhausted:
                 break
             node = parent
+            removed += 1
+        return removed
+
+    # Fraction of the node limit that is kept after an eviction. Evicting down to a level below
+    # the limit avoids triggering a (full tree traversal) eviction on every iteration.
+    EVICTION_RATIO = 0.9
+
+    def collapse(self):
+        """Turn an expanded node back into an unexpanded leaf, discarding its whole subtree.
+
+        The node keeps its `sim_count` and `sim_best`, so its ancestors' statistics and its own
+        selection score are unaffected. The node's expansion is reset, so the subtree can be
+        regrown if the search selects the node again later; the discarded subtree's best solution
+        is remembered in `collapsed_best` so that :meth:`delete` doesn't lose it afterwards.
+
+        The discarded nodes keep their `path` and `parent`, which lets :meth:`evict` recognise
+        them through the collapsed (childless) ancestor.
+
+        Returns:
+            The number of nodes removed from the tree.
+        """
+        removed = self.tree_size() - 1
+        self.collapsed_best = self.sim_best
+        self.children = None
+        self.expansion = type(self).Expansion(self)
+        return removed
+
+    def evict(self, count, sols):
+        """Called on the root node to free (at least) `count` nodes by collapsing the least
+        promising subtrees back into leaves (see :meth:`collapse`).
+
+        Subtrees are ranked by selection score and, among equal scores, by the time of the last
+        visit, so that subtrees with the lowest score that were visited least recently go first.
+
+        Returns:
+            The number of nodes removed from the tree.
+        """
+        cands = []
+        stack = [self]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.children:
+                if node is not self:
+                    cands.append(node)
+                stack.extend(node.children)
+        cands.sort(key=lambda n: (n.selection_score(sols), n.last_visit))
+        removed = 0
+        for node in cands:
+            if removed >= count:
+                break
+            # Skip nodes that were discarded along with a previously collapsed ancestor.
+            if any(ancestor.children is None for ancestor in node.path):
+                continue
+            removed += node.collapse()
+        return removed
+
+    def commit(self):
+        """Called on the root node to commit to its most promising child, *i.e.* the one with the
+        best `sim_best` (ties broken by the largest `sim_count`).
+
+        The chosen child is unlinked and turned into the root of its own subtree, so that all its
+        siblings (and their subtrees) can be freed along with the current root.
+
+        Returns:
+            The new root node, or `None` if this node has no children to commit to.
+        """
+        if not self.children:
+            return None
+        best = min(self.children, key=lambda n: (n.sim_best.value, -n.sim_count))
+        self.remove_child(best)
+        # Strip the discarded ancestors from the path of every node in the new root's subtree.
+        stack = list(best.children or ())
+        while len(stack) > 0:
+            node = stack.pop()
+            node.path = node.path[1:]
+            if node.children is not None:
+                stack.extend(node.children)
+        return best
+
+    # Transposition-related methods
+    def state_key(self):
+        """Compute a hashable key identifying the state represented by this node.
+
+        Nodes reached through different branches (*e.g.* the same assignments made in a different
+        order) that represent the same state should return equal keys, so that they can share
+        statistics and cached rollouts when :func:`run` is given a transposition table. An
+        incrementally updated Zobrist hash is usually the cheapest choice. The default
+        implementation returns `None`, which opts the node out of the transposition table.
+        """
+        return None
 
     # Branch-and-bound/pruning- related methods
     def prune(self, cutoff):
@@ -620,6 +1592,22 @@ class TreeNode(object):
             elif node.is_expanded:
                 stack.extend(node.children)
 
+    def branch_priors(self, branches):
+        """Compute prior weights for the branches of the current node (optional).
+
+        If a subclass defines this method, children are expanded best-first (by decreasing prior)
+        instead of in the order given by :meth:`branches`, and the selection score of each child
+        uses a PUCT exploration term proportional to its normalised prior. This is best combined
+        with progressive widening (see :attr:`WIDENING_K`) for nodes with many branches.
+
+        Parameters:
+            branches: list of the branch objects returned by :meth:`branches`.
+
+        Returns:
+            a list with a non-negative weight for each branch (higher is more promising).
+        """
+        raise NotImplementedError()
+
     def bound(self):
         """Compute a lower bound on the current subtree's optimal objective value.
 
@@ -634,6 +1622,198 @@ class TreeNode(object):
         raise NotImplementedError()
 
 
+# Node attributes that describe the tree structure rather than the node's own state. These are
+# rebuilt by load_checkpoint() instead of being stored in the checkpoint.
+CHECKPOINT_EXCLUDED_ATTRS = frozenset(["path", "parent", "children", "expansion", "transposition"])
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path, root, sols, background=False, iteration=0, commits=0):
+    """Write the search tree under `root`, the `Solutions` object, the RNG state and the
+    search's `iteration` and `commits` counts to `path`.
+
+    The tree is stored as a flat list of nodes in preorder, each one with the index of its parent,
+    the state of its expansion and its remaining attributes, and the whole checkpoint is pickled
+    into a single gzip-compressed file. Solution objects shared among nodes are only stored once.
+    The file is written to a temporary name first and then renamed, so an interrupted write never
+    corrupts the previous checkpoint.
+
+    If `background` is true and the platform supports ``os.fork()``, the checkpoint is written by
+    a forked child process working on a copy-on-write snapshot of the search, so the caller only
+    waits for the fork itself.
+
+    Returns:
+        The pid of the background process (see :func:`wait_checkpoint`), or `None` if the
+        checkpoint was written synchronously.
+    """
+    if background and hasattr(os, "fork"):
+        pid = os.fork()
+        if pid != 0:
+            return pid
+        status = 1
+        try:
+            _write_checkpoint(path, root, sols, iteration, commits)
+            status = 0
+        except BaseException:
+            logger.exception("Failed to write checkpoint to {}".format(path))
+        finally:
+            os._exit(status)  # never return into the search from the child process
+    _write_checkpoint(path, root, sols, iteration, commits)
+    return None
+
+
+def wait_checkpoint(pid):
+    """Wait for the background checkpoint process `pid` (if any) to finish writing."""
+    if pid is None:
+        return
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        warn("Background checkpoint process {} failed with status {}".format(pid, status))
+
+
+def _write_checkpoint(path, root, sols, iteration, commits):
+    nodes = []
+    stack = [(root, -1)]
+    while len(stack) > 0:
+        node, parent_index = stack.pop()
+        expansion = node.expansion
+        branches = list(expansion.branches) if expansion.is_started else None
+        expansion.branches = None if branches is None else iter(branches)
+        state = {
+            name: value for name, value in node.__dict__.items()
+            if name not in CHECKPOINT_EXCLUDED_ATTRS
+        }
+        has_children = node.children is not None
+        nodes.append((
+            type(node), parent_index, has_children, state,
+            (expansion.is_started, expansion.is_finished, expansion.next_branch, branches),
+        ))
+        if has_children:
+            index = len(nodes) - 1
+            stack.extend((child, index) for child in reversed(node.children))
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "nodes": nodes,
+        "sols": sols,
+        "rng_state": random.getstate(),
+        "iteration": iteration,
+        "commits": commits,
+    }
+    tmp_path = "{}.tmp".format(path)
+    with gzip.open(tmp_path, "wb", compresslevel=1) as ostream:
+        pickle.dump(checkpoint, ostream, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """Read a checkpoint written by :func:`save_checkpoint`.
+
+    Links to transposition table entries are not stored, so the restored nodes have none. When
+    a search is resumed with a transposition table, :func:`run_steps` rebuilds the links (and
+    the entries' statistics) from the restored tree (see :meth:`TranspositionTable.attach_tree`).
+
+    Returns:
+        A `(root, sols, rng_state, iteration, commits)` tuple with the root of the restored search
+        tree, the `Solutions` object, the RNG state and the iteration and commit counts at the
+        time of the checkpoint.
+    """
+    with gzip.open(path, "rb") as istream:
+        checkpoint = pickle.load(istream)
+    if checkpoint["version"] != CHECKPOINT_VERSION:
+        raise ValueError("unsupported checkpoint version: {}".format(checkpoint["version"]))
+    nodes = []
+    for cls, parent_index, has_children, state, expansion_state in checkpoint["nodes"]:
+        node = cls.__new__(cls)
+        TreeNode.__init__(node)
+        node.__dict__.update(state)
+        is_started, is_finished, next_branch, branches = expansion_state
+        expansion = node.expansion
+        expansion.is_started = is_started
+        expansion.is_finished = is_finished
+        expansion.next_branch = next_branch
+        expansion.branches = None if branches is None else iter(branches)
+        if has_children:
+            node.children = []
+        if parent_index >= 0:
+            nodes[parent_index].add_child(node)
+        nodes.append(node)
+    return (nodes[0], checkpoint["sols"], checkpoint["rng_state"],
+            checkpoint["iteration"], checkpoint["commits"])
+
+
+def benchmark(instances, make_root, policies, repeats=1, rng_seed=0, evaluate=None, **kwargs):
+    """Compare selection policies on a collection of problem instances.
+
+    Each policy is run `repeats` times on each instance, with RNG seeds `rng_seed`,
+    `rng_seed + 1`, ... (the same for all policies), on a fresh root made by
+    `make_root(instance)`. The remaining keyword arguments (*e.g.* `time_limit` or `iter_limit`)
+    are passed on to :func:`run`.
+
+    Arguments:
+        instances (dict): problem instances by name.
+        make_root: callable creating the root node of a search for an instance.
+        policies (dict): :class:`SelectionPolicy` objects by name (`None` stands for the node
+            class' default selection).
+        evaluate: optional callable `evaluate(root, sol)` computing an additional measure of the
+            best solution of each run, such as the soft cost of a timetable.
+
+    Returns:
+        a list of dicts, one per run, with keys `instance`, `policy`, `repeat`, `first_feas_time`
+        and `first_feas_iter` (wall-clock seconds and iterations until the first feasible
+        solution, `None` if none was found), `time` (wall-clock seconds of the whole run),
+        `best` (best solution value) and `score` (the result of `evaluate`, if given).
+    """
+    results = []
+    for instance_name, instance in instances.items():
+        for policy_name, policy in policies.items():
+            for repeat in range(repeats):
+                info("Benchmarking {} on {} (run {})...".format(policy_name, instance_name, repeat))
+                root = make_root(instance)
+                t_start = time.time()
+                sols = run(root, rng_seed=rng_seed + repeat, selection_policy=policy, **kwargs)
+                elapsed = time.time() - t_start
+                first_feas = next((incumbent for incumbent in sols.list if incumbent.is_feas), None)
+                if first_feas is None:
+                    first_feas_time = first_feas_iter = None
+                else:
+                    first_feas_time = first_feas.timestamp - t_start
+                    first_feas_iter = first_feas.iteration
+                results.append({
+                    "instance": instance_name,
+                    "policy": policy_name,
+                    "repeat": repeat,
+                    "first_feas_time": first_feas_time,
+                    "first_feas_iter": first_feas_iter,
+                    "time": elapsed,
+                    "best": sols.best.value,
+                    "score": None if evaluate is None else evaluate(root, sols.best),
+                })
+    return results
+
+
+def node_limit_for(max_nodes, max_bytes, node_bytes):
+    """Effective limit on the number of tree nodes given node and byte limits (either may be
+    `None`) and the current estimate of the average number of bytes per node.
+    """
+    limits = []
+    if max_nodes is not None:
+        limits.append(max_nodes)
+    if max_bytes is not None:
+        limits.append(max(1, int(max_bytes // node_bytes)))
+    return min(limits) if len(limits) > 0 else None
+
+
+def stop_value_reached(value, stop_value):
+    """Whether the objective `value` of a solution is the `stop_value` of a search (see
+    :func:`run`). Numbers given for :class:`Lex` values are compared with each of their levels.
+    """
+    if stop_value is None:
+        return False
+    if isinstance(value, Lex) and not isinstance(stop_value, tuple):
+        return all(level == stop_value for level in value)
+    return value == stop_value
+
+
 def max_elems(iterable, key=None):
     """Find the elements in 'iterable' corresponding to the maximum values w.r.t. 'key'."""
     iterator = iter(iterable)
@@ -0,0 +1,54 @@
+import random
+import sys
+sys.path.append('..')
+
+from rr.opt.mcts import simple as mcts
+
+# Small problem shared by the MCTS engine tests: pick SIZE of the items, in any order, minimizing their total cost.
+# Picking both items of a conflicting pair is infeasible. The optimum picks items 0, 2 and 4 (cost 3).
+COSTS = [1, 2, 1, 5, 1, 3, 2, 4]
+CONFLICTS = [(0, 1), (2, 3), (1, 6), (5, 7)]
+SIZE = 3
+
+class PickNode(mcts.TreeNode):
+    @classmethod
+    def root(cls, instance=(COSTS, CONFLICTS, SIZE)):
+        root = cls()
+        root.costs, root.conflicts, root.size = instance
+        root.picked = frozenset()      # Items picked so far, the same set whatever the order they were picked in
+        return root
+
+    def copy(self):
+        clone = mcts.TreeNode.copy(self)
+        clone.costs = self.costs
+        clone.conflicts = self.conflicts
+        clone.size = self.size
+        clone.picked = self.picked
+        return clone
+
+    def branches(self):
+        if len(self.picked) == self.size:
+            return []
+        return [item for item in range(len(self.costs)) if item not in self.picked]
+
+    def apply(self, item):
+        self.picked = self.picked | {item}
+
+    def simulate(self):      # Random completion of the picks
+        free = [item for item in range(len(self.costs)) if item not in self.picked]
+        picked = self.picked | set(random.sample(free, self.size - len(self.picked)))
+        return mcts.Solution(value=self.value(picked), data=sorted(picked))
+
+    def value(self, picked):
+        infeas = sum(1 for one, two in self.conflicts if one in picked and two in picked)
+        if infeas > 0:
+            return mcts.Infeasible(infeas)
+        return sum(self.costs[item] for item in picked)
+
+    def state_key(self):
+        return self.picked
+
+class LexPickNode(PickNode):      # The same problem with Lex(conflicts, cost) values
+    def value(self, picked):
+        infeas = sum(1 for one, two in self.conflicts if one in picked and two in picked)
+        return mcts.Lex(infeas, sum(self.costs[item] for item in picked))
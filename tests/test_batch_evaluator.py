@@ -0,0 +1,38 @@
+import numpy as np
+import sys
+sys.path.append('..')
+
+from itc2007_framework import BatchEvaluator, ExamTimetablingProblem, ExamTimetablingSolution, HardConstraintTracker
+
+problem = ExamTimetablingProblem.from_file("datasets/exam_comp_set12m.exam")
+evaluator = BatchEvaluator(problem)
+
+# Random complete timetables, scored in two chunks
+rng = np.random.default_rng(0)
+empty = np.full(len(problem.exams), -1)
+periods, rooms = evaluator.random_completions(rng, 20, empty, empty)
+results = evaluator.evaluate(periods, rooms, chunk_size=16)
+
+names = BatchEvaluator.HARD_COMPONENTS + BatchEvaluator.SOFT_COMPONENTS + ("distance_to_feasibility", "soft_constraint_violations")
+mismatches = 0
+tracker_mismatches = 0
+for k in range(len(periods)):
+    bookings = evaluator.bookings(periods[k], rooms[k])
+    solution = ExamTimetablingSolution(problem, bookings)
+    for name in names:
+        if getattr(solution, name)() != results[name][k]:
+            mismatches += 1
+            print(f"Timetable {k}: {name} {getattr(solution, name)()} != {results[name][k]}")
+
+    tracker = HardConstraintTracker(problem)
+    violations = tracker.fill({booking.exam: (booking.period, booking.rooms) for booking in bookings})
+    if violations != solution.distance_to_feasibility():
+        tracker_mismatches += 1
+        print(f"Timetable {k}: tracker {violations} != {solution.distance_to_feasibility()}")
+
+print(mismatches)
+print(tracker_mismatches)
+
+# Encoding a timetable and decoding it again gives back the same bookings
+encoded = evaluator.encode(evaluator.bookings(periods[0], rooms[0]))
+print(np.array_equal(encoded[0], periods[0]) and np.array_equal(encoded[1], rooms[0]))
@@ -0,0 +1,30 @@
+import numpy as np
+import sys
+sys.path.append('..')
+
+from itc2007_framework import Booking, ExamTimetablingProblem, ExamTimetablingSolution
+
+problem = ExamTimetablingProblem.from_file("datasets/exam_comp_set12.exam")
+rng = np.random.default_rng(0)
+
+# Exact tiers match the scorer, and the cheap hard tier is a lower bound which is 0 exactly when feasible
+mismatches = 0
+for size in (0, 1, 2, 5, 20, len(problem.exams)):
+    for _ in range(5):
+        exams = rng.choice(len(problem.exams), size=size, replace=False)
+        bookings = [Booking(problem.exams[e], problem.periods[rng.integers(len(problem.periods))], problem.rooms[rng.integers(len(problem.rooms))])
+                    for e in exams]
+        solution = ExamTimetablingSolution(problem, bookings)
+        distance = solution.distance_to_feasibility()
+        hard, soft = solution.evaluate_tiered()
+        bound, bound_soft = solution.evaluate_tiered(exact=False)
+        if hard != distance or not 0 <= bound <= hard or (bound == 0) != (hard == 0) or (hard == 0) != solution.is_feasible():
+            mismatches += 1
+        if (soft is None) != (hard > 0) or bound_soft != soft:
+            mismatches += 1
+        if solution.evaluate_tiered(softs=True, exact=False)[1] != solution.soft_constraint_violations():
+            mismatches += 1
+print(mismatches)
+
+# An empty timetable is feasible, so its soft tier is computed
+print(ExamTimetablingSolution(problem, []).evaluate_tiered(exact=False))
@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+sys.path.append('..')
+sys.path.append('../heuristics')
+
+from itc2007_framework import Booking, ExamTimetablingProblem, ExamTimetablingSolution, LocalSearch
+from tabu_search import TabuSearch, read_bookings
+
+problem = ExamTimetablingProblem.from_file("datasets/exam_comp_set12.exam")
+
+def current_bookings(search):      # Bookings of the current (rather than the best) timetable of a search
+    best = search.best
+    search.best = search.snapshot()
+    bookings = search.bookings()
+    search.best = best
+    return bookings
+
+# Tabu search from an empty timetable until feasible: the tracked hard violations and soft cost match the scorer along the way
+tabu = TabuSearch(problem, [], rng_seed=0)
+mismatches = 0
+while (tabu.best_hard > 0 or tabu.iterations < 1000) and tabu.elapsed < 120:
+    tabu.run(time_limit=120, iter_limit=tabu.iterations + 100)
+    solution = ExamTimetablingSolution(problem, current_bookings(tabu))
+    if tabu.hard != solution.distance_to_feasibility() or tabu.cost != solution.soft_constraint_violations():
+        mismatches += 1
+print(mismatches)
+
+best = tabu.bookings()
+solution = ExamTimetablingSolution(problem, best)
+print(tabu.best_hard, solution.distance_to_feasibility(), tabu.best_cost == solution.soft_constraint_violations())
+
+# Local search from the tabu search result stays feasible, with its tracked cost equal to the scorer's
+local_search = LocalSearch(problem, best, rng_seed=0)
+print(local_search.improvable)
+improved = local_search.run(time_limit=60, iter_limit=5000)
+solution = ExamTimetablingSolution(problem, improved)
+print(solution.distance_to_feasibility(), local_search.best_cost == solution.soft_constraint_violations(), local_search.best_cost <= local_search.initial_cost)
+current = ExamTimetablingSolution(problem, current_bookings(local_search))
+print(current.distance_to_feasibility(), local_search.cost == current.soft_constraint_violations())
+
+# Multi-room bookings of the best timetable survive room moves that make the current one single-room
+used = {(booking.period.number, booking.rooms.number) for booking in best}
+multi_room = []
+for booking in best:      # Exams that two empty rooms of their period can seat, but not the smaller one alone, take both
+    students = len(booking.exam.students)
+    empty = sorted((room for room in problem.rooms if (booking.period.number, room.number) not in used), key=lambda room: room.capacity)
+    pair = next(([small, large] for small in empty for large in empty if small is not large and small.capacity < students <= small.capacity + large.capacity), None)
+    if pair is None:
+        multi_room.append(booking)
+        continue
+    used.update((booking.period.number, room.number) for room in pair)
+    multi_room.append(Booking(booking.exam, booking.period, pair))
+print(ExamTimetablingSolution(problem, multi_room).is_feasible())
+room_search = LocalSearch(problem, multi_room, rng_seed=0)
+room_search.MOVE_WEIGHTS = (0, 1, 0, 0)      # Room moves only
+room_search.run(time_limit=60, iter_limit=3000)
+print(sum(room_search.multi_room) < sum(room_search.best[2]) < sum(isinstance(booking.rooms, list) for booking in multi_room))
+print(ExamTimetablingSolution(problem, room_search.bookings()).distance_to_feasibility(), ExamTimetablingSolution(problem, current_bookings(room_search)).distance_to_feasibility())
+
+# Tabu search keeps its hard violation count equal to the scorer's on multi-room timetables too
+tabu = TabuSearch(problem, multi_room, rng_seed=0)
+mismatches = 0
+for _ in range(20):
+    tabu.run(time_limit=60, iter_limit=tabu.iterations + 50)
+    if tabu.hard != ExamTimetablingSolution(problem, current_bookings(tabu)).distance_to_feasibility():
+        mismatches += 1
+print(mismatches, tabu.best_hard == ExamTimetablingSolution(problem, tabu.bookings()).distance_to_feasibility())
+
+# Infeasible timetables are returned untouched
+print(LocalSearch(problem, best[:-1], rng_seed=0).run(time_limit=1) == best[:-1])
+
+# Solution files must hold one (exam, period, rooms) line per exam
+with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "solution.txt")
+    with open(path, "w") as file:
+        for booking in improved:
+            file.write(f"{(booking.exam.number, booking.period.number, booking.rooms.number)}\n")
+        file.write("Conflicting exams: 0\n")
+    print(read_bookings(problem, path) == improved)
+
+    with open(path, "w") as file:
+        file.write(f"{improved}\n")
+    try:
+        read_bookings(problem, path)
+    except ValueError:
+        print("ValueError")
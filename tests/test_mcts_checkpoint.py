@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+sys.path.append('..')
+
+from rr.opt.mcts import simple as mcts
+from mcts_toy import PickNode
+
+def tree_stats(root):      # (picked items, sim_count, sim_best value) of every node, in preorder
+    stats, stack = [], [root]
+    while stack:
+        node = stack.pop()
+        stats.append((sorted(node.picked), node.sim_count, str(node.sim_best.value)))
+        stack.extend(reversed(node.children or []))
+    return stats
+
+with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "search.ckpt")
+
+    # Save and load: the restored tree, solutions, RNG state and counts are those of the checkpoint
+    root = PickNode.root()
+    sols = mcts.run(root, iter_limit=10, rng_seed=0, checkpoint_path=path, commit_iter_interval=4)
+    restored, restored_sols, rng_state, iteration, commits = mcts.load_checkpoint(path)
+    print(iteration, commits)
+    print(restored.tree_size())
+    print(restored_sols.feas_count + restored_sols.infeas_count == sols.feas_count + sols.infeas_count, str(restored_sols.best.value) == str(sols.best.value))
+    children = restored.children
+    print(all(child.parent is restored and child.path == (restored,) for child in children))
+    print(all(child.transposition is None for child in children))
+
+    # Resuming carries on with the same counts, and a transposition table is rebuilt from the restored tree
+    table = mcts.TranspositionTable(1000)
+    resumed = mcts.run(None, iter_limit=20, resume_from=path, transpositions=table)
+    print(resumed.feas_count + resumed.infeas_count > sols.feas_count + sols.infeas_count)
+    print(len(table) > 0)
+
+    # A checkpoint of the same search without commits restores exactly the same tree
+    root = PickNode.root()
+    mcts.run(root, iter_limit=15, rng_seed=1, checkpoint_path=path)
+    restored = mcts.load_checkpoint(path)[0]
+    print(tree_stats(restored) == tree_stats(root))
+    table = mcts.TranspositionTable(1000)
+    table.attach_tree(restored)
+    print(all(node.transposition is table.lookup(node.picked) for node in [restored] + restored.children))
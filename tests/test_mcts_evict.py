@@ -0,0 +1,83 @@
+import sys
+sys.path.append('..')
+
+from rr.opt.mcts import simple as mcts
+from mcts_toy import PickNode
+
+
+class ToyNode(mcts.TreeNode):
+    def selection_score(self, sols):
+        return self.score
+
+
+def node(value, score=0.0):
+    n = ToyNode()
+    n.children = []
+    n.sim_count = 1
+    n.sim_sol = mcts.Solution(value)
+    n.sim_best = n.sim_sol
+    n.score = score
+    return n
+
+
+# root -> a, b; a -> a1, a2; a1 -> a11, a12 (7 nodes)
+root = node(9.0)
+a = node(3.0, score=0.0)
+b = node(4.0, score=5.0)
+a1 = node(2.0, score=1.0)
+a2 = node(5.0, score=2.0)
+a11 = node(1.0)
+a12 = node(6.0)
+root.add_child(a)
+root.add_child(b)
+a.add_child(a1)
+a.add_child(a2)
+a1.add_child(a11)
+a1.add_child(a12)
+for n, best in ((a1, a11), (a, a11), (root, a11)):
+    n.sim_best = best.sim_sol
+
+print(root.tree_size())
+removed = root.evict(5, None)
+# Collapsing 'a' discards a1's subtree too, so a1 must not be counted again.
+print(removed, root.tree_size(), removed == 7 - root.tree_size())
+print(a.children, a.collapsed_best.value)
+
+# Regrow 'a' with a child that improves on its subtree, then delete that child: 'a' must fall back
+# on the best solution of its discarded subtree rather than its own simulation.
+a.children = []
+c = node(0.5)
+d = node(8.0)
+a.add_child(c)
+a.add_child(d)
+a.sim_best = c.sim_sol
+root.sim_best = c.sim_sol
+print(c.delete())
+print(a.sim_best.value, root.sim_best.value)
+
+# A search limited to max_nodes keeps its tree within the limit, and still finds feasible solutions
+root = PickNode.root()
+sizes = []
+for sols in mcts.run_steps(root, iter_limit=300, rng_seed=0, max_nodes=20, stop_value=None, step_iter_interval=1):
+    sizes.append(root.tree_size())
+print(len(sizes), max(sizes) <= 20, sols.best.is_feas)
+
+# Committing makes the best child of the root a root of its own, with paths relative to it
+root = PickNode.root()
+mcts.run(root, iter_limit=40, rng_seed=0, stop_value=None)
+count = len(root.children)
+best = min(root.children, key=lambda n: (n.sim_best.value, -n.sim_count))
+new_root = root.commit()
+print(new_root is best, new_root.parent is None, len(root.children) == count - 1)
+stack = list(new_root.children)
+paths_ok = True
+while stack:
+    n = stack.pop()
+    paths_ok = paths_ok and n.path[0] is new_root and n.path[-1] is n.parent
+    stack.extend(n.children or [])
+print(paths_ok, PickNode.root().commit())
+
+# Searches with commits never claim optimality, and leave the discarded root behind
+root = PickNode.root()
+sols = mcts.run(root, iter_limit=40, rng_seed=0, commit_iter_interval=10, stop_value=None)
+print(len(root.children), sols.best.is_feas, sols.best.is_opt)
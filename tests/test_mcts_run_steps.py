@@ -0,0 +1,50 @@
+import asyncio
+import sys
+sys.path.append('..')
+
+from rr.opt.mcts import simple as mcts
+from mcts_toy import PickNode, LexPickNode
+
+# The search is suspended every step_iter_interval iterations, and finishes at its limits
+search = mcts.run_steps(PickNode.root(), iter_limit=50, rng_seed=0, stop_value=None, step_iter_interval=10)
+steps = 0
+try:
+    while True:
+        sols = next(search)
+        steps += 1
+except StopIteration as stop:
+    final = stop.value
+print(steps, final is sols, final.best.value)
+
+# Closing a suspended search stops it where it is
+search = mcts.run_steps(PickNode.root(), iter_limit=50, rng_seed=0, stop_value=None, step_iter_interval=10)
+sols = next(search)
+count = sols.feas_count + sols.infeas_count
+search.close()
+print(count)
+
+# The search stops as soon as the stop value is reached, marking the solution as optimal
+sols = mcts.run(PickNode.root(), iter_limit=1000, rng_seed=0, stop_value=3)
+print(sols.best.value, sols.best.is_opt, sols.feas_count + sols.infeas_count < 56)
+sols = mcts.run(PickNode.root(), iter_limit=1000, rng_seed=0)
+print(sols.best.value, sols.best.is_opt)
+
+# With Lex values, the stop value may be given level by level or as a number for all levels
+sols = mcts.run(LexPickNode.root(), iter_limit=1000, rng_seed=0, stop_value=mcts.Lex(0, 3))
+print(sols.best.value, sols.best.is_opt, sols.feas_count + sols.infeas_count < 56)
+print(mcts.stop_value_reached(mcts.Lex(0, 0), 0), mcts.stop_value_reached(mcts.Lex(0, 3), 0))
+print(mcts.stop_value_reached(mcts.Infeasible(0), 0), mcts.stop_value_reached(0, None))
+
+# Two coroutine searches interleave in one event loop, streaming their solutions at each step
+async def main():
+    streamed = {"one": [], "two": []}
+    one = mcts.run_async(PickNode.root(), step_iter_interval=5, iter_limit=30, stop_value=None,
+                         on_step=lambda sols: streamed["one"].append(sols.best.value))
+    two = mcts.run_async(LexPickNode.root(), step_iter_interval=5, iter_limit=20, stop_value=None,
+                         on_step=lambda sols: streamed["two"].append(sols.best.value))
+    results = await asyncio.gather(one, two)
+    return results, streamed
+
+(sols_one, sols_two), streamed = asyncio.run(main())
+print(len(streamed["one"]), len(streamed["two"]))
+print(streamed["one"][-1] >= sols_one.best.value, streamed["two"][-1] >= sols_two.best.value)
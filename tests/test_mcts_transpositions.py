@@ -0,0 +1,53 @@
+import sys
+sys.path.append('..')
+
+from rr.opt.mcts import simple as mcts
+from mcts_toy import PickNode
+
+class CountingNode(PickNode):      # Counts the nodes created and the rollouts simulated
+    created = simulations = 0
+
+    def copy(self):
+        CountingNode.created += 1
+        return PickNode.copy(self)
+
+    def simulate(self):
+        CountingNode.simulations += 1
+        return PickNode.simulate(self)
+
+def tree_nodes(root):
+    nodes, stack = [], [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.children or [])
+    return nodes
+
+# Without a table, every new node runs its own rollout
+root = CountingNode.root()
+mcts.run(root, iter_limit=100, rng_seed=0, stop_value=None)
+print(CountingNode.simulations == CountingNode.created + 1, all(node.transposition is None for node in tree_nodes(root)))
+
+# With a table, nodes reaching the same picks in another order share one entry and reuse its rollout
+CountingNode.created = CountingNode.simulations = 0
+table = mcts.TranspositionTable(1000)
+root = CountingNode.root()
+sols = mcts.run(root, iter_limit=100, rng_seed=0, transpositions=table, stop_value=None)
+print(CountingNode.simulations < CountingNode.created + 1, sols.feas_count + sols.infeas_count == CountingNode.simulations)
+nodes = tree_nodes(root)[1:]      # The root is not linked to the table
+entries = {}
+for node in nodes:
+    entries.setdefault(node.picked, set()).add(id(node.transposition))
+print(len(entries) < len(nodes), all(len(ids) == 1 for ids in entries.values()))
+print(all(node.transposition is table.lookup(node.picked) for node in nodes))
+print(all(node.transposition.sim_best.value <= node.sim_best.value for node in nodes), sols.best.value)
+
+# A full table discards its least recently used entries, and an integer gives the size of a new table
+small = mcts.TranspositionTable(5)
+for key in range(8):
+    small.lookup(key)
+small.lookup(3)
+small.lookup(8)
+print(len(small), [key for key in range(9) if key in small])
+sols = mcts.run(PickNode.root(), iter_limit=100, rng_seed=0, transpositions=10, stop_value=None)
+print(sols.best.value)
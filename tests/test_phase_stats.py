@@ -0,0 +1,41 @@
+import sys
+sys.path.append('..')
+
+from rr.opt.mcts import simple as mcts
+from mcts_toy import PickNode
+
+@mcts.timed("work")
+def work(n):
+    return sum(range(n))
+
+# Two searches interleaved step by step each record their own phases, and nothing is recorded outside them
+stats_one, stats_two = mcts.PhaseStats(), mcts.PhaseStats()
+search_one = mcts.run_steps(PickNode.root(), iter_limit=40, rng_seed=0, stats=stats_one, step_iter_interval=5)
+search_two = mcts.run_steps(PickNode.root(), iter_limit=20, rng_seed=1, stats=stats_two, step_iter_interval=5)
+steps = {"one": 0, "two": 0}
+running = {"one": search_one, "two": search_two}
+while running:
+    for name, search in list(running.items()):
+        try:
+            next(search)
+            steps[name] += 1
+        except StopIteration:
+            del running[name]
+        work(10)      # Between steps, no search is running
+print(steps)
+print(stats_one.timer("select").count, stats_two.timer("select").count)
+print(stats_one.timer("branches").count > 0, stats_one.timer("apply").count >= stats_one.timer("branches").count)
+print("work" in stats_one.phases, "work" in stats_two.phases)
+
+# Timed functions record into the active stats only, and activation can be nested
+outer, inner = mcts.PhaseStats(), mcts.PhaseStats()
+print(mcts.activate_stats(outer) is None)
+work(10)
+previous = mcts.activate_stats(inner)
+work(10)
+work(10)
+mcts.activate_stats(previous)
+work(10)
+print(mcts.activate_stats(None) is outer)
+work(10)
+print(outer.timer("work").count, inner.timer("work").count)
@@ -0,0 +1,48 @@
+import numpy as np
+import sys
+sys.path.append('..')
+
+from rr.opt.mcts import simple as mcts
+from mcts_toy import PickNode, LexPickNode, COSTS
+
+POLICIES = {
+    "uct": mcts.UCT(),
+    "ucb1-tuned": mcts.UCB1Tuned(),
+    "rank": mcts.RankBased(),
+    "thompson": mcts.ThompsonSampling(),
+    "puct": mcts.PUCT(),
+}
+
+class PriorPickNode(PickNode):      # Cheaper items first, with priors favouring them
+    def branch_priors(self, branches):
+        return [1.0 / self.costs[item] for item in branches]
+
+# Every policy finds the optimum, with numeric and Lex values
+for name, policy in sorted(POLICIES.items()):
+    values = [str(mcts.run(cls.root(), iter_limit=300, rng_seed=0, selection_policy=policy, stop_value=None).best.value)
+              for cls in (PickNode, LexPickNode, PriorPickNode)]
+    print(name, values)
+
+# Candidate statistics are arrays in candidate order, and the root has an infinite parent count
+root = PriorPickNode.root()
+sols = mcts.run(root, iter_limit=30, rng_seed=0, stop_value=None)
+stats = mcts.SelectionStats([root] + root.children, sols)
+print(type(stats.counts).__name__, len(stats.nodes), stats.counts.shape, stats.exploits.shape)
+print(stats.parent_counts[0], list(stats.parent_counts[1:]) == [root.sim_count] * len(root.children))
+print(np.isnan(stats.priors[0]), stats.has_prior[0], bool(stats.has_prior[1:].all()))
+print(list(stats.depths) == [len(node.path) for node in stats.nodes])
+
+# Scores: the root is always worth exploring, and ranks favour the best candidates
+for name, policy in sorted(POLICIES.items()):
+    scores = np.asarray(policy.scores(stats))
+    print(name, scores.shape, bool(np.isinf(scores[0])) if name != "thompson" else None)
+rank_scores = mcts.RankBased(exploration_weight=0.0).scores(mcts.SelectionStats(root.children, sols))
+best = min(root.children, key=lambda node: node.sim_best.value)
+print(max(rank_scores) == 1.0, rank_scores[root.children.index(best)] == 1.0)
+
+# The benchmark runs every policy on every instance with the same seeds
+instances = {"toy": (COSTS, [(0, 1), (2, 3), (1, 6), (5, 7)], 3), "toy-2": (COSTS, [(0, 2)], 2)}
+results = mcts.benchmark(instances, PickNode.root, {"uct": POLICIES["uct"], "default": None},
+                         repeats=2, iter_limit=50, stop_value=None)
+print(len(results), sorted(set((row["instance"], row["policy"]) for row in results)))
+print(all(row["first_feas_iter"] is not None and row["best"] > 0 for row in results))
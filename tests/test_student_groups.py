@@ -0,0 +1,47 @@
+import numpy as np
+import sys
+sys.path.append('..')
+
+from itc2007_framework import Booking, ExamTimetablingProblem, ExamTimetablingSolution
+
+problem = ExamTimetablingProblem.from_file("datasets/exam_comp_set12m.exam")
+
+# Groups are only built when first needed
+print(problem.student_groups is None)
+print(problem.student_groups_cheaper())
+print(len(problem.student_groups), sum(problem.student_group_sizes), problem.student_group_exams.shape)
+
+# Every clashing pair is covered by the groups, EXCLUSION pseudo-students included
+clashes = np.zeros_like(problem.clash_matrix)
+for group, size in zip(problem.student_groups, problem.student_group_sizes):
+    for i in group:
+        for j in group:
+            if i != j:
+                clashes[i, j] += size
+print(np.array_equal(clashes, problem.clash_matrix))
+
+rng = np.random.default_rng(0)
+matrices = (None, problem.two_in_a_row_matrix, problem.two_in_a_day_matrix, problem.period_spread_matrix)
+mismatches = 0
+for _ in range(10):
+    periods = rng.integers(0, len(problem.periods), size=len(problem.exams))
+    for matrix in matrices:
+        if problem.group_proximity_cost(periods, matrix) != problem.proximity_cost(periods, matrix):
+            mismatches += 1
+
+    # Partial assignments: unplaced exams (-1) incur no penalty
+    partial = np.where(rng.random(len(problem.exams)) < 0.5, periods, -1)
+    placed = np.flatnonzero(partial >= 0)
+    clash = problem.clash_matrix[np.ix_(placed, placed)]
+    expected = int(np.sum(np.triu(clash * problem.proximity_matrix[np.ix_(partial[placed], partial[placed])], k=1)))
+    if problem.group_proximity_cost(partial) != expected:
+        mismatches += 1
+print(mismatches)
+
+# ExamTimetablingSolution gives the same proximity penalties per student group as over exam pairs
+bookings = [Booking(exam, problem.periods[rng.integers(len(problem.periods))], problem.rooms[0]) for exam in problem.exams if rng.random() < 0.7]
+solution = ExamTimetablingSolution(problem, bookings)
+pair_penalties = [solution.two_in_a_row_penalty(), solution.two_in_a_day_penalty(), solution.period_spread_penalty()]
+problem.student_groups_cheaper = lambda: True
+group_penalties = [solution.two_in_a_row_penalty(), solution.two_in_a_day_penalty(), solution.period_spread_penalty()]
+print(pair_penalties == group_penalties)